@@ -0,0 +1,204 @@
+"""Бот, который играет в Тетрис, перебирая все конечные положения падающего и следующего тетрамино.
+
+Как и engine, модуль не зависит от pygame: бот работает и в игре, и без дисплея.
+"""
+
+from engine import WT, LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP, columns, states, column_tops, count_filled, \
+    count_holes, count_bumpiness
+
+# Веса оценки стакана: суммарная высота столбцов, собранные линии, дыры, неровность.
+WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+
+def heights(field, width: int = WT) -> list:
+    """Возвращает высоту каждого столбца стакана.
+
+    Аргументы:
+        field: list(int): заполненность стакана, по одной маске на линию.
+        width: int: ширина стакана.
+
+    Возвращаемое значение:
+        list(int): высота столбцов, 0 - пустой столбец.
+    """
+    return [len(field) - top for top in column_tops(field, width)]
+
+
+def placements(field, t: int, width: int = WT, tops: list = None):
+    """Перебирает все конечные положения тетрамино, падающего с верха стакана.
+
+    Аргументы:
+        field: list(int): заполненность стакана, по одной маске на линию.
+        t: int: номер тетрамино.
+        width: int: ширина стакана.
+        tops: list(int): верхний квадрат каждого столбца, если он уже известен (engine.Engine.tops).
+
+    Yield:
+        tuple: (тетрамино (t, r, x, y), заполненность стакана после закрепления, количество собранных линий).
+    """
+    height, full = len(field), (1 << width) - 1
+    if tops is None:
+        tops = column_tops(field, width)  # Верхний квадрат каждого столбца.
+    for r, (_, left, right, top, _, masks) in enumerate(states[t]):
+        for x in range(-left, width - right):
+            # Тетрамино останавливается на первом квадрате под любым из своих столбцов.
+            y = min(tops[x + dx] - 1 - dy for dx, dy in columns[t][r])
+            if y + top < 0:  # Тетрамино не помещается в стакан.
+                continue
+            new = field[:]
+            for dy, mask in masks:
+                new[y + dy] |= mask << (x + left)
+            rows = [row for row in new if row != full]
+            count = height - len(rows)
+            if count:
+                new = [0] * count + rows
+            yield (t, r, x, y), new, count
+
+
+class Bot:
+    """Класс Bot выбирает положение для каждого тетрамино и ведёт его туда кодами входных событий движка.
+
+        Основное применение:
+            Демонстрационный режим игры, долгие проверки игры без человека, сравнение весов оценки.
+
+        Примечание:
+            Оценки стаканов запоминаются в кэше размера cache_size: одинаковые стаканы, которые
+            встречаются при переборе, оцениваются один раз.
+
+        Атрибуты:
+            weights: tuple(float): веса оценки стакана, см. WEIGHTS.
+            lookahead: bool: True - учитывать положения следующего тетрамино.
+            beam: int: сколько лучших положений падающего тетрамино проверяется вместе со следующим.
+            cache_size: int: наибольшее количество запомненных оценок.
+            hits: int: сколько раз оценка нашлась в кэше.
+            misses: int: сколько раз стакан пришлось оценивать.
+            target: tuple: выбранное положение падающего тетрамино (t, r, x, y) или None.
+            width: int: ширина стакана игры, которой управляет бот.
+
+        Методы:
+            evaluate(self, field, tops, filled) -> float:
+                Оценивает стакан без учёта собранных линий.
+
+            best(self, field, figure, next_figure, tops) -> tuple:
+                Возвращает лучшее положение тетрамино figure.
+
+            inputs(self, engine) -> list(int):
+                Возвращает коды входных событий, которые ведут падающее тетрамино к выбранному положению.
+    """
+    def __init__(self, weights: tuple = WEIGHTS, lookahead: bool = True, beam: int = 6, cache_size: int = 200000):
+        self.weights = weights
+        self.lookahead = lookahead
+        self.beam = beam
+        self.cache_size = cache_size
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+        self.target = None
+        self.pieces = None  # Количество закреплённых тетрамино, когда было выбрано self.target.
+        self.pressed = None  # Нажатая боком стрелка: LEFT, RIGHT или None.
+        self.width = WT
+
+    def evaluate(self, field, tops: list = None, filled: int = None) -> float:
+        """Метод для оценки стакана без учёта собранных линий.
+
+        Стакан игры оценивается по её готовому индексу (engine.Engine.tops и filled), а стаканы после
+        пробных положений тетрамино, у которых индекса нет, - по одному проходу column_tops.
+
+        Аргументы:
+            field: list(int): заполненность стакана, по одной маске на линию.
+            tops: list(int): верхний квадрат каждого столбца field, если он уже известен.
+            filled: int: количество квадратов в field, если оно уже известно.
+
+        Возвращаемое значение:
+            float: оценка, чем больше - тем лучше.
+        """
+        key = tuple(field)
+        value = self.cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        w_height, _, w_holes, w_bumpiness = self.weights
+        if tops is None:
+            tops, filled = column_tops(field, self.width), count_filled(field)
+        height = len(field)
+        # Дыра - пустая клетка, над которой в том же столбце есть квадрат.
+        value = (w_height * (self.width * height - sum(tops)) + w_holes * count_holes(tops, filled, height)
+                 + w_bumpiness * count_bumpiness(tops))
+
+        if len(self.cache) >= self.cache_size:
+            del self.cache[next(iter(self.cache))]  # Забываю самую старую оценку.
+        self.cache[key] = value
+        return value
+
+    def best(self, field, figure: int, next_figure: int = None, tops: list = None) -> tuple:
+        """Метод для выбора лучшего положения тетрамино.
+
+        Аргументы:
+            field: list(int): заполненность стакана, по одной маске на линию.
+            figure: int: номер падающего тетрамино.
+            next_figure: int: номер следующего тетрамино, None - не заглядывать вперёд.
+            tops: list(int): верхний квадрат каждого столбца field, если он уже известен.
+
+        Возвращаемое значение:
+            tuple: лучшее положение (t, r, x, y) или None, если тетрамино некуда поставить.
+        """
+        w_lines = self.weights[1]
+        # Оцениваю все положения падающего тетрамино.
+        candidates = sorted(((self.evaluate(new) + w_lines * count, placement, new)
+                             for placement, new, count in placements(field, figure, self.width, tops)), reverse=True)
+        if next_figure is None or not candidates:
+            return candidates[0][1] if candidates else None
+
+        # Для нескольких лучших положений перебираю все положения следующего тетрамино.
+        best, best_value = None, None
+        for value, placement, new in candidates[:self.beam]:
+            values = [self.evaluate(new2) + w_lines * count2
+                      for _, new2, count2 in placements(new, next_figure, self.width)]
+            if not values:  # Следующее тетрамино уже некуда поставить.
+                continue
+            # Линии, собранные падающим тетрамино, уже учтены в value.
+            value += max(values) - self.evaluate(new)
+            if best_value is None or value > best_value:
+                best, best_value = placement, value
+        return best if best is not None else candidates[0][1]
+
+    def inputs(self, engine) -> list:
+        """Метод для получения кодов входных событий этого кадра.
+
+        Аргументы:
+            engine: engine.Engine: игра, которой управляет бот.
+
+        Возвращаемое значение:
+            list(int): коды входных событий для engine.step.
+        """
+        if self.pieces != engine.pieces:  # Появилось новое тетрамино - выбираю его положение.
+            self.pieces = engine.pieces
+            self.width = engine.width
+            next_figure = engine.next_figure[0] if self.lookahead else None
+            self.target = self.best(engine.field, engine.figure[0], next_figure, engine.tops)
+
+        codes = []
+        t, r, x, y = engine.figure
+        # Пока положение недостижимо (например, у верха стакана нельзя повернуть), тетрамино
+        # опускается само, и бот пробует снова в следующем кадре.
+        direction = None
+        if self.target is None:
+            pass
+        elif self.target[1] != r:
+            codes.append(ROTATE)
+        elif self.target[2] < x:
+            direction = LEFT
+        elif self.target[2] > x:
+            direction = RIGHT
+        acted = bool(codes) or direction is not None
+
+        # Каждый кадр отпускаю и снова нажимаю стрелку, чтобы тетрамино сдвигалось на клетку за кадр.
+        if self.pressed is not None:
+            codes.append(LEFT_UP if self.pressed == LEFT else RIGHT_UP)
+        if direction is not None:
+            codes.append(direction)
+        self.pressed = direction
+        if not acted:
+            codes.append(DOWN)  # Тетрамино на месте - устремляю его вниз.
+        return codes
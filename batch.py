@@ -0,0 +1,222 @@
+"""Пакетная среда Тетриса: N стаканов, которые шагают одновременно операциями NumPy.
+
+Правила совпадают с engine.Engine: те же тетрамино figures_pos, тот же «мешок» 7+2,
+те же очки lines_points и переход на следующий раунд после 6 линий. Один шаг - одно
+тетрамино: оно поворачивается, сдвигается в нужный столбец и падает до упора.
+"""
+
+import numpy as np
+
+from engine import WT, HT, FULL, states, figures
+
+# Стакан хранится с 4 заполненными линиями снизу, чтобы дно было обычным столкновением.
+PAD = 4
+# Маски линий каждого положения каждого тетрамино сверху вниз: MASKS[t, r, k], бит 0 - столбец LEFTS[t, r].
+# У квадрата одно положение, оно повторяется для всех 4 номеров поворота.
+MASKS = np.zeros((len(states), 4, 4), dtype=np.int64)
+LEFTS = np.zeros((len(states), 4), dtype=np.int64)  # Наименьшее смещение по оси 0x.
+RIGHTS = np.zeros((len(states), 4), dtype=np.int64)  # Наибольшее смещение по оси 0x.
+for t, figure_states in enumerate(states):
+    for r in range(4):
+        _, left, right, top, _, masks = figure_states[r % len(figure_states)]
+        LEFTS[t, r], RIGHTS[t, r] = left, right
+        for dy, mask in masks:
+            MASKS[t, r, dy - top] = mask
+# Номера линий, которые проверяются, если верхняя линия тетрамино стоит на линии y: WINDOWS[y].
+WINDOWS = np.arange(HT + 1)[:, None] + np.arange(4)
+# Очки за 0, 1, 2, 3, 4 линии в первом раунде, в раунде num они умножаются на num.
+POINTS = np.array((0, 100, 300, 700, 1500), dtype=np.int64)
+BAG = np.arange(len(figures), dtype=np.int8)  # Семь различных тетрамино «мешка».
+
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def splitmix(state: np.ndarray) -> np.ndarray:
+    """Перемешивает 64-битные числа алгоритмом SplitMix64.
+
+    Аргументы:
+        state: numpy.ndarray(uint64): состояния генераторов.
+
+    Возвращаемое значение:
+        numpy.ndarray(uint64): случайные числа.
+    """
+    z = state
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class BatchEngine:
+    """Класс BatchEngine ведёт n игр Тетрис одновременно.
+
+        Основное применение:
+            Обучение и оценка стратегий расстановки тетрамино на тысячах игр в одном процессе.
+
+        Примечание:
+            У каждой игры свой генератор случайностей, зависящий только от её зерна, поэтому
+            результат игры не зависит от n и от других игр. Окончившаяся игра сразу начинается заново,
+            продолжая тот же поток случайных чисел.
+
+        Атрибуты:
+            n: int: количество игр.
+            field: numpy.ndarray(int64): заполненность стаканов, форма (n, HT), бит x - столбец x.
+            figure: numpy.ndarray(int8): номер падающего тетрамино каждой игры.
+            next_figure: numpy.ndarray(int8): номер следующего тетрамино каждой игры.
+            num, score, lines, pieces: numpy.ndarray(int64): номер раунда, счёт, линии в раунде,
+                количество закреплённых тетрамино каждой игры.
+            games: numpy.ndarray(int64): количество оконченных игр в каждой ячейке.
+            final_score: numpy.ndarray(int64): счёт последней оконченной игры в каждой ячейке.
+
+        Методы:
+            reset(self, seeds):
+                Начинает все игры заново.
+
+            step(self, rotations, xs) -> tuple(numpy.ndarray, numpy.ndarray):
+                Ставит по одному тетрамино в каждой игре, возвращает полученные очки и признаки конца игры.
+    """
+    def __init__(self, n: int, seeds=None):
+        self.n = n
+        self.board = np.zeros((n, HT + PAD), dtype=np.int64)
+        self.field = self.board[:, :HT]
+        self.figure = np.zeros(n, dtype=np.int8)
+        self.next_figure = np.zeros(n, dtype=np.int8)
+        self.num = np.ones(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.games = np.zeros(n, dtype=np.int64)
+        self.final_score = np.zeros(n, dtype=np.int64)
+        self.bag = np.zeros((n, len(BAG) + 2), dtype=np.int8)
+        self.bag_pos = np.zeros(n, dtype=np.int64)  # Сколько тетрамино уже извлечено из «мешка».
+        self.state = np.zeros(n, dtype=np.uint64)  # Состояния генераторов случайностей.
+        self.reset(seeds)
+
+    def random(self, mask: np.ndarray, k: int) -> np.ndarray:
+        """Метод для получения k случайных чисел для каждой игры из mask.
+
+        Аргументы:
+            mask: numpy.ndarray(bool): игры, которым нужны случайные числа.
+            k: int: количество чисел для каждой игры.
+
+        Возвращаемое значение:
+            numpy.ndarray(uint64): случайные числа, форма (mask.sum(), k).
+        """
+        steps = GOLDEN * np.arange(1, k + 1, dtype=np.uint64)
+        state = self.state[mask][:, None] + steps
+        self.state[mask] += steps[-1]
+        return splitmix(state)
+
+    def fill_bags(self, mask: np.ndarray) -> None:
+        """Метод для наполнения «мешков» игр из mask: семь различных и ещё 2 случайных тетрамино.
+
+        Аргументы:
+            mask: numpy.ndarray(bool): игры, «мешки» которых нужно наполнить.
+
+        Возвращаемое значение:
+            None
+        """
+        if not mask.any():
+            return
+        z = self.random(mask, 2 + self.bag.shape[1])
+        bag = np.empty((len(z), self.bag.shape[1]), dtype=np.int8)
+        bag[:, :len(BAG)] = BAG
+        bag[:, len(BAG):] = z[:, :2] % np.uint64(len(BAG))
+        # Перемешиваю «мешки», упорядочивая их по случайным ключам.
+        order = np.argsort(z[:, 2:], axis=1)
+        self.bag[mask] = np.take_along_axis(bag, order, axis=1)
+        self.bag_pos[mask] = 0
+
+    def restart(self, mask: np.ndarray) -> None:
+        """Метод для начала новой игры в ячейках из mask.
+
+        Аргументы:
+            mask: numpy.ndarray(bool): игры, которые нужно начать заново.
+
+        Возвращаемое значение:
+            None
+        """
+        self.board[mask, :HT] = 0
+        self.board[mask, HT:] = FULL
+        self.num[mask] = 1
+        self.score[mask] = 0
+        self.lines[mask] = 0
+        self.pieces[mask] = 0
+        # Первые два тетрамино выбираются случайно, не из «мешка».
+        z = self.random(mask, 2) % np.uint64(len(BAG))
+        self.figure[mask], self.next_figure[mask] = z[:, 0], z[:, 1]
+        self.fill_bags(mask)
+
+    def reset(self, seeds=None) -> None:
+        """Метод для начала всех игр заново.
+
+        Аргументы:
+            seeds: iterable(int): зерно генератора случайностей каждой игры. По умолчанию - номера игр.
+
+        Возвращаемое значение:
+            None
+        """
+        seeds = np.arange(self.n) if seeds is None else np.asarray(seeds)
+        self.state[:] = splitmix(seeds.astype(np.uint64))
+        self.games[:] = 0
+        self.final_score[:] = 0
+        self.restart(np.ones(self.n, dtype=bool))
+
+    def step(self, rotations, xs) -> tuple:
+        """Метод для установки одного тетрамино в каждой игре.
+
+        Тетрамино поворачивается rotations раз, его центр сдвигается в столбец xs (с учётом границ
+        стакана), после чего оно падает с верха стакана до упора.
+
+        Аргументы:
+            rotations: array_like(int): количество поворотов тетрамино в каждой игре.
+            xs: array_like(int): столбец центра вращения тетрамино в каждой игре.
+
+        Возвращаемое значение:
+            tuple(numpy.ndarray, numpy.ndarray): очки, полученные в этом шаге, и признаки конца игры.
+        """
+        rows = np.arange(self.n)[:, None]
+        t = self.figure.astype(np.int64)
+        r = np.asarray(rotations, dtype=np.int64) % 4
+        left = LEFTS[t, r]
+        x = np.clip(np.asarray(xs, dtype=np.int64), -left, WT - 1 - RIGHTS[t, r])
+        masks = MASKS[t, r] << (x + left)[:, None]  # Маски линий тетрамино на его столбцах, форма (n, 4).
+
+        # Ищу первую линию сверху, на которой тетрамино сталкивается со стаканом или дном.
+        hits = (self.board[:, WINDOWS] & masks[:, None, :]).any(axis=2)
+        first = hits.argmax(axis=1)
+        blocked = first == 0  # Тетрамино не помещается даже на верхнюю линию.
+        land = np.maximum(first - 1, 0)
+        masks[blocked] = 0
+        self.board[rows, land[:, None] + np.arange(4)] |= masks
+        self.pieces += ~blocked
+
+        # Удаляю заполненные линии: переставляю их в начало стакана и очищаю.
+        field = self.board[:, :HT]
+        full = field == FULL
+        count = full.sum(axis=1)
+        order = np.argsort(~full, axis=1, kind="stable")
+        field = np.take_along_axis(field, order, axis=1)
+        field[np.arange(HT) < count[:, None]] = 0
+        self.board[:, :HT] = field
+
+        # Начисляю очки и перехожу на следующий раунд.
+        rewards = POINTS[count] * self.num
+        self.score += rewards
+        self.lines += count
+        new_round = self.lines > 5
+        self.num += new_round
+        self.lines[new_round] = 0
+
+        # Беру следущие тетрамино из «мешков».
+        self.figure[:] = self.next_figure
+        self.fill_bags(self.bag_pos >= self.bag.shape[1])
+        self.next_figure[:] = self.bag[rows[:, 0], self.bag_pos]
+        self.bag_pos += 1
+
+        # Конец игры, если тетрамино не поместилось или в первой линии есть любой квадрат.
+        dones = blocked | (self.board[:, 0] != 0)
+        if dones.any():
+            self.games += dones
+            self.final_score[dones] = self.score[dones]
+            self.restart(dones)
+        return rewards, dones
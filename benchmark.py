@@ -0,0 +1,265 @@
+"""Замеры скорости основных операций игры.
+
+Запуск:
+    python benchmark.py [-o results.json] [--quick]
+        Выполняет все замеры и записывает результаты вместе со сведениями о машине в JSON.
+    python benchmark.py --compare old.json new.json [--threshold 0.1]
+        Сравнивает два файла результатов. Если какая-то операция стала медленнее больше чем
+        на threshold, печатает её и завершается с кодом 1.
+
+Отрисовка замеряется с видеодрайвером SDL dummy, поэтому дисплей не нужен. Если pygame
+или ресурсы игры недоступны, замеры отрисовки пропускаются с указанием причины.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from random import Random
+
+from engine import Engine, FULL, HT, figures, restore, LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP
+from pieces import POLICIES, generate
+from records import RecordStore, format_record
+
+# Скриптованные входные события для целых игр: случайные, но одинаковые при каждом запуске.
+SCRIPT = (LEFT, LEFT_UP, RIGHT, RIGHT_UP, ROTATE, DOWN, None, None)
+RECORDS = 20000  # Размер таблицы рекордов для замеров.
+
+
+def measure(func, number: int, repeat: int) -> float:
+    """Замеряет лучшее время одного вызова func.
+
+    Аргументы:
+        func: function: замеряемая функция без аргументов.
+        number: int: количество вызовов в одном замере.
+        repeat: int: количество замеров.
+
+    Возвращаемое значение:
+        float: лучшее время одного вызова в секундах.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def filled_engine(seed: int = 0) -> Engine:
+    """Возвращает игру с наполовину заполненным стаканом без заполненных линий."""
+    engine = Engine(seed=seed)
+    random = Random(seed)
+    for y in range(HT // 2, HT):
+        engine.field[y] = FULL & ~(1 << random.randrange(10))
+    engine.reindex()  # Стакан заполнен в обход движка: верх столбцов и количество квадратов находятся заново.
+    return engine
+
+
+def check_index(engine: Engine) -> None:
+    """Проверяет, что верх столбцов и количество квадратов, которые движок обновлял по ходу замера,
+    совпадают с найденными заново по стакану: иначе замер измерял не то состояние игры."""
+    tops, filled = engine.tops, engine.filled
+    engine.reindex()
+    assert (tops, filled) == (engine.tops, engine.filled), "индекс стакана разошёлся со стаканом"
+
+
+def play_game(seed: int) -> Engine:
+    """Играет одну игру без дисплея со скриптованными входными событиями."""
+    engine = Engine(seed=seed)
+    random = Random(seed)
+    step = engine.step
+    while not engine.over:
+        code = SCRIPT[random.randrange(len(SCRIPT))]
+        step(() if code is None else (code, ))
+    return engine
+
+
+def engine_benchmarks(quick: bool) -> dict:
+    """Замеры движка: столкновения, границы, поворот, удаление линий, снимки, генератор, целые игры."""
+    scale = 10 if quick else 1
+    results = {}
+    engine = filled_engine()
+    figure = (engine.figure[0], 0, 4, HT // 2 - 2)
+    wall = (figures[0][0], 0, -5, 5)  # Тетрамино далеко за левой границей стакана.
+    results["collision"] = measure(lambda: engine.collision(figure), 200000 // scale, 5)
+    results["collision_bounds"] = measure(lambda: engine.collision(wall), 200000 // scale, 5)
+
+    def rotate():
+        engine.figure = (figures[2][0], 0, 4, 5)
+        engine.rotate()
+    results["rotate"] = measure(rotate, 100000 // scale, 5)
+
+    full = filled_engine()
+    rows = full.field[:]
+    rows[HT - 1] = rows[HT - 3] = FULL
+    full.field = rows[:]
+    full.reindex()
+    tops, filled = full.tops[:], full.filled
+
+    def clear():
+        full.field, full.tops, full.filled = rows[:], tops[:], filled
+        full.clear()
+    results["line_clear"] = measure(clear, 100000 // scale, 5)
+    check_index(full)
+    results["line_clear_none"] = measure(engine.clear, 200000 // scale, 5)
+
+    # Снимок игры и восстановление из него: в новую игру, как при переборе ходов, и в существующую.
+    snapshot = engine.snapshot()
+    fork = restore(snapshot)
+    results["snapshot"] = measure(engine.snapshot, 100000 // scale, 5)
+    results["restore"] = measure(lambda: restore(snapshot), 100000 // scale, 5)
+    results["restore_in_place"] = measure(lambda: fork.restore(snapshot), 100000 // scale, 5)
+
+    generator = POLICIES["bag9"](Random(1))
+    results["randomizer"] = measure(lambda: next(generator), 200000 // scale, 5)
+    # Последовательность из 100000 тетрамино для моделирования, по каждому правилу.
+    for name in POLICIES:
+        results[f"pieces_{name}"] = measure(lambda: generate(100000, 1, name), 1, 3)
+
+    # Целые игры: сколько игр в секунду и тиков в секунду.
+    games, ticks = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < (0.5 if quick else 3):
+        ticks += play_game(games).frames
+        games += 1
+    elapsed = time.perf_counter() - start
+    results["game"] = elapsed / games
+    results["tick"] = elapsed / ticks
+    return results
+
+
+def records_benchmarks(quick: bool) -> dict:
+    """Замеры таблицы рекордов с RECORDS рекордами во временной папке."""
+    scale = 10 if quick else 1
+    results = {}
+    random = Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "records.txt")
+        with open(filename, "wb") as f:
+            f.write(b"".join(format_record(random.randrange(10 ** 6), f"player{i}") for i in range(RECORDS)))
+        results["records_load"] = measure(lambda: RecordStore(filename), 1, 3)
+        store = RecordStore(filename, compact_every=10 ** 9)
+        results["records_add"] = measure(lambda: store.add(random.randrange(10 ** 6), "player"), 200 // scale, 3)
+        results["records_rank"] = measure(lambda: store.rank(random.randrange(10 ** 6)), 100000 // scale, 5)
+        results["records_top"] = measure(lambda: store.top(5), 100000 // scale, 5)
+        results["records_compact"] = measure(store.compact, 1, 3)
+    return results
+
+
+def render_benchmarks(quick: bool) -> dict:
+    """Замеры, которым нужен pygame: запуск до первого кадра меню и кадр Round под видеодрайвером dummy."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        import main
+        import pygame as pg
+        # Запуск: окно, фон, шрифты и первый кадр главного меню.
+        start = time.perf_counter()
+        main.init()
+        main.screen.blit(main.background(), (0, 0))
+        main.main_menu().render(None)
+        pg.display.flip()
+        startup = time.perf_counter() - start
+    except Exception as error:  # Нет pygame или ресурсов - замеры отрисовки пропускаются.
+        return {"skipped": f"{type(error).__name__}: {error}"}
+
+    scale = 10 if quick else 1
+    results = {"startup": startup}
+    round_ = main.Round()
+    round_.engine = filled_engine()
+
+    def full_frame():
+        round_.draw(True)
+        pg.display.flip()
+    results["frame_full"] = measure(full_frame, 200 // scale, 3)
+
+    def frame():
+        round_.tick([])
+        pg.display.update(round_.draw())
+    round_.draw(True)
+    results["frame"] = measure(frame, 2000 // scale, 3)
+    check_index(round_.engine)
+    return results
+
+
+def machine() -> dict:
+    """Сведения о машине и версии кода, на которых выполнены замеры."""
+    info = {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        info["commit"] = subprocess.run(("git", "rev-parse", "HEAD"), capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        pass
+    try:
+        import pygame
+        info["pygame"] = pygame.version.ver
+    except ImportError:
+        pass
+    return info
+
+
+def compare(old: dict, new: dict, threshold: float) -> list:
+    """Сравнивает два файла результатов.
+
+    Аргументы:
+        old: dict: прежние результаты.
+        new: dict: новые результаты.
+        threshold: float: допустимое замедление, 0.1 - на 10%.
+
+    Возвращаемое значение:
+        list(str): названия операций, которые замедлились больше чем на threshold.
+    """
+    regressions = []
+    old_results, new_results = old["results"], new["results"]
+    for name in sorted(set(old_results) & set(new_results)):
+        before, after = old_results[name], new_results[name]
+        if not isinstance(before, float) or not isinstance(after, float):
+            continue
+        change = after / before - 1
+        mark = ""
+        if change > threshold:
+            mark = "  <- медленнее"
+            regressions.append(name)
+        print(f"{name:20} {before * 1e6:12.3f} мкс {after * 1e6:12.3f} мкс {change:+8.1%}{mark}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замеры скорости основных операций игры.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="файл для результатов")
+    parser.add_argument("--quick", action="store_true", help="короткие замеры для быстрой проверки")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла результатов")
+    parser.add_argument("--threshold", type=float, default=0.1, help="допустимое замедление при сравнении")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            regressions = compare(json.load(old), json.load(new), args.threshold)
+        return 1 if regressions else 0
+
+    results = engine_benchmarks(args.quick)
+    results.update(records_benchmarks(args.quick))
+    results.update(render_benchmarks(args.quick))
+    for name, value in results.items():
+        print(f"{name:20} {value * 1e6:12.3f} мкс" if isinstance(value, float) else f"{name:20} {value}")
+    with open(args.output, "w") as f:
+        json.dump({"machine": machine(), "results": results}, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
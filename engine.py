@@ -0,0 +1,870 @@
+"""Игровая логика Тетриса без зависимости от pygame.
+
+Модуль не открывает окно и не инициализирует SDL, поэтому движок можно
+запускать на серверах без дисплея: для ботов, повторов и нагрузочных тестов.
+"""
+
+import struct
+from functools import lru_cache
+from random import Random, randrange
+
+from pieces import POLICIES, DEFAULT, NAMES, shared
+
+WT, HT = 10, 20  # Ширина и высота прямоугольного стакана тетриса по умолчанию.
+FULL = (1 << WT) - 1  # Маска заполненной линии стакана по умолчанию.
+# Координаты каждого квадрата тетрамино, где первая координата каждого тетрамино - его центр вращения.
+figures_pos = [[(-1, -1), (-2, -1), (0, -1), (1, -1)],
+               [(0, -1), (-1, -1), (-1, 0), (0, 0)],
+               [(-1, 0), (-1, 1), (0, 0), (0, -1)],
+               [(0, 0), (-1, 0), (0, 1), (-1, -1)],
+               [(0, 0), (0, -1), (0, 1), (-1, -1)],
+               [(0, 0), (0, -1), (0, 1), (1, -1)],
+               [(0, 0), (0, -1), (0, 1), (-1, 0)]]
+TICK_MS = 16  # Длительность одного шага (тика) движка в миллисекундах.
+MAX_TICKS = 8  # Наибольшее количество тиков за один кадр, чтобы медленный кадр не копил отставание.
+# Смещения, которые по очереди пробуются при повороте у стены или у других тетрамино.
+KICKS = ((0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0))
+# Настройки управления по умолчанию:
+# [0] DAS - через сколько тиков удержания стрелки тетрамино начинает сдвигаться само,
+# [1] ARR - через сколько тиков повторяется сдвиг, 0 - сразу до упора,
+# [2] на сколько клеток за тик опускается тетрамино, устремлённое вниз.
+# None в DAS и ARR - как в оригинальной игре: сдвиг раз в 2000 // speed_x(num) + 1 тиков, быстрее с каждым раундом.
+HANDLING = (None, None, 1)
+# Правила очков и скорости (RULES): очки за 1, 2, 3, 4 линии в первом раунде, в раунде num они умножаются на num;
+# скорость падения и скорость сдвига по оси 0x - пары (a, b), в раунде num скорость равна a + b * num.
+POINTS = (100, 300, 700, 1500)
+SPEED_Y = (40, 20)
+SPEED_X = (360, 7)
+RULES = (POINTS, SPEED_Y, SPEED_X)
+# Сколько линий мусора уходит соперникам за 0, 1, 2, 3, 4 собранные линии в игре против других игроков.
+GARBAGE = (0, 0, 1, 2, 4)
+
+# Снимок состояния игры (Engine.snapshot): заголовок SNAPSHOT, затем количество квадратов и верх каждого столбца
+# (index_struct), чтобы не искать их заново при восстановлении, затем height линий стакана, каждая - целое
+# без знака наименьшего из размеров 1, 2, 4, 8 байт, в который помещается width бит. NONE - None или готовая
+# последовательность тетрамино вместо правила.
+SNAPSHOT = struct.Struct("<4sQBBBBHHIIBBhhBHIB?IIHIIHH?HH?")
+SNAPSHOT_MAGIC = b"TTS1"
+NONE = 255
+HANDLING_MAX = NONE - 1  # Наибольшая настройка управления: снимки и повторы хранят её байтом, NONE занят.
+
+# Коды входных событий движка. PAUSE движок пропускает, он нужен только для записи повторов.
+# HARD_DROP сразу опускает тетрамино до упора и закрепляет его.
+LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP, PAUSE, HARD_DROP = range(8)
+
+
+def build_states(figure_pos) -> tuple:
+    """Разворачивает тетрамино во все его положения при повороте.
+
+    Поворот на 90 градусов выполняется вокруг первого квадрата тетрамино. Квадрат не вращается.
+
+    Аргументы:
+        figure_pos: list(tuple): координаты квадратов тетрамино из figures_pos.
+
+    Возвращаемое значение:
+        tuple(tuple): положения тетрамино:
+        {
+            states[r][0]: tuple(tuple): смещения квадратов относительно центра вращения.
+            states[r][1]: int: наименьшее смещение по оси 0x.
+            states[r][2]: int: наибольшее смещение по оси 0x.
+            states[r][3]: int: наименьшее смещение по оси 0y.
+            states[r][4]: int: наибольшее смещение по оси 0y.
+            states[r][5]: tuple(tuple): пары (смещение по оси 0y, маска линии), бит 0 маски - столбец states[r][1].
+        }
+    """
+    cx, cy = figure_pos[0]
+    offsets = tuple((x - cx, y - cy) for x, y in figure_pos)
+    states = []
+    for _ in range(1 if is_square(offsets) else 4):
+        left = min(dx for dx, _ in offsets)
+        masks = {}
+        for dx, dy in offsets:
+            masks[dy] = masks.get(dy, 0) | 1 << (dx - left)
+        states.append((offsets, left, max(dx for dx, _ in offsets),
+                       min(dy for _, dy in offsets), max(dy for _, dy in offsets), tuple(sorted(masks.items()))))
+        offsets = tuple((-dy, dx) for dx, dy in offsets)  # Поворачиваю тетрамино на 90 градусов.
+    return tuple(states)
+
+
+def is_square(figure) -> bool:
+    """Проверка тетрамино на квадратность.
+
+    Аргументы:
+        figure: tuple(tuple): координаты квадратов тетрамино. Длина - 4.
+
+    Возвращаемое значение:
+        bool: True - если тетрамино квадратно, иначе - False.
+    """
+    return (figure[0][0] == figure[3][0] and figure[1][0] == figure[2][0] and figure[0][1] == figure[1][1]
+            and figure[2][1] == figure[3][1])
+
+
+# Положения каждого тетрамино при повороте, вычисляются один раз при загрузке модуля.
+states = tuple(build_states(figure_pos) for figure_pos in figures_pos)
+# Тетрамино в начале падения: (номер тетрамино, номер положения, x центра, y центра).
+figures = tuple((t, 0, figure_pos[0][0] + 5, figure_pos[0][1] + 1) for t, figure_pos in enumerate(figures_pos))
+# Нижний квадрат каждого столбца каждого положения тетрамино: columns[t][r] = ((dx, dy), ...).
+columns = tuple(tuple(tuple((dx, max(y for x, y in offsets if x == dx))
+                            for dx in sorted({x for x, _ in offsets}))
+                      for offsets, *_ in figure_states)
+                for figure_states in states)
+
+
+def cells(figure) -> list:
+    """Возвращает координаты квадратов тетрамино на сетке стакана.
+
+    Аргументы:
+        figure: tuple: тетрамино (номер тетрамино, номер положения, x центра, y центра).
+
+    Возвращаемое значение:
+        list(tuple): координаты квадратов тетрамино, первая - центр вращения.
+    """
+    t, r, x, y = figure
+    return [(x + dx, y + dy) for dx, dy in states[t][r][0]]
+
+
+def column_tops(field, width: int = WT) -> list:
+    """Возвращает номер верхней занятой линии каждого столбца стакана одним проходом сверху вниз.
+
+    Аргументы:
+        field: list(int): заполненность стакана, по одной маске на линию.
+        width: int: ширина стакана.
+
+    Возвращаемое значение:
+        list(int): верх каждого столбца, len(field) - пустой столбец.
+    """
+    height, full = len(field), (1 << width) - 1
+    tops, seen = [height] * width, 0
+    for y, row in enumerate(field):
+        new = row & ~seen  # Столбцы, верхний квадрат которых находится в этой линии.
+        while new:
+            low = new & -new
+            tops[low.bit_length() - 1] = y
+            new ^= low
+        seen |= row
+        if seen == full:  # У всех столбцов верх уже найден.
+            break
+    return tops
+
+
+def count_filled(field) -> int:
+    """Возвращает количество квадратов в стакане field."""
+    return sum(bin(row).count("1") for row in field)
+
+
+def count_holes(tops: list, filled: int, height: int) -> int:
+    """Возвращает количество дыр - пустых клеток под верхом своего столбца - по верху столбцов tops
+    и количеству квадратов filled стакана высоты height."""
+    return len(tops) * height - sum(tops) - filled
+
+
+def count_bumpiness(tops: list) -> int:
+    """Возвращает неровность стакана - сумму модулей разниц высот соседних столбцов - по верху столбцов tops."""
+    return sum(abs(a - b) for a, b in zip(tops, tops[1:]))
+
+
+def lines_points(num: int, points: tuple = POINTS) -> tuple:
+    """Количество очков за 1, 2, 3, 4 линии в раунде num по очкам points первого раунда."""
+    return tuple(value * num for value in points)
+
+
+def speed_y(num: int, curve: tuple = SPEED_Y) -> int:
+    """Скорость падения тетрамино по оси 0y в раунде num по кривой curve = (a, b)."""
+    return curve[0] + curve[1] * num
+
+
+def speed_x(num: int, curve: tuple = SPEED_X) -> int:
+    """Скорость движения тетрамино по оси 0x в раунде num по кривой curve = (a, b)."""
+    return curve[0] + curve[1] * num
+
+
+@lru_cache(maxsize=None)
+def round_rules(num: int, rules: tuple = RULES) -> tuple:
+    """Возвращает (очки за 1, 2, 3, 4 линии, скорость падения, период сдвига в тиках) раунда num по правилам rules."""
+    points, fall, shift = rules
+    return lines_points(num, points), speed_y(num, fall), 2000 // speed_x(num, shift) + 1
+
+
+class Engine:
+    """Класс Engine хранит и изменяет состояние одной игры Тетрис.
+
+        Основное применение:
+            Используется классом Round из main.py, ботами и инструментами без дисплея.
+
+        Атрибуты:
+            field: list(int): заполненность стакана, по одной маске на линию, бит x - столбец x.
+            figure: tuple: падающее тетрамино (номер тетрамино, номер положения, x центра, y центра).
+            next_figure: tuple: следующее тетрамино в том же формате.
+            num: int: номер раунда.
+            score: int: счёт.
+            lines: int: количество собранных линий в текущем раунде.
+            over: bool: True - если игра окончена.
+            pieces: int: количество закреплённых тетрамино.
+            kicks: tuple(tuple): смещения, которые по очереди пробуются при повороте.
+            handling: tuple: настройки управления (DAS, ARR, клеток за тик при падении вниз), см. HANDLING.
+            rules: tuple: очки первого раунда и кривые скорости падения и сдвига, см. RULES.
+            seed: int: зерно генератора случайностей игры.
+            policy: str: правило выбора тетрамино из pieces.POLICIES или None, если тетрамино
+                берутся из готовой последовательности sequence.
+            frames: int: количество пройденных тиков.
+            incoming: int: линии мусора от соперников, которые поднимутся при следующем закреплении без линий.
+            sent: int: сколько линий мусора отправлено соперникам за игру.
+            width: int: ширина стакана.
+            height: int: высота стакана.
+            full: int: маска заполненной линии стакана.
+            changed: tuple: (первая линия, линия после последней) линий стакана, изменившихся с последнего
+                вызова take_changed, или None.
+            tops: list(int): номер верхней занятой линии каждого столбца, height - пустой столбец.
+            filled: int: количество квадратов в стакане.
+            drawn: int: сколько тетрамино взято из последовательности.
+            raised: int: сколько раз поднимался мусор.
+
+        Примечание:
+            Игра полностью определяется зерном seed, правилом policy и кодами входных событий каждого кадра,
+            поэтому её можно точно воспроизвести. Мусор от соперников приходит извне, поэтому
+            игры против других игроков так не воспроизводятся.
+
+            Размер стакана задаётся при создании игры. Столкновение проверяет только линии тетрамино,
+            закрепление ищет заполненные линии только среди линий тетрамино, а конец игры - в первой линии,
+            поэтому тик стоит одинаково на стакане 10x20 и 60x120.
+
+            Верх каждого столбца tops обновляется при закреплении и удалении линий, а не ищется заново.
+            По нему положение тетрамино после падения до упора находится за количество столбцов тетрамино,
+            а не проверкой столкновения на каждой линии ниже. Кто меняет field напрямую, вызывает reindex.
+
+            Снимок snapshot - байты фиксированного для размера стакана размера (111 байт для 10x20).
+            Генератор тетрамино в снимок не попадает: восстановленная игра берёт тетрамино с номера drawn
+            из общей последовательности pieces.shared того же правила и зерна. Так снимок и восстановление
+            занимают микросекунды, и тысячи игр, восстановленных из одного снимка, не генерируют тетрамино
+            заново. Время отрисовки (доля тика, прошлое положение тетрамино) в снимок не входит.
+
+        Методы:
+            collision(self, figure) -> bool:
+                Проверяет тетрамино на выход за границы стакана и столкновение с квадратами других тетрамино.
+
+            rotate(self) -> bool:
+                Поворачивает падающее тетрамино, пробуя смещения self.kicks.
+
+            spawn(self, figure) -> tuple:
+                Ставит тетрамино в начале падения посередине стакана.
+
+            clear(self, rows) -> int:
+                Удаляет заполненные линии, возвращает их количество.
+
+            touch(self, first: int, last: int):
+                Отмечает линии стакана с first по last - 1 изменившимися.
+
+            take_changed(self) -> tuple:
+                Возвращает линии, изменившиеся с прошлого вызова.
+
+            reindex(self):
+                Заново находит верх каждого столбца и количество квадратов по field.
+
+            drop_y(self, figure) -> int:
+                Возвращает y центра тетрамино после падения до упора.
+
+            heights(self) -> list(int):
+                Возвращает высоту каждого столбца.
+
+            holes(self) -> int:
+                Возвращает количество дыр - пустых клеток под верхом своего столбца.
+
+            bumpiness(self) -> int:
+                Возвращает неровность - сумму разниц высот соседних столбцов.
+
+            lock(self) -> int:
+                Закрепляет падающее тетрамино в стакане, возвращает количество собранных линий.
+
+            add_garbage(self, rows: int):
+                Добавляет линии мусора от соперников.
+
+            raise_garbage(self):
+                Поднимает пришедший мусор со дна стакана.
+
+            step(self, inputs) -> int:
+                Продвигает игру на один тик, возвращает количество собранных линий.
+
+            snapshot(self) -> bytes:
+                Возвращает снимок состояния игры.
+
+            restore(self, data: bytes, sequence):
+                Восстанавливает состояние игры из снимка.
+    """
+    def __init__(self, kicks: tuple = KICKS, seed: int = None, handling: tuple = HANDLING, width: int = WT,
+                 height: int = HT, policy: str = DEFAULT, sequence=None, rules: tuple = RULES):
+        self.kicks = kicks
+        self.rules = rules
+        self.width, self.height = width, height
+        self.full = (1 << width) - 1
+        self.offset = (width - WT) // 2  # Сдвиг тетрамино figures к середине стакана нестандартной ширины.
+        self.handling = handling
+        self.das, self.arr, self.soft_drop = handling
+        # Собственный генератор случайностей, чтобы игру можно было повторить по зерну.
+        self.seed = randrange(2 ** 32) if seed is None else seed
+        self.random = Random(self.seed)
+        # Генератор индексов для массива figures: правило policy или готовая последовательность,
+        # например pieces.Sequence, общая для нескольких игр.
+        if sequence is None:
+            self.policy = policy
+            self.generator = POLICIES[policy](self.random)
+        else:
+            self.policy = None
+            self.generator = iter(sequence)
+        self.figure = self.spawn(figures[next(self.generator)])
+        self.next_figure = figures[next(self.generator)]
+        self.drawn = 2  # Сколько тетрамино взято из последовательности.
+        # Маски линий, отображающие заполненность стакана.
+        self.field = [0] * height
+        self.changed = None  # Линии, изменившиеся с последнего вызова take_changed.
+        self.tops = [height] * width  # Верх каждого столбца, в начале все столбцы пусты.
+        self.filled = 0  # Количество квадратов в стакане.
+        self.num = 1  # Номер раунда, при создании раунда равен 1.
+        self.score = 0  # Рекорд при создании раунда равен 0.
+        self.lines = 0  # Количество собранных линий в раунде.
+        self.over = False  # Игра не окончена.
+        self.pieces = 0  # Количество закреплённых тетрамино.
+        self.frames = 0  # Количество пройденных тиков.
+        self.incoming = 0  # Линии мусора, которые ещё не поднялись в стакан.
+        self.sent = 0  # Линии мусора, отправленные соперникам.
+        # Дыры в мусоре выбирает отдельный генератор, чтобы мусор не менял последовательность тетрамино.
+        self.hole_random = Random(self.seed + 2 ** 32)
+        self.raised = 0  # Сколько раз поднимался мусор.
+        self.stack = [None]  # Очередь действий, в начале тетрамино не нужно никуда двигать.
+        self.set_round(self.num)
+
+    def set_round(self, num: int) -> None:
+        """Обновляет переменные, зависящие от номера раунда, и начинает движение тетрамино заново.
+
+        Аргументы:
+            num: int: номер раунда.
+
+        Возвращаемое значение:
+            None
+        """
+        self.load_round(num)
+        # Переменные для контролирования движения тетрамино по осям 0y и 0x.
+        self.anim_count_y, self.anim_limit_y = 0, 2000
+        self.shift_count = 0  # Количество тиков с последнего сдвига.
+        self.repeating = False  # Прошла ли задержка shift_delay у удерживаемой стрелки.
+
+    def load_round(self, num: int) -> None:
+        """Задаёт очки и скорости раунда num, не трогая счётчики движения тетрамино.
+
+        Аргументы:
+            num: int: номер раунда.
+
+        Возвращаемое значение:
+            None
+        """
+        self.num = num
+        self.lines_points, self.anim_speed_y, period = round_rules(num, self.rules)
+        # Задержка автоповтора сдвига по оси 0x и период повторов в тиках.
+        self.shift_delay = period if self.das is None else self.das
+        self.shift_repeat = period if self.arr is None else self.arr
+
+    def collision(self, figure) -> bool:
+        """Метод для проверки тетрамино на выход за границы стакана и столкновение с квадратами других тетрамино.
+
+        Аргументы:
+                figure: tuple: тетрамино (номер тетрамино, номер положения, x центра, y центра).
+
+        Возвращаемое значение:
+                bool: True - если тетрамино вышло за границы или столкнулось, иначе - False.
+        """
+        t, r, x, y = figure
+        _, left, right, top, bottom, masks = states[t][r]
+        if x + left < 0 or x + right >= self.width or y + top < 0 or y + bottom >= self.height:
+            return True
+        field = self.field
+        x += left
+        for dy, mask in masks:
+            if field[y + dy] & mask << x:
+                return True
+        return False
+
+    def rotate(self) -> bool:
+        """Метод для поворота падающего тетрамино на 90 градусов.
+
+        Смещения self.kicks пробуются по очереди, тетрамино занимает первое свободное положение.
+
+        Возвращаемое значение:
+            bool: True - если тетрамино повернулось, иначе - False.
+        """
+        t, r, x, y = self.figure
+        r = (r + 1) % len(states[t])
+        for dx, dy in self.kicks:
+            figure = (t, r, x + dx, y + dy)
+            if not self.collision(figure):
+                self.figure = figure
+                return True
+        return False
+
+    def spawn(self, figure) -> tuple:
+        """Возвращает тетрамино figure из figures в начале падения посередине стакана этой игры."""
+        if not self.offset:
+            return figure
+        t, r, x, y = figure
+        return t, r, x + self.offset, y
+
+    def clear(self, rows=None) -> int:
+        """Метод для удаления заполненных линий.
+
+        Аргументы:
+            rows: iterable(int): линии по возрастанию, которые могли заполниться, например линии закреплённого
+                тетрамино. None - проверяются все линии стакана.
+
+        Возвращаемое значение:
+            int: количество удалённых линий.
+        """
+        field, full = self.field, self.full
+        cleared = [y for y in (range(self.height) if rows is None else rows) if field[y] == full]
+        if cleared:
+            for y in reversed(cleared):
+                del field[y]
+            # Добавляю пустые линии в начало cтакана вместо удалённых, линии над удалёнными сдвинулись вниз.
+            count = len(cleared)
+            field[:0] = [0] * count
+            self.touch(0, cleared[-1] + 1)
+            # Удалённые линии заполнены, поэтому верх любого столбца не ниже первой из них. Столбцы, верх
+            # которых выше, опустились на count линий. Верх остальных был в удалённой линии, а над ней
+            # они пусты: ищу новый верх таких столбцов ниже сдвинутых вниз пустых клеток.
+            first, tops = cleared[0], self.tops
+            for c, top in enumerate(tops):
+                if top < first:
+                    tops[c] = top + count
+                else:
+                    bit, y = 1 << c, first + count
+                    while y < self.height and not field[y] & bit:
+                        y += 1
+                    tops[c] = y
+            self.filled -= count * self.width
+        return len(cleared)
+
+    def reindex(self) -> None:
+        """Метод для поиска верха каждого столбца и количества квадратов заново по заполненности стакана.
+
+        Возвращаемое значение:
+            None
+        """
+        self.tops = column_tops(self.field, self.width)
+        self.filled = count_filled(self.field)
+
+    def drop_y(self, figure=None) -> int:
+        """Метод для поиска положения тетрамино после падения до упора.
+
+        Если под каждым столбцом тетрамино до верха столбца пусто, тетрамино падает, пока один из его
+        нижних квадратов не встанет на верх своего столбца. Тетрамино, задвинутое под нависающие квадраты,
+        опускается по одной линии с проверкой столкновения.
+
+        Аргументы:
+            figure: tuple: тетрамино (t, r, x, y), по умолчанию - падающее.
+
+        Возвращаемое значение:
+            int: y центра тетрамино после падения.
+        """
+        t, r, x, y = self.figure if figure is None else figure
+        tops, land = self.tops, self.height
+        for dx, dy in columns[t][r]:
+            top = tops[x + dx]
+            if y + dy >= top:
+                break
+            land = min(land, top - 1 - dy)
+        else:
+            return land
+        while not self.collision((t, r, x, y + 1)):
+            y += 1
+        return y
+
+    def heights(self) -> list:
+        """Метод для получения высоты каждого столбца.
+
+        Возвращаемое значение:
+            list(int): высота столбцов, 0 - пустой столбец.
+        """
+        return [self.height - top for top in self.tops]
+
+    def holes(self) -> int:
+        """Метод для подсчёта дыр: клеток под верхом столбца, которые не заняты квадратами.
+
+        Возвращаемое значение:
+            int: количество дыр.
+        """
+        return count_holes(self.tops, self.filled, self.height)
+
+    def bumpiness(self) -> int:
+        """Метод для подсчёта неровности стакана.
+
+        Возвращаемое значение:
+            int: сумма модулей разниц высот соседних столбцов.
+        """
+        return count_bumpiness(self.tops)
+
+    def touch(self, first: int, last: int) -> None:
+        """Метод для отметки изменившихся линий стакана.
+
+        Аргументы:
+            first: int: первая изменившаяся линия.
+            last: int: линия после последней изменившейся.
+
+        Возвращаемое значение:
+            None
+        """
+        if self.changed is None:
+            self.changed = (first, last)
+        else:
+            self.changed = (min(first, self.changed[0]), max(last, self.changed[1]))
+
+    def take_changed(self) -> tuple:
+        """Метод для получения линий стакана, изменившихся с прошлого вызова. Отрисовка перерисовывает только их.
+
+        Возвращаемое значение:
+            tuple: (первая линия, линия после последней) или None, если стакан не менялся.
+        """
+        changed, self.changed = self.changed, None
+        return changed
+
+    def step(self, inputs=()) -> int:
+        """Метод для продвижения игры на один тик длительностью TICK_MS миллисекунд.
+
+        Скорость игры зависит только от количества тиков, а не от частоты кадров отрисовки.
+
+        Аргументы:
+            inputs: iterable(int): коды входных событий этого тика: LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP,
+                PAUSE, HARD_DROP.
+
+        Возвращаемое значение:
+            int: количество собранных за тик линий.
+        """
+        if self.over:
+            return 0
+        self.frames += 1
+
+        rotate = False  # В начале тетрамино не нужно поворачивать.
+        hard_drop = False  # Нужно ли сбросить тетрамино до упора в этом тике.
+        pressed = False  # Нажата ли стрелка влево или вправо в этом тике.
+        for code in inputs:
+            if code == LEFT:
+                pressed = True  # Сдвигаю тетромино на одну клетку влево в этом же тике.
+                self.stack.append(LEFT)  # Добавляю действие двигаться влево в очередь действий.
+            elif code == RIGHT:
+                pressed = True  # Сдвигаю тетромино на одну клетку вправо в этом же тике.
+                self.stack.append(RIGHT)  # Добавляю действие двигаться вправо в очередь действий.
+            elif code == DOWN:
+                self.anim_limit_y = 0  # Устремляю тетромино вниз стакана.
+            elif code == ROTATE and len(states[self.figure[0]]) > 1:
+                rotate = True  # Тетрамино необходимо повернуть.
+            elif code == HARD_DROP:
+                hard_drop = True  # Сбрасываю тетрамино после сдвига и поворота этого тика.
+            # Клавишу могли нажать ещё до начала игры, поэтому действия может не быть в очереди.
+            elif code == LEFT_UP and LEFT in self.stack:
+                self.stack.remove(LEFT)  # Удаляю действие двигаться влево из очереди действий.
+            elif code == RIGHT_UP and RIGHT in self.stack:
+                self.stack.remove(RIGHT)  # Удаляю действие двигаться вправо из очереди действий.
+
+        # Вектор движения равен последнему действию.
+        if self.stack[-1] == LEFT:
+            dx = -1
+        elif self.stack[-1] == RIGHT:
+            dx = 1
+        else:
+            dx = 0
+
+        # Двигаю тетрамино по оси 0x: сразу при нажатии, затем через shift_delay тиков удержания
+        # и дальше раз в shift_repeat тиков.
+        moves = 0
+        if pressed:
+            self.shift_count, self.repeating = 0, False
+            moves = 1
+        else:
+            self.shift_count += 1
+            if self.shift_count >= (self.shift_repeat if self.repeating else self.shift_delay):
+                self.shift_count = 0
+                if dx:
+                    self.repeating = True
+                    moves = 1 if self.shift_repeat else self.width  # При ARR 0 тетрамино сдвигается до упора.
+        t, r, x, y = self.figure
+        for _ in range(moves if dx else 0):
+            figure = (t, r, x + dx, y)
+            # Если вышли за границы - оставляю координаты старого тетрамино.
+            if self.collision(figure):
+                break
+            self.figure = figure
+            x += dx
+
+        if rotate:
+            self.rotate()
+
+        if hard_drop:
+            t, r, x, y = self.figure
+            self.figure = (t, r, x, self.drop_y())
+            return self.lock()
+
+        # Двигаю тетрамино по оси 0y.
+        self.anim_count_y += self.anim_speed_y
+        if self.anim_count_y > self.anim_limit_y:
+            self.anim_count_y = 0  # Обнуляю счётчик анимации y.
+            # Устремлённое вниз тетрамино опускается на soft_drop клеток за тик.
+            for _ in range(self.soft_drop if self.anim_limit_y == 0 else 1):
+                t, r, x, y = self.figure
+                figure = (t, r, x, y + 1)
+                # Если тетрамино упало на дно стакана или столкнулось с квадратами других тетрамино.
+                if self.collision(figure):
+                    return self.lock()
+                self.figure = figure
+        return 0
+
+    def lock(self) -> int:
+        """Метод для закрепления падающего тетрамино в стакане.
+
+        Заносит тетрамино в стакан, удаляет заполненные линии, начисляет очки и берёт следующее тетрамино.
+
+        Возвращаемое значение:
+            int: количество собранных линий.
+        """
+        # Заношу в массив заполненности стакана.
+        t, r, x, y = self.figure
+        offsets, left, _, top, bottom, masks = states[t][r]
+        field = self.field
+        for dy, mask in masks:
+            # Тетрамино, появившееся поверх квадратов у верха стакана, закрепляется поверх них.
+            self.filled += bin(mask << (x + left) & ~field[y + dy]).count("1")
+            field[y + dy] |= mask << (x + left)
+        self.touch(y + top, y + bottom + 1)
+        tops = self.tops
+        for dx, dy in offsets:
+            if y + dy < tops[x + dx]:
+                tops[x + dx] = y + dy
+        self.pieces += 1
+        self.figure = self.spawn(self.next_figure)  # Обновляю значение падающего тетрамино.
+        # Беру следущий индекс из генератора индексов для массива figures.
+        # Готовая последовательность тетрамино может закончиться - тогда заканчивается и игра.
+        t = next(self.generator, None)
+        if t is None:
+            self.over = True
+        else:
+            self.next_figure = figures[t]
+            self.drawn += 1
+        self.anim_limit_y = 2000  # Обновляю значение, на случай, если была нажата стрелка вниз.
+
+        # Удаляю заполненные линии, если таковые есть. Заполниться могли только линии тетрамино.
+        count = self.clear(range(y + top, y + bottom + 1))
+        if count:
+            # Увеличиваю рекорд на очки за количество заполненных линий.
+            self.score += self.lines_points[count - 1]  # -1, т.к. мне нужен индекс, а не порядковый номер.
+            self.lines += count  # Обновляю значение заполненных линий в этом раунде.
+            # Новый раунд.
+            if self.lines > 5:
+                self.lines = 0  # Обнуляем значение собранных линий.
+                self.set_round(self.num + 1)  # Переходим на следующий раунд.
+            # Собранные линии сначала гасят мусор, который ещё не поднялся, остальное уходит соперникам.
+            attack = GARBAGE[count]
+            cancel = min(attack, self.incoming)
+            self.incoming -= cancel
+            self.sent += attack - cancel
+        elif self.incoming:
+            self.raise_garbage()
+
+        # Конец игры, если в первой линии есть любой квадрат.
+        if self.field[0]:
+            self.over = True
+        return count
+
+    def add_garbage(self, rows: int) -> None:
+        """Метод для добавления линий мусора от соперников.
+
+        Аргументы:
+            rows: int: количество линий.
+
+        Возвращаемое значение:
+            None
+        """
+        self.incoming += rows
+
+    def raise_garbage(self) -> None:
+        """Метод для подъёма мусора: весь пришедший мусор поднимается со дна стакана линиями с одной дырой.
+
+        Игра окончена, если квадраты вытолкнуты за верх стакана или мусор занял место следующего тетрамино.
+
+        Возвращаемое значение:
+            None
+        """
+        rows = min(self.incoming, self.height)
+        self.incoming = 0
+        if self.hole_random is None:  # Игра восстановлена из снимка: повторяю выбор дыр до снимка.
+            self.hole_random = Random(self.seed + 2 ** 32)
+            for _ in range(self.raised):
+                self.hole_random.randrange(self.width)
+        hole = self.hole_random.randrange(self.width)
+        self.raised += 1
+        if any(self.field[:rows]):
+            self.over = True
+        self.field = self.field[rows:] + [self.full & ~(1 << hole)] * rows
+        self.touch(0, self.height)
+        self.reindex()
+        if self.collision(self.figure):
+            self.over = True
+
+    def snapshot(self) -> bytes:
+        """Метод для снимка состояния игры.
+
+        Возвращаемое значение:
+            bytes: снимок в формате SNAPSHOT, за которым идут линии стакана.
+        """
+        # Отпускание стрелки удаляет из очереди действий самое раннее её нажатие, а двигает тетрамино последнее.
+        # Поэтому дальше игра зависит только от количества нажатий каждой стрелки и от того, какая нажата последней.
+        stack = self.stack
+        t, r, x, y = self.figure
+        das, arr, soft_drop = (NONE if value is None else value for value in self.handling)
+        index = index_struct(self.width).pack(self.filled, *self.tops)
+        return SNAPSHOT.pack(
+            SNAPSHOT_MAGIC, self.seed, NONE if self.policy is None else NAMES.index(self.policy),
+            das, arr, soft_drop, self.width, self.height, self.drawn, self.raised,
+            t, r, x, y, self.next_figure[0], self.num, self.score, self.lines, self.over, self.pieces, self.frames,
+            self.incoming, self.sent, self.anim_count_y, self.anim_limit_y, self.shift_count, self.repeating,
+            stack.count(LEFT), stack.count(RIGHT), stack[-1] == RIGHT
+        ) + index + field_struct(self.width, self.height).pack(*self.field)
+
+    def restore(self, data: bytes, sequence=None) -> None:
+        """Метод для восстановления состояния игры из снимка.
+
+        Метод задаёт все атрибуты, кроме kicks и rules, поэтому восстанавливать можно и в игру, созданную без __init__
+        (см. функцию restore).
+
+        Аргументы:
+            data: bytes: снимок из snapshot.
+            sequence: pieces.Sequence: последовательность тетрамино, если игра снимка брала их из готовой
+                последовательности, а не по правилу.
+
+        Возвращаемое значение:
+            None
+        """
+        (magic, seed, policy, das, arr, soft_drop, width, height, drawn, raised,
+         t, r, x, y, next_t, num, score, lines, over, pieces, frames,
+         incoming, sent, anim_count_y, anim_limit_y, shift_count, repeating,
+         lefts, rights, right_last) = SNAPSHOT.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Это не снимок игры")
+        if policy == NONE:
+            if sequence is None:
+                raise ValueError("Игра снимка брала тетрамино из готовой последовательности, передайте её")
+            self.policy = None
+        else:
+            self.policy = NAMES[policy]
+            sequence = shared(self.policy, seed)
+        self.generator = sequence.cursor(drawn)
+        self.random = None  # Тетрамино берутся из последовательности sequence.
+        self.width, self.height = width, height
+        self.full = (1 << width) - 1
+        self.offset = (width - WT) // 2
+        self.handling = tuple(None if value == NONE else value for value in (das, arr, soft_drop))
+        self.das, self.arr, self.soft_drop = self.handling
+        self.seed, self.drawn, self.raised = seed, drawn, raised
+        self.hole_random = None  # Генератор дыр в мусоре создаётся при первом подъёме мусора.
+        self.figure, self.next_figure = (t, r, x, y), figures[next_t]
+        index = index_struct(width)
+        self.filled, *self.tops = index.unpack_from(data, SNAPSHOT.size)
+        self.field = list(field_struct(width, height).unpack_from(data, SNAPSHOT.size + index.size))
+        self.changed = (0, height)
+        self.score, self.lines, self.over, self.pieces, self.frames = score, lines, over, pieces, frames
+        self.incoming, self.sent = incoming, sent
+        self.load_round(num)
+        self.anim_count_y, self.anim_limit_y = anim_count_y, anim_limit_y
+        self.shift_count, self.repeating = shift_count, repeating
+        if right_last:
+            self.stack = [None] + [LEFT] * lefts + [RIGHT] * rights
+        else:
+            self.stack = [None] + [RIGHT] * rights + [LEFT] * lefts
+
+
+@lru_cache(maxsize=None)
+def index_struct(width: int) -> struct.Struct:
+    """Возвращает формат индекса стакана шириной width в снимке: количество квадратов и верх каждого столбца."""
+    return struct.Struct(f"<I{width}H")
+
+
+@lru_cache(maxsize=None)
+def field_struct(width: int, height: int) -> struct.Struct:
+    """Возвращает формат линий стакана width x height в снимке: по целому без знака на линию."""
+    for code, bits in (("B", 8), ("H", 16), ("I", 32), ("Q", 64)):
+        if width <= bits:
+            return struct.Struct(f"<{height}{code}")
+    raise ValueError(f"Снимок не поддерживает стакан шире 64 столбцов, а не {width}")
+
+
+def restore(data: bytes, sequence=None, rules: tuple = RULES) -> Engine:
+    """Создаёт игру из снимка Engine.snapshot, не создавая заново генераторы случайностей.
+
+    Аргументы:
+        data: bytes: снимок.
+        sequence: pieces.Sequence: готовая последовательность тетрамино, см. Engine.restore.
+        rules: tuple: правила очков и скорости игры снимка, см. RULES. В снимок они не входят.
+
+    Возвращаемое значение:
+        Engine: игра в состоянии снимка.
+    """
+    engine = Engine.__new__(Engine)
+    engine.kicks = KICKS
+    engine.rules = rules
+    engine.restore(data, sequence)
+    return engine
+
+
+class Timestep:
+    """Класс Timestep переводит прошедшее реальное время в целое количество тиков движка.
+
+        Основное применение:
+            Фиксированный шаг симуляции: правила игры одинаковы при отрисовке на 30, 60 или 144 Гц.
+
+        Примечание:
+            В режиме uncapped каждый вызов advance даёт ровно один тик без учёта времени,
+            так игра без дисплея идёт с наибольшей возможной скоростью.
+
+        Атрибуты:
+            tick: int: длительность тика в миллисекундах.
+            uncapped: bool: True - не привязывать тики ко времени.
+            max_ticks: int: наибольшее количество тиков за один вызов advance.
+            accumulator: float: накопленное время, ещё не ставшее тиком, в миллисекундах.
+
+        Методы:
+            advance(self, elapsed: int) -> int:
+                Добавляет прошедшее время, возвращает количество тиков, которые нужно выполнить.
+
+            reset(self):
+                Забывает накопленное время, например после паузы.
+    """
+    def __init__(self, tick: int = TICK_MS, uncapped: bool = False, max_ticks: int = MAX_TICKS):
+        self.tick = tick
+        self.uncapped = uncapped
+        self.max_ticks = max_ticks
+        self.accumulator = 0
+
+    @property
+    def alpha(self) -> float:
+        """Доля следующего тика, которая уже прошла: от 0 до 1. Нужна для плавной отрисовки."""
+        return 0.0 if self.uncapped else self.accumulator / self.tick
+
+    def advance(self, elapsed: int) -> int:
+        """Метод для перевода прошедшего времени в тики.
+
+        Аргументы:
+            elapsed: float: время с прошлого вызова в миллисекундах.
+
+        Возвращаемое значение:
+            int: количество тиков, которые нужно выполнить.
+        """
+        if self.uncapped:
+            return 1
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.tick)
+        self.accumulator -= ticks * self.tick
+        if ticks > self.max_ticks:  # Кадр был слишком долгим - лишнее время пропадает.
+            ticks = self.max_ticks
+        return ticks
+
+    def reset(self) -> None:
+        """Метод для сброса накопленного времени.
+
+        Возвращаемое значение:
+            None
+        """
+        self.accumulator = 0
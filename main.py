@@ -1,52 +1,88 @@
 __author__ = "Afanasin Egor"
 __email__ = "fartdraft@gmail.com"
 
+import time
+START = time.perf_counter()  # Начало запуска: от него отсчитывается время до первого кадра меню.
+
 import pygame as pg
-from os import path
+from os import path, makedirs, environ, replace, remove
+import atexit
+import signal
 import sys
-from random import randrange, choice, shuffle
-from copy import deepcopy
-
-
-pg.init()
-
-pg.display.set_caption("Tetris")
-pg.display.set_icon(pg.image.load(path.join("Resources", "Images", "icon.png")))  # path.abspath("icon.png")
-# pg.FULLSCREEN - полноэкранный режим, pg.HWSURFACE - аппаратное ускорение, pg.DOUBLEBUF - двойная буферизация.
-# (0, 0) - созданная поверхность будет иметь тот же размер, что и текущее разрешение экрана.
-screen = pg.display.set_mode((0, 0), flags=pg.FULLSCREEN | pg.HWSURFACE | pg.DOUBLEBUF)
-W, H = pg.display.get_window_size()
-
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from random import randrange, choice
+from ai import Bot
+from engine import Engine, Timestep, cells, restore, states, WT, HT, TICK_MS, HANDLING, HANDLING_MAX, LEFT, RIGHT, \
+    DOWN, ROTATE, LEFT_UP, RIGHT_UP, PAUSE, HARD_DROP
+from profiler import Profiler
+from records import RecordStore
+from pieces import POLICIES, DEFAULT
+from replay import Player, Recorder
+from shared import SharedState
+from spectate import Broadcaster
+from versus import Client
+
+
+# Импорт модуля ничего не открывает и не загружает: окно создаёт init, а шрифты, фон, музыка
+# и сцены загружаются при первом появлении сцены, которой они нужны.
+
+# Частота кадров игры: TETRIS_FPS, 0 - без ограничения (кадры идут с частотой вертикальной синхронизации
+# или так часто, как успевает компьютер). Движок шагает тиками TICK_MS при любой частоте кадров.
 FPS = 60
-clock = pg.time.Clock()
-
-# Фон для всей игры, учитывая разрешение экрана.
-BACKGROUND = pg.transform.scale(pg.image.load(path.join("Resources", "Images", "background.jpg")).convert(), (W, H))
-
-allowed_keys = (pg.QUIT, pg.KEYDOWN, pg.KEYUP)
-pg.event.set_blocked(None)  # Блокирую все типы событий для помещений в очередь событий.
-pg.event.set_allowed(allowed_keys)  # Разрешаю только нужные мне типы событий.
-
-WT, HT = 10, 20  # Ширина и высота прямоугольного стакана тетриса.
-TILE = H // (HT + 2)  # Размер плитки стакана.
-CENTER = (W - (WT * TILE)) // 2  # Смещение по оси 0x от краёв экрана до краёв стакана.
-# Координаты сетки стакана.
-grid_glass = [pg.Rect(CENTER + TILE * x, TILE * (y + 1), TILE, TILE) for x in range(WT) for y in range(HT)]
-# Координаты сетки для отображения следующей фигуры.
-grid_next_figure = [pg.Rect(CENTER + TILE * (WT + 5 + x), TILE * (5 + y), TILE, TILE)
-                    for x in range(4) for y in range(4)]
-# Координаты каждого квадрата тетрамино, где первая координата каждого тетрамино - его центр вращения.
-figures_pos = [[(-1, -1), (-2, -1), (0, -1), (1, -1)],
-               [(0, -1), (-1, -1), (-1, 0), (0, 0)],
-               [(-1, 0), (-1, 1), (0, 0), (0, -1)],
-               [(0, 0), (-1, 0), (0, 1), (-1, -1)],
-               [(0, 0), (0, -1), (0, 1), (-1, -1)],
-               [(0, 0), (0, -1), (0, 1), (1, -1)],
-               [(0, 0), (0, -1), (0, 1), (-1, 0)]]
-# Координаты квадратов фигур на сетке стакана.
-figures = [[pg.Rect(x + 5, y + 1, 1, 1) for x, y in figure_pos] for figure_pos in figures_pos]
-# Квадрат меньшего размера (учитывается ширина линии сетки) для отрисовки квадратов тетрамино.
-figure_rect = pg.Rect(0, 0, TILE - 3, TILE - 3)
+FRAME_MS = 1000 / FPS  # Длительность кадра в миллисекундах.
+# Игра рисуется на поверхности внутреннего разрешения, и SDL один раз за кадр растягивает её на экран
+# видеокартой. TETRIS_RESOLUTION=ШxВ задаёт внутреннее разрешение, native - разрешение экрана. По умолчанию
+# экраны выше MAX_HEIGHT рисуются в разрешении высотой MAX_HEIGHT с пропорциями экрана, остальные - в своём.
+MAX_HEIGHT = 1080
+vsync = False  # Выводить ли кадры по вертикальной синхронизации экрана: TETRIS_VSYNC=1.
+# Точное ожидание кадра: TETRIS_PACING=busy. Тогда последние BUSY_MS мс до кадра ждутся без сна,
+# потому что сон ОС бывает длиннее заказанного на миллисекунду и больше.
+busy_wait = False
+BUSY_MS = 2
+RESUME_MS = 1000  # Сколько мс после паузы игра показывается без тиков, чтобы игрок успел приготовиться.
+GAME_OVER_MS = 1500  # Сколько мс показывается мозаика конца игры.
+LATENCY_WINDOW = 240  # По скольким последним нажатиям хранится задержка от нажатия до экрана.
+# Размер стакана по умолчанию. Большой стакан для особых турниров задаёт TETRIS_BOARD=60x120, тогда WT и HT
+# меняются в init. Повторы, общая память, трансляция и игра против других игроков рассчитаны на стакан BOARD.
+BOARD = (WT, HT)
+MIN_TILE = 16  # Наименьший размер плитки, при котором квадраты ещё удобно разглядеть.
+PANEL = 14  # Сколько плиток по бокам стакана нужно счёту, раунду и следующей фигуре.
+SCROLL_MARGIN = 4  # За сколько клеток до края видимой части стакана она прокручивается за тетрамино.
+
+# Профилировщик фаз кадров: python main.py --profile или TETRIS_PROFILE=1, создаётся в init. Выключенный
+# равен None, и циклы кадров ничего не замеряют. Гистограммы длительностей сохраняются в файл при выходе.
+profiler = None
+PROFILE_REFRESH = 30  # Через сколько кадров обновляется таблица профилировщика на экране.
+first_frame_ms = None  # Сколько мс прошло от запуска до первого кадра меню.
+# Общая память для ботов и аналитики в других процессах: TETRIS_SHARED=имя, создаётся в init, иначе None.
+shared = None
+# Трансляция игры зрителям (python spectate.py --watch): TETRIS_SPECTATE=адрес:порт, создаётся в init, иначе None.
+broadcaster = None
+# Задержки от нажатия клавиши до обновления экрана по последним нажатиям в играх человека, мс.
+latencies = deque(maxlen=LATENCY_WINDOW)
+# Настройки управления игрока (см. engine.HANDLING): TETRIS_DAS и TETRIS_ARR в мс,
+# TETRIS_SOFT_DROP в клетках за тик. Читаются в init.
+handling = HANDLING
+# Правило выбора тетрамино (см. pieces.POLICIES) в играх человека и демонстрационном режиме: TETRIS_PIECES.
+# Матчи против других игроков играются по правилу по умолчанию, чтобы у соперников были одни и те же тетрамино.
+policy = DEFAULT
+# Непрозрачность тени - места, куда упадёт тетрамино, от 1 до 255: TETRIS_GHOST, 0 - без тени (None).
+GHOST_ALPHA = 80
+ghost = GHOST_ALPHA
+# Файл незаконченной игры для игровых автоматов: TETRIS_RESUME=путь, иначе None. При выключении автомата
+# (выход или SIGTERM) игра человека сохраняется снимком engine.Engine.snapshot, а при включении продолжается.
+resume_path = None
+
+allowed_keys = (pg.QUIT, pg.KEYDOWN, pg.KEYUP, pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.WINDOWEXPOSED)
+# Меню не рисует кадры по таймеру, а ждёт событий. Раз в MENU_IDLE_MS мс без событий оно сверяет пункт под
+# курсором (движение мыши вне окна не приходит событием) и обновляет таблицу профилировщика.
+MENU_IDLE_MS = 250
+menu_up = (pg.K_UP, pg.K_w)
+menu_down = (pg.K_DOWN, pg.K_s)
+menu_select = (pg.K_RETURN, pg.K_KP_ENTER, pg.K_SPACE)
+menu_back = (pg.K_ESCAPE, pg.K_BACKSPACE)
 
 rounds_colors = (
     (47, 79, 79),  # gray
@@ -56,21 +92,405 @@ rounds_colors = (
     (0, 0, 255), (0, 0, 205), (0, 0, 139), (0, 0, 128), (25, 25, 112)  # blue
 )
 
-# Создаю шрифты, чтобы поменять размер шрифта - необходимо создать новый объект шрифта нужного размера.
+# Соответствие клавиш кодам входных событий движка.
+keys_down = {pg.K_LEFT: LEFT, pg.K_RIGHT: RIGHT, pg.K_DOWN: DOWN, pg.K_UP: ROTATE, pg.K_RETURN: HARD_DROP}
+keys_up = {pg.K_LEFT: LEFT_UP, pg.K_RIGHT: RIGHT_UP}
+
 font_path = path.join("Resources", "font.ttf")
-# Создаю шрифты, чтобы поменять размер шрифта - необходимо создать новый объект шрифта нужного размера.
-font05 = pg.font.Font(font_path, TILE // 2)
-font1 = pg.font.Font(font_path, TILE)
-font2 = pg.font.Font(font_path, TILE * 2)
-font3 = pg.font.Font(font_path, TILE * 3)
-
-# Фоновая музыка.
-pg.mixer.music.load(path.join("Resources", "background_music.mp3"))  # Загружаю подборку из файла.
-pg.mixer.music.play(-1)  # Бесконечно воспроизводится.
-pg.mixer.music.rewind()  # Начинаю подборку сначала.
+background_path = path.join("Resources", "Images", "background.jpg")
+music_path = path.join("Resources", "background_music.mp3")
+CACHE = "cache"  # Папка для фона, заранее масштабированного под разрешение экрана.
 # Позиции начала каждого трека в подборке.
 positions = (0, 259, 537, 711, 904, 1049, 1334, 1518, 1663, 1867, 1991, 2236, 2403, 2595, 2781, 3109, 3328, 3514)
-pg.mixer.music.set_pos(choice(positions))  # Выбираю случайный трек.
+
+
+def init() -> None:
+    """Создаёт полноэкранное окно и рассчитывает размеры сцен под разрешение экрана.
+
+    Вызывается один раз перед первой сценой. Музыка начинает загружаться в отдельном потоке.
+
+    Возвращаемое значение:
+        None
+    """
+    global screen, W, H, WT, HT, VIEW_W, VIEW_H, TILE, CENTER, grid_next_figure, figure_rect, glass_rect
+    global next_figure_rect, opponent_rects, garbage_rect, profiler, shared, broadcaster, handling, server
+    global policy, ghost, resume_path, FPS, FRAME_MS, vsync, busy_wait
+    pg.init()
+
+    pg.display.set_caption("Tetris")
+    pg.display.set_icon(pg.image.load(path.join("Resources", "Images", "icon.png")))  # path.abspath("icon.png")
+    if environ.get("TETRIS_FPS"):
+        FPS = max(0, int(environ["TETRIS_FPS"]))
+        FRAME_MS = 1000 / FPS if FPS else 0
+    vsync = environ.get("TETRIS_VSYNC", "0") != "0"
+    busy_wait = environ.get("TETRIS_PACING") == "busy"
+    desktop = pg.display.get_desktop_sizes()[0]
+    size = resolution(environ.get("TETRIS_RESOLUTION"), desktop)
+    # pg.FULLSCREEN - полноэкранный режим. pg.SCALED - SDL растягивает поверхность size на экран видеокартой,
+    # без него поверхность совпадает с экраном. Вертикальная синхронизация в pygame есть только с pg.SCALED.
+    flags = pg.FULLSCREEN | (pg.SCALED if size != desktop or vsync else 0)
+    try:
+        screen = pg.display.set_mode(size, flags=flags, vsync=vsync)
+    except pg.error as error:  # Видеодрайвер не умеет вертикальную синхронизацию.
+        print(f"TETRIS_VSYNC: {error}, кадры выводятся без вертикальной синхронизации")
+        vsync = False
+        screen = pg.display.set_mode(size, flags=flags)
+    W, H = screen.get_size()  # Внутреннее разрешение, все размеры сцен считаются от него.
+
+    pg.event.set_blocked(None)  # Блокирую все типы событий для помещений в очередь событий.
+    pg.event.set_allowed(allowed_keys)  # Разрешаю только нужные мне типы событий.
+
+    if environ.get("TETRIS_BOARD"):
+        WT, HT = (int(size) for size in environ["TETRIS_BOARD"].lower().split("x"))
+    TILE = max(1, H // (HT + 2))  # Размер плитки стакана, при котором он помещается на экране по высоте.
+    # Стакан больше BOARD, который помещается только с плиткой меньше MIN_TILE, рисуется плиткой MIN_TILE,
+    # и его видимая часть прокручивается за падающим тетрамино. Стакан не больше BOARD всегда виден целиком.
+    if TILE < MIN_TILE and (WT > BOARD[0] or HT > BOARD[1]):
+        TILE = MIN_TILE
+    # Видимая часть стакана в клетках.
+    VIEW_W = min(WT, max(BOARD[0], W // TILE - 2 * PANEL))
+    VIEW_H = min(HT, H // TILE - 2)
+    CENTER = (W - (VIEW_W * TILE)) // 2  # Смещение по оси 0x от краёв экрана до краёв стакана.
+    # Координаты сетки для отображения следующей фигуры.
+    grid_next_figure = [pg.Rect(CENTER + TILE * (VIEW_W + 5 + x), TILE * (5 + y), TILE, TILE)
+                        for x in range(4) for y in range(4)]
+    # Квадрат меньшего размера (учитывается ширина линии сетки) для отрисовки квадратов тетрамино.
+    figure_rect = pg.Rect(0, 0, TILE - 3, TILE - 3)
+    # Область видимой части стакана и область сетки следующей фигуры на экране.
+    glass_rect = pg.Rect(CENTER, TILE, TILE * VIEW_W, TILE * VIEW_H)
+    next_figure_rect = pg.Rect(CENTER + TILE * (VIEW_W + 5), TILE * 5, TILE * 4, TILE * 4)
+    # Уменьшенные стаканы соперников в игре против других игроков: справа под следующей фигурой, затем слева.
+    cell = max(2, TILE // 3)
+    width, height = BOARD[0] * cell, BOARD[1] * cell
+    opponent_rects = [pg.Rect(x, TILE * 11, width, height)
+                      for x in range(CENTER + TILE * (VIEW_W + 2), W - width, width + TILE)]
+    opponent_rects += [pg.Rect(x, TILE * 8, width, height) for x in range(TILE, CENTER - width - TILE, width + TILE)]
+    # Полоса слева от стакана: её высота - мусор, который поднимется при следующем закреплении.
+    garbage_rect = pg.Rect(CENTER - TILE // 2, TILE, TILE // 3, TILE * VIEW_H)
+
+    if "--profile" in sys.argv or environ.get("TETRIS_PROFILE"):
+        profiler = Profiler(FPS)
+        atexit.register(profiler.dump, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    standard = (WT, HT) == BOARD
+    if not standard:
+        server = None  # Соперники играют на стакане BOARD.
+    if standard and environ.get("TETRIS_SHARED"):
+        shared = SharedState(environ["TETRIS_SHARED"], create=True)
+        atexit.register(shared.close)
+    if standard and environ.get("TETRIS_SPECTATE"):
+        host, _, port = environ["TETRIS_SPECTATE"].rpartition(":")
+        broadcaster = Broadcaster()
+        broadcaster.start(host or "0.0.0.0", int(port))
+        atexit.register(broadcaster.close)
+        atexit.register(lambda: print(f"Трансляция: {broadcaster.report()}"))
+    das, arr, soft_drop = handling
+    if environ.get("TETRIS_DAS"):
+        das = ms_to_ticks(environ["TETRIS_DAS"])
+    if environ.get("TETRIS_ARR"):
+        arr = ms_to_ticks(environ["TETRIS_ARR"])
+    if environ.get("TETRIS_SOFT_DROP"):
+        soft_drop = min(HANDLING_MAX, max(1, int(environ["TETRIS_SOFT_DROP"])))
+    handling = (das, arr, soft_drop)
+    if environ.get("TETRIS_GHOST"):
+        ghost = min(255, int(environ["TETRIS_GHOST"])) or None
+    if environ.get("TETRIS_PIECES"):
+        policy = environ["TETRIS_PIECES"]
+        if policy not in POLICIES:
+            raise SystemExit(f"TETRIS_PIECES: нет правила {policy}, есть {', '.join(POLICIES)}")
+    if environ.get("TETRIS_RESUME"):
+        resume_path = environ["TETRIS_RESUME"]
+        atexit.register(save_game)
+        # Автомат выключается сигналом SIGTERM: выхожу через sys.exit, чтобы отработал atexit.
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    threading.Thread(target=start_music, daemon=True).start()
+
+
+def resolution(setting: str, desktop: tuple) -> tuple:
+    """Возвращает внутреннее разрешение игры.
+
+    Аргументы:
+        setting: str: значение TETRIS_RESOLUTION: 'ШxВ', 'native' или None.
+        desktop: tuple: разрешение экрана (ширина, высота).
+
+    Возвращаемое значение:
+        tuple: (ширина, высота) поверхности, на которой рисуется игра.
+    """
+    if setting == "native":
+        return desktop
+    if setting:
+        return tuple(int(size) for size in setting.lower().split("x"))
+    width, height = desktop
+    if height <= MAX_HEIGHT:
+        return desktop
+    return width * MAX_HEIGHT // height, MAX_HEIGHT
+
+
+def ms_to_ticks(ms: str) -> int:
+    """Переводит миллисекунды из настройки управления в тики движка, округляя до ближайшего тика.
+
+    Результат ограничен 0..HANDLING_MAX тиков, чтобы поместиться в байт снимка и повтора.
+    """
+    return min(HANDLING_MAX, max(0, round(float(ms) / TICK_MS)))
+
+
+def now_ms() -> float:
+    """Возвращает время в миллисекундах по монотонным часам, им отмечаются события клавиатуры."""
+    return time.perf_counter() * 1000
+
+
+def start_music() -> None:
+    """Загружает и запускает фоновую музыку со случайного трека подборки.
+
+    Подборка большая, поэтому загружается в отдельном потоке и не задерживает первый кадр меню.
+
+    Возвращаемое значение:
+        None
+    """
+    try:
+        pg.mixer.music.load(music_path)  # Загружаю подборку из файла.
+        pg.mixer.music.play(-1)  # Бесконечно воспроизводится.
+        pg.mixer.music.rewind()  # Начинаю подборку сначала.
+        pg.mixer.music.set_pos(choice(positions))  # Выбираю случайный трек.
+    except (pg.error, OSError):  # Нет звуковой карты или файла подборки - игра идёт без музыки.
+        pass
+
+
+@lru_cache(maxsize=None)
+def font(size: float) -> pg.font.Font:
+    """Возвращает шрифт игры высотой size плиток, создавая его при первом обращении.
+
+    Аргументы:
+        size: float: высота шрифта в плитках TILE.
+
+    Возвращаемое значение:
+        pygame.font.Font: шрифт.
+    """
+    return pg.font.Font(font_path, int(TILE * size))
+
+
+@lru_cache(maxsize=None)
+def background() -> pg.Surface:
+    """Возвращает фон для всей игры, учитывая разрешение экрана.
+
+    Масштабированный фон хранится в папке CACHE отдельно для каждого разрешения и
+    масштабируется заново, только если исходное изображение новее.
+
+    Возвращаемое значение:
+        pygame.Surface: фон размером с экран.
+    """
+    cached = path.join(CACHE, f"background-{W}x{H}.bmp")
+    try:
+        if path.getmtime(cached) >= path.getmtime(background_path):
+            return pg.image.load(cached).convert()
+    except (OSError, pg.error):  # Фон ещё не масштабирован под это разрешение или файл испорчен.
+        pass
+    image = pg.transform.scale(pg.image.load(background_path).convert(), (W, H))
+    try:
+        makedirs(CACHE, exist_ok=True)
+        # Сохраняю во временный файл и подменяю, чтобы выключение автомата не оставило половину файла.
+        temp = path.join(CACHE, f"background-{W}x{H}.tmp.bmp")
+        pg.image.save(image, temp)
+        replace(temp, cached)
+    except (OSError, pg.error):  # Папка только для чтения - фон будет масштабироваться при каждом запуске.
+        pass
+    return image
+
+
+@lru_cache(maxsize=None)
+def game_background() -> pg.Surface:
+    """Возвращает фон игрового экрана: фон, сетки с толщиной 2 и неизменные надписи. Рисуется один раз.
+
+    Возвращаемое значение:
+        pygame.Surface: фон игрового экрана.
+    """
+    # Неизменные надписи игрового экрана.
+    round_labels = (
+        ("Следующая фигура:", CENTER + TILE * (VIEW_W + 3), TILE * 4, font(1), (0, 0, 0)),
+        ("Счёт:", TILE, TILE * 4, font(2), (0, 0, 0)),
+    )
+    image = background().copy()
+    [pg.draw.rect(image, (0, 0, 0), rect, 2) for rect in grid_next_figure]
+    for label, label_x, label_y, label_font, label_color in round_labels:
+        image.blit(label_font.render(label, True, label_color), (label_x, label_y))
+    return image
+
+
+@lru_cache(maxsize=None)
+def glass() -> pg.Surface:
+    """Возвращает весь стакан с сеткой толщиной 2 без квадратов. Рисуется один раз.
+
+    Стакан, который помещается на экране, показывает часть фона под собой, а большой стакан - весь фон,
+    растянутый на его размер. Сетка рисуется линиями, а не рамкой вокруг каждой клетки.
+
+    Возвращаемое значение:
+        pygame.Surface: стакан размером WT x HT плиток.
+    """
+    width, height = WT * TILE, HT * TILE
+    image = pg.Surface((width, height)).convert()
+    if glass_rect.size == (width, height):
+        image.blit(background(), (0, 0), glass_rect)
+    else:
+        image.blit(pg.transform.smoothscale(background(), (width, height)), (0, 0))
+    for x in range(WT):
+        image.fill((0, 0, 0), (x * TILE, 0, 2, height))
+        image.fill((0, 0, 0), ((x + 1) * TILE - 2, 0, 2, height))
+    for y in range(HT):
+        image.fill((0, 0, 0), (0, y * TILE, width, 2))
+        image.fill((0, 0, 0), (0, (y + 1) * TILE - 2, width, 2))
+    return image
+
+
+def scroll(offset: int, low: int, high: int, visible: int, size: int) -> int:
+    """Прокручивает видимую часть стакана вдоль одной оси так, чтобы клетки с low по high были видны.
+
+    Каждая прокрутка перерисовывает видимую часть стакана целиком, поэтому она прокручивается не меньше
+    чем на четверть, когда тетрамино подходит к её краю ближе SCROLL_MARGIN клеток.
+
+    Аргументы:
+        offset: int: первая видимая клетка.
+        low: int: первая клетка тетрамино.
+        high: int: последняя клетка тетрамино.
+        visible: int: сколько клеток видно.
+        size: int: сколько клеток в стакане.
+
+    Возвращаемое значение:
+        int: новая первая видимая клетка.
+    """
+    if visible >= size:
+        return 0
+    margin = max(0, min(SCROLL_MARGIN, (visible - (high - low + 1)) // 2))
+    step = max(1, visible // 4)
+    if low - margin < offset:
+        offset -= max(offset - (low - margin), step)
+    elif high + margin >= offset + visible:
+        offset += max(high + margin - offset - visible + 1, step)
+    return max(0, min(offset, size - visible))
+
+
+@lru_cache(maxsize=None)
+def tiles() -> pg.Surface:
+    """Возвращает атлас квадратов тетрамино: по квадрату каждого цвета rounds_colors в один ряд.
+
+    Квадраты копируются из атласа вызовом Surface.blits, а не рисуются по одному через pg.draw.rect.
+
+    Возвращаемое значение:
+        pygame.Surface: атлас, квадрат цвета rounds_colors[i] занимает область tile_area(i).
+    """
+    size = TILE - 3  # Квадрат меньше плитки, учитывается ширина линии сетки.
+    atlas = pg.Surface((size * len(rounds_colors), size)).convert()
+    for i, color in enumerate(rounds_colors):
+        atlas.fill(color, tile_area(i))
+    return atlas
+
+
+@lru_cache(maxsize=None)
+def ghost_tiles() -> pg.Surface:
+    """Возвращает атлас tiles с непрозрачностью ghost для отрисовки тени тетрамино поверх стакана."""
+    atlas = tiles().copy()
+    atlas.set_alpha(ghost)
+    return atlas
+
+
+def tile_area(i: int) -> pg.Rect:
+    """Возвращает область атласа tiles с квадратом цвета rounds_colors[i]."""
+    return pg.Rect((TILE - 3) * i, 0, TILE - 3, TILE - 3)
+
+
+class TextCache:
+    """Класс TextCache хранит отрисованные шрифтом надписи, чтобы не отрисовывать их каждый кадр.
+
+        Примечание:
+            Когда надписей становится больше size, удаляется та, что дольше всех не использовалась.
+
+        Атрибуты:
+            size: int: наибольшее количество хранимых надписей.
+            hits: int: сколько раз надпись нашлась в кэше.
+            misses: int: сколько раз надпись пришлось отрисовать шрифтом.
+
+        Методы:
+            render(self, font, text, color, antialias) -> pygame.Surface:
+                Возвращает надпись из кэша, отрисовывая её шрифтом только при первом обращении.
+    """
+    def __init__(self, size: int = 256):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.surfaces = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+    def render(self, font: pg.font.Font, text: str, color: tuple, antialias: bool = True) -> pg.Surface:
+        """Метод для получения отрисованной надписи.
+
+        Аргументы:
+            font: pygame.font.Font: шрифт надписи.
+            text: str: надпись.
+            color: tuple: цвет надписи, формат - RGB.
+            antialias: bool: сглаживание.
+
+        Возвращаемое значение:
+            pygame.Surface: отрисованная надпись.
+        """
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)  # Надпись использовалась последней.
+            return surface
+        self.misses += 1
+        surface = self.surfaces[key] = font.render(text, antialias, color)
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)  # Удаляю надпись, которая дольше всех не использовалась.
+        return surface
+
+
+text_cache = TextCache()
+
+profile_image = None  # Отрисованная таблица профилировщика.
+profile_rect = pg.Rect(0, 0, 0, 0)  # Область, которую таблица занимает на экране.
+
+
+def draw_profile(scene_background: pg.Surface) -> pg.Rect:
+    """Рисует в правом нижнем углу экрана медиану и 99-й перцентиль каждой фазы кадра.
+
+    Аргументы:
+        scene_background: pygame.Surface: фон текущей сцены, им стирается прошлая таблица.
+
+    Возвращаемое значение:
+        pygame.Rect: область экрана, которая изменилась.
+    """
+    global profile_image, profile_rect
+    # Надписи меняются каждый кадр, поэтому они отрисовываются мимо text_cache и не каждый кадр.
+    if profile_image is None or profiler.frames % PROFILE_REFRESH == 0:
+        lines = [f"кадров {profiler.frames}, пропущено {profiler.dropped}", "фаза: p50 / p99, мс"]
+        lines += [f"{phase}: {p50:.2f} / {p99:.2f}" for phase, p50, p99 in profiler.report()]
+        images = [font(0.5).render(line, True, (0, 0, 0)) for line in lines]
+        profile_image = pg.Surface((max(image.get_width() for image in images) + 8,
+                                    sum(image.get_height() for image in images) + 8))
+        profile_image.fill((255, 255, 255))
+        y = 4
+        for image in images:
+            profile_image.blit(image, (4, y))
+            y += image.get_height()
+    rect = profile_image.get_rect(bottomright=(W - TILE // 2, H - TILE // 2))
+    dirty = rect.union(profile_rect)
+    screen.blit(scene_background, profile_rect, profile_rect)  # Стираю прошлую таблицу.
+    screen.blit(profile_image, rect)
+    profile_rect = rect
+    return dirty
+
+
+def report_first_frame() -> None:
+    """Запоминает и печатает время от запуска до первого кадра меню.
+
+    Возвращаемое значение:
+        None
+    """
+    global first_frame_ms
+    first_frame_ms = (time.perf_counter() - START) * 1000
+    print(f"Первый кадр меню через {first_frame_ms:.0f} мс после запуска")
 
 
 class List:
@@ -105,7 +525,7 @@ class List:
             None
         """
         for name, x, y, font, color in self.sentences:
-            screen.blit(font.render(name, True, color), (x, y))
+            screen.blit(text_cache.render(font, name, color), (x, y))
 
 
 class Menu(List):
@@ -118,6 +538,11 @@ class Menu(List):
             Чтобы отобразить только 1 предложение, передай кортеж предложения вот так: ((параметры предложения), ).
             Чтобы отобразить только 1 пункт, передай кортеж пункта вот так: ((параметры пункта), ).
 
+            Меню спит в ожидании событий, а не рисует 60 кадров в секунду. Экран рисуется целиком только при
+            входе в меню и после возврата из вложенной сцены, а при смене активного пункта перерисовываются
+            лишь области старого и нового пункта. Пункт выбирается мышью или с клавиатуры: стрелки вверх и
+            вниз меняют активный пункт, Enter или пробел выбирают его, Escape выбирает пункт 'return'.
+
         Атрибуты:
             sentences: tuple(tuple):
             {
@@ -143,8 +568,17 @@ class Menu(List):
             render(self, active_item_num: int: номер активного пункта меню на данный момент времени):
                 Отрисовывает пункты и предложения, используя self.sentences и self.items.
 
-            main(self, surface: pygame.Surface: поверхность, которая будет отрисована на экране screen):
-                Входит в цикл, который создаёт меню, используя surface, self.sentences и self.items.
+            item_at(self, pos: tuple) -> int:
+                Возвращает номер пункта под точкой pos или None.
+
+            step(self, active_item_num: int, direction: int) -> int:
+                Возвращает номер пункта, соседнего с активным в направлении direction.
+
+            redraw(self, active_item_num: int, item_nums: tuple) -> list(pygame.Rect):
+                Перерисовывает области пунктов item_nums, возвращает их.
+
+            main(self):
+                Входит в цикл, который создаёт меню, используя self.sentences и self.items.
                 Если выбрать пункт, функция которого равна 'return', то цикл завершится,
                 вернув имя этого пункта предыдущей сцене. Если нажать ALT+F4, вся программа завершится.
     """
@@ -154,6 +588,11 @@ class Menu(List):
         self.items = items
         # Получаю размеры, необходимые для отображения каждого пункта своим шрифтом.
         self.fonts_sizes = tuple(item[3].size(item[0]) for item in items)
+        # Заранее отрисовываю каждый пункт неактивным и активным цветом.
+        self.images = tuple((text_cache.render(font, name, unselect_color), text_cache.render(font, name, select_color))
+                            for name, _, _, font, unselect_color, select_color, _, _ in items)
+        self.rects = {item[6]: pg.Rect(item[1], item[2], *size) for item, size in zip(items, self.fonts_sizes)}
+        self.order = sorted(self.rects)  # Номера пунктов сверху вниз.
 
     def render(self, active_item_num: int) -> None:
         """Метод для отрисовки пунктов и предложений.
@@ -164,499 +603,960 @@ class Menu(List):
         Возвращаемое значение:
             None
         """
-        # Если есть активный пункт - рисую его активным цветом, а все остальные пункты - неактивным.
-        if active_item_num is not None:
-            for name, x, y, font, unselect_color, select_color, item_num, _ in self.items:
-                if active_item_num == item_num:
-                    screen.blit(font.render(name, True, select_color), (x, y))
-                else:
-                    screen.blit(font.render(name, True, unselect_color), (x, y))
-        else:  # Если нет ни одного активного пункта - рисую все пункты неактивным цветом.
-            for name, x, y, font, unselect_color, _, item_num, _ in self.items:
-                screen.blit(font.render(name, True, unselect_color), (x, y))
+        # Активный пункт рисую активным цветом, а все остальные пункты - неактивным.
+        # Если нет ни одного активного пункта, все пункты рисуются неактивным цветом.
+        for item, images in zip(self.items, self.images):
+            screen.blit(images[active_item_num == item[6]], (item[1], item[2]))
         self.render_sentences()
 
+    def item_at(self, pos: tuple) -> int:
+        """Метод для поиска пункта под курсором мыши.
+
+        Аргументы:
+            pos: tuple: координаты (x, y) курсора мыши.
+
+        Возвращаемое значение:
+            int: номер пункта, на который наведена мышь, иначе - None.
+        """
+        mouse_x, mouse_y = pos
+        for item_num, rect in self.rects.items():
+            if rect.x < mouse_x < rect.right and rect.y < mouse_y < rect.bottom:
+                return item_num
+        return None
+
+    def step(self, active_item_num: int, direction: int) -> int:
+        """Метод для перехода к соседнему пункту с клавиатуры. После крайнего пункта идёт пункт с другого края.
+
+        Аргументы:
+            active_item_num: int: номер активного пункта или None.
+            direction: int: 1 - вниз, -1 - вверх.
+
+        Возвращаемое значение:
+            int: номер нового активного пункта.
+        """
+        if active_item_num is None:
+            return self.order[0 if direction > 0 else -1]
+        return self.order[(self.order.index(active_item_num) + direction) % len(self.order)]
+
+    def redraw(self, active_item_num: int, item_nums: tuple) -> list:
+        """Метод для перерисовки областей пунктов.
+
+        Области рисуются так же, как при отрисовке всего экрана: фон, пункты, затем предложения.
+
+        Аргументы:
+            active_item_num: int: номер активного пункта в данный момент времени.
+            item_nums: tuple(int): номера пунктов, области которых изменились; None пропускается.
+
+        Возвращаемое значение:
+            list(pygame.Rect): перерисованные области экрана.
+        """
+        dirty = [self.rects[item_num] for item_num in item_nums if item_num is not None]
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.blit(background(), rect, rect)
+            self.render(active_item_num)
+        screen.set_clip(None)
+        return dirty
+
     def main(self) -> str:
         """Метод для создания меню.
 
         Возвращаемое значение:
             str: имя выбранного пункта, функция которого равна 'return'.
         """
-        active_item_num = None  # В начале номер активного пункта не определён.
+        active_item_num = self.item_at(pg.mouse.get_pos())
+        full = True  # Нужно ли нарисовать экран целиком.
+        dirty = []  # Перерисованные области экрана, если экран рисуется не целиком.
+        if profiler:
+            profiler.start()
         while True:
-            mouse_x, mouse_y = pg.mouse.get_pos()  # Координаты текущего положения курсора мыши.
-            items_not_active = True  # Все пункты в начале каждой итерации цикла не активны.
-            for item, font_size in zip(self.items, self.fonts_sizes):
-                x, y, item_num = item[1], item[2], item[6]
-                size_x, size_y = font_size
-                # Если мышь наведена на пункт.
-                if x < mouse_x < x + size_x and y < mouse_y < y + size_y:
-                    items_not_active = False  # В этой итерации цикла есть активные пункты.
-                    active_item_num = item_num  # Этот пункт становится активным.
-                    # Если нажали левой кнопкой мыши.
-                    if pg.mouse.get_pressed(3)[0]:
-                        action = self.items[active_item_num][7]
-                        if action == 'return':
-                            return item[0]  # Возращаемся на предыдущую сцену, передавая имя выбранного пункта.
-                        else:
-                            action()
-
-            # Если все пункты в этой итерации цикла не активны, то номер активного пункта не определён.
-            if items_not_active:
-                active_item_num = None
-
-            # Если нажали ALT+F4.
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
+            if full:
+                screen.blit(background(), (0, 0))  # Отрисовываю фон на мониторе.
+                self.render(active_item_num)  # Отрисовываю пункты и предложения на мониторе.
+            if profiler:
+                profiler.mark("draw")
+                dirty.append(draw_profile(background()))
+                profiler.mark("overlay")
+            if full:
+                pg.display.flip()  # Обновляю монитор.
+                full = False
+            elif dirty:
+                pg.display.update(dirty)
+            dirty = []
+            if first_frame_ms is None:
+                report_first_frame()
+            if profiler:
+                profiler.mark("flip")
+                profiler.end()
+
+            # Сплю до события или до MENU_IDLE_MS мс без событий (тогда приходит NOEVENT).
+            event = pg.event.wait(MENU_IDLE_MS)
+            if profiler:
+                profiler.start()  # Время ожидания события не относится к кадру меню.
+            action_num = None  # Номер выбранного пункта.
+            new_active = active_item_num
+            if event.type == pg.NOEVENT:
+                new_active = self.item_at(pg.mouse.get_pos())
+            while event.type != pg.NOEVENT:
+                if event.type == pg.QUIT:  # Если нажали ALT+F4.
                     pg.quit()
                     sys.exit()
-
-            screen.blit(BACKGROUND, (0, 0))  # Отрисовываю BACKGROUND на мониторе.
-            self.render(active_item_num)  # Отрисовываю пункты и предложения на мониторе.
-            pg.display.flip()  # Обновляю монитор.
-            clock.tick(FPS)  # Ограничиваю скорость выполнения программы до 60 кадров в секунду.
+                elif event.type == pg.WINDOWEXPOSED:  # Содержимое окна потерялось.
+                    full = True
+                elif event.type == pg.MOUSEMOTION:
+                    new_active = self.item_at(event.pos)
+                elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:  # Если нажали левой кнопкой мыши.
+                    new_active = action_num = self.item_at(event.pos)
+                elif event.type == pg.KEYDOWN:
+                    if event.key in menu_up:
+                        new_active = self.step(new_active, -1)
+                    elif event.key in menu_down:
+                        new_active = self.step(new_active, 1)
+                    elif event.key in menu_select:
+                        action_num = new_active
+                    elif event.key in menu_back:
+                        action_num = next((item[6] for item in self.items if item[7] == 'return'), None)
+                if action_num is not None:
+                    break  # Остальные события остаются в очереди для сцены выбранного пункта.
+                event = pg.event.poll()
+            if profiler:
+                profiler.mark("events")
+
+            if action_num is not None:
+                item = next(item for item in self.items if item[6] == action_num)
+                if item[7] == 'return':
+                    return item[0]  # Возращаемся на предыдущую сцену, передавая имя выбранного пункта.
+                item[7]()
+                if profiler:
+                    profiler.start()  # Время во вложенной сцене не относится к кадру меню.
+                # Вложенная сцена нарисовала свой экран, а курсор мог сместиться.
+                active_item_num = self.item_at(pg.mouse.get_pos())
+                full = True
+            elif full or new_active != active_item_num:
+                if not full:
+                    dirty = self.redraw(new_active, (active_item_num, new_active))
+                active_item_num = new_active
 
 
 class Round:
     """Класс Round служит для воспроизведения игры Tetris.
 
-        Статические методы:
-            randomizer():
-                Модифицированный алгоритм генератора случайностей 7-bag. Генерирует индексы для массива figures.
+        Основное применение:
+            Отрисовывает состояние движка engine.Engine и передаёт ему нажатия клавиш.
 
-            abroad_x(tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.) -> bool:
-                Проверяет, вышло ли тетрамино за левую или правую границу стакана.
-                Возвращает True - если тетрамино вышло, иначе - False.
+        Примечание:
+            Движок шагает тиками фиксированной длительности engine.TICK_MS независимо от частоты кадров.
+            Падающее тетрамино отрисовывается между положениями двух последних тиков.
 
-            abroad_y(tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.) -> bool:
-                Проверяет, упало ли тетрамино в стакан.
-                Возвращает True - если тетрамино упало, иначе - False.
+            Цикл не спит вслепую, а ждёт события pygame до начала следующего кадра и отмечает время
+            прихода каждого события. Если за кадр выполняется несколько тиков, событие достаётся тику,
+            до конца которого оно пришло, а не первому тику кадра. Пауза и конец игры тоже не
+            останавливают цикл: события продолжают вычитываться.
 
-            is_square(tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.) -> bool:
-                Проверка тетрамино на квадратность.
-                Возвращает True - если тетрамино квадратно, иначе - False.
+            Экран перерисовывается целиком только в первом кадре и после паузы. В остальных кадрах
+            обновляются лишь изменившиеся области: клетки падающего тетрамино и его тени, стакан после закрепления
+            тетрамино, сетка следующей фигуры и надписи, текст которых поменялся.
 
-            above(tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.) -> bool:
-                Проверка тетрамино на выход за границу верха стакана.
-                Возвращает True - если тетрамино вышло, иначе - False.
+        Атрибуты:
+            engine: engine.Engine: логика текущей игры.
+            source: ai.Bot или replay.Player: источник входных событий вместо клавиатуры
+                (бот в демонстрационном режиме или запись повтора), иначе - None.
+            recorder: replay.Recorder: запись повтора игры человека на стакане BOARD, иначе - None.
+            versus: versus.Client: соединение с сервером в игре против других игроков, иначе - None.
+                Такая игра начинается, когда соберутся все соперники, и не попадает в рекорды и повторы.
+            timestep: engine.Timestep: переводит время кадров в тики движка.
+            board: pygame.Surface: весь стакан с сеткой и закреплёнными квадратами. После закрепления
+                перерисовываются только изменившиеся линии.
+            view: tuple: (столбец, линия) левой верхней видимой клетки стакана, который не помещается на экране.
 
         Методы:
-            collision(self, figure) -> bool:
-                Проверяет тетрамино на столкновение с квадратами других тетрамино в стакане.
-                Возвращает True - если тетрамино столкнулось, иначе - False.
+            wait_frame(self, deadline: float):
+                Ждёт до времени deadline, запоминая пришедшие события pygame со временем прихода.
+
+            inputs(self) -> list(tuple):
+                Переводит события pygame в коды входных событий движка со временем нажатия.
+
+            draw_board(self, first: int, last: int):
+                Перерисовывает линии стакана с first по last - 1 на поверхности self.board.
+
+            follow(self) -> tuple:
+                Прокручивает видимую часть стакана за падающим тетрамино.
+
+            tick(self, codes: list(int)):
+                Выполняет один тик движка с кодами входных событий codes.
+
+            run_ticks(self, ticks: int, now: float) -> list(float):
+                Выполняет ticks тиков, раздавая им входные события по времени нажатия.
+
+            figure_rects(self) -> list(pygame.Rect):
+                Возвращает квадраты падающего тетрамино на экране с учётом доли следующего тика.
+
+            ghost_rects(self) -> list(pygame.Rect):
+                Возвращает квадраты тени - места, куда упадёт тетрамино.
+
+            cell_blits(self, image: pygame.Surface, rects: list, blits: list, dirty: list):
+                Добавляет квадраты rects из атласа image к отрисовке.
+
+            draw(self, full: bool) -> list(pygame.Rect):
+                Отрисовывает изменения на экране screen, возвращает изменившиеся области.
+
+            draw_versus(self, full: bool) -> list(pygame.Rect):
+                Отрисовывает стаканы соперников и пришедший мусор, возвращает изменившиеся области.
+
+            measure_latency(self, stamps: list(float)):
+                Запоминает задержку от нажатия клавиш до обновления экрана.
+
+            resume(self, data: bytes) -> bool:
+                Продолжает игру из снимка движка.
+
+            finish(self):
+                Сохраняет рекорд и повтор игры человека, обнуляет раунд.
 
             main(self):
                 Входит в цикл, который воспроизводит Тетрис со всеми его составляющими.
     """
-    def __init__(self):
-        # Deepcopy - глубокая копия, т.к. figures - двумерный массив.
-        self.figure, self.next_figure = deepcopy(choice(figures)), deepcopy(choice(figures))
-        # Двумерный массив, отображающий заполненность стакана.
-        self.field = [[False for _ in range(WT)] for _ in range(HT)]
-        self.num = 1  # Номер раунда, при создании раунда равен 1.
-        self.score = 0  # Рекорд при создании раунда равен 0.
-        self.lines = 0  # Количество собранных линий в раунде.
-
-        # Переменные, зависящие от номера раунда.
-        self.color = rounds_colors[self.num - 1]  # -1, т.к. мне нужен индекс, а не порядковый номер.
-        # Количество очков за 1, 2, 3, 4 линии.
-        self.lines_points = (100 * self.num, 300 * self.num, 700 * self.num, 1500 * self.num)
-        # Переменные для контролирования движения тетрамино по осям 0y и 0x.
-        self.anim_count_y, self.anim_speed_y, self.anim_limit_y = 0, 40 + 20 * self.num, 2000
-        self.anim_count_x, self.anim_speed_x, self.anim_limit_x = 0, 360 + 7 * self.num, 2000
+    def __init__(self, demo: bool = False, replay: bytes = None, versus: Client = None):
+        self.demo, self.replay, self.versus = demo, replay, versus
+        if replay is not None:  # Воспроизведение повтора.
+            self.source = Player(replay)
+            self.engine = Engine(seed=self.source.seed, handling=self.source.handling, policy=self.source.policy)
+        else:
+            self.source = Bot() if demo else None  # В демонстрационном режиме играет бот.
+            self.engine = Engine(handling=handling, width=WT, height=HT, policy=policy)
+        # Повтор записывается только для игры человека без соперников: мусор от них в повтор не попадает.
+        # Размер стакана в повторе не хранится, поэтому игры на большом стакане не записываются.
+        self.recorder = None
+        if self.source is None and versus is None and (WT, HT) == BOARD:
+            self.recorder = Recorder(self.engine.seed, self.engine.handling, self.engine.policy)
+        self.joining = versus is not None  # Ждёт ли игра соперников.
+        self.drawn_boards = {}  # Номер соперника -> версия его стакана, отрисованная на экране.
+        self.drawn_incoming = None  # Отрисованный мусор, который ждёт игрока.
+        self.timestep = Timestep()
+        self.events = []  # События pygame, пришедшие во время ожидания кадра: (время, событие).
+        self.pending = []  # Входные события, ещё не переданные движку: (время нажатия, код).
+        self.resume_at = None  # До какого времени после паузы тики не выполняются.
+        self.over_at = None  # До какого времени показывается мозаика конца игры.
+        self.prev_figure = None  # Падающее тетрамино до последнего тика.
+        self.active = False  # Наведена ли мышь на пункт '<-'.
+        self.wait = False  # Была ли нажата пауза в этом кадре.
+        self.full = True  # Нужно ли перерисовать экран целиком.
         # Игровое меню.
-        self.item = ("<-", 0, 0, font3, (0, 0, 0), (255, 0, 0))
+        self.item = ("<-", 0, 0, font(3), (0, 0, 0), (255, 0, 0))
         self.sentences = [
-            [f"Раунд {self.num}", CENTER + TILE * (WT + 3), TILE, font2, (0, 0, 0)],
-            ("Следующая фигура:", CENTER + TILE * (WT + 3), TILE * 4, font1, (0, 0, 0)),
-            ("Счёт:", TILE, TILE * 4, font2, (0, 0, 0)),
-            [str(self.score), TILE, TILE * 6, font1, (0, 0, 0)],
+            [f"Раунд {self.engine.num}", CENTER + TILE * (VIEW_W + 3), TILE, font(2), (0, 0, 0)],
+            [str(self.engine.score), TILE, TILE * 6, font(1), (0, 0, 0)],
         ]
         # Размер, необходимый для отображения '->'. self.font_size[0] - x, self.font_size[1] - y.
         self.font_size = tuple(self.item[3].size(self.item[0]))
+        # Заранее отрисованный пункт '<-' неактивным и активным цветом.
+        self.item_images = (text_cache.render(self.item[3], self.item[0], self.item[4]),
+                            text_cache.render(self.item[3], self.item[0], self.item[5]))
+        self.background = game_background()
+        self.glass = glass()
+        self.atlas = tiles()
+        self.ghost_atlas = ghost_tiles() if ghost else None
+        self.tile_num = self.tile_rect = None  # Номер цвета раунда и его область атласа.
+        self.board = pg.Surface(self.glass.get_size())
+        self.view = (0, 0)
+        # То, что сейчас отрисовано на экране: тетрамино, видимая часть стакана,
+        # номер раунда, состояние пункта '<-' и области надписей.
+        self.drawn_rects = self.drawn_ghost = []
+        self.ghost_key = None  # Игра, тетрамино, прокрутка и количество закреплённых тетрамино отрисованной тени.
+        self.drawn_next_figure = self.drawn_view = self.drawn_num = self.drawn_active = None
+        self.drawn_sentences = [(None, None)] * len(self.sentences)
+
+    @property
+    def score(self) -> int:
+        return self.engine.score
+
+    @property
+    def tile(self) -> pg.Rect:
+        # Область атласа с квадратом цвета раунда. После последнего цвета раунды продолжают окрашиваться им же.
+        num = min(self.engine.num, len(rounds_colors))
+        if num != self.tile_num:
+            self.tile_num, self.tile_rect = num, tile_area(num - 1)
+        return self.tile_rect
+
+    def wait_frame(self, deadline: float) -> None:
+        """Метод для ожидания следующего кадра.
+
+        Вместо сна на весь остаток кадра ждёт события pygame и отмечает время прихода каждого,
+        чтобы нажатие, пришедшее посреди ожидания, не считалось нажатым в начале следующего кадра.
+        С точным ожиданием (busy_wait) последние BUSY_MS мс проверяет события без сна.
+
+        Аргументы:
+            deadline: float: время начала следующего кадра, мс по now_ms.
+
+        Возвращаемое значение:
+            None
+        """
+        spin = BUSY_MS if busy_wait else 0
+        while True:
+            remaining = deadline - now_ms()
+            if remaining <= 0:
+                return
+            if remaining <= spin:
+                event = pg.event.poll()  # Без сна: NOEVENT приходит сразу, если событий нет.
+            else:
+                event = pg.event.wait(max(1, int(remaining - spin)))  # По истечении времени приходит NOEVENT.
+            if event.type != pg.NOEVENT:
+                self.events.append((now_ms(), event))
 
-    @staticmethod
-    def randomizer():
-        """Модифицированный алгоритм генератора случайностей 7-bag.
+    def inputs(self) -> list:
+        """Метод для перевода событий pygame в коды входных событий движка.
 
-        Список семи различных и ещё 2 случайные тетрамино помещаются в «мешок», после чего
-        фигуры одна за другой случайным образом извлекаются из него, пока «мешок» не опустеет.
-        Когда он опустеет, фигуры возвращаются в него и процесс повторяется.
+        Возвращаемое значение:
+            list(tuple): пары (время нажатия в мс по now_ms, код) в порядке нажатия.
+        """
+        now = now_ms()
+        events = self.events + [(now, event) for event in pg.event.get()]
+        self.events = []
+        codes = []
+        for stamp, event in events:
+            if event.type == pg.QUIT:  # Если нажали ALT+F4.
+                pg.quit()
+                sys.exit()
+            if event.type == pg.KEYDOWN:  # Если клавишу нажали.
+                if event.key in keys_down:
+                    codes.append((stamp, keys_down[event.key]))
+                elif event.key == pg.K_SPACE:  # Если это пробел.
+                    codes.append((stamp, PAUSE))
+                    pause().main()  # Ставим на паузу.
+                    self.wait = True  # Пауза была нажата.
+                    self.full = True  # Меню паузы нарисовано поверх игры.
+            elif event.type == pg.KEYUP and event.key in keys_up:  # Если клавишу отпустили.
+                codes.append((stamp, keys_up[event.key]))
+        return codes
+
+    def draw_board(self, first: int = 0, last: int = None) -> None:
+        """Метод для перерисовки линий стакана с закреплёнными квадратами.
 
-        Yield:
-            int: случайный индекс для массива figures.
+        Аргументы:
+            first: int: первая линия.
+            last: int: линия после последней, None - до дна стакана.
 
-        Примеры:
-            generator = self.randomizer()
-            tetromino = deepcopy(figures[next(generator)])
+        Возвращаемое значение:
+            None
+        """
+        if last is None:
+            last = HT
+        atlas, tile = self.atlas, self.tile
+        area = pg.Rect(0, first * TILE, WT * TILE, (last - first) * TILE)
+        self.board.blit(self.glass, area, area)  # Линии стакана с сеткой без квадратов.
+        # Координаты квадратов внутри стакана, учитывая толщину линии. Пустые линии пропускаю целиком.
+        self.board.blits([(atlas, (x * TILE + 2, y * TILE + 2), tile)
+                          for y, row in enumerate(self.engine.field[first:last], first) if row
+                          for x in range(WT) if row >> x & 1], False)
+
+    def follow(self) -> tuple:
+        """Метод для прокрутки видимой части стакана за падающим тетрамино.
 
+        Возвращаемое значение:
+            tuple: (столбец, линия) левой верхней видимой клетки стакана.
         """
-        bag = [0, 1, 2, 3, 4, 5, 6] + [randrange(0, 7), randrange(0, 7)]
-        shuffle(bag)
-        while True:
-            if bag:
-                yield bag.pop()
-            else:
-                bag = [0, 1, 2, 3, 4, 5, 6] + [randrange(0, 7), randrange(0, 7)]
-                shuffle(bag)
+        t, r, x, y = self.engine.figure
+        _, left, right, top, bottom, _ = states[t][r]
+        vx, vy = self.view
+        self.view = (scroll(vx, x + left, x + right, VIEW_W, WT), scroll(vy, y + top, y + bottom, VIEW_H, HT))
+        return self.view
 
-    @staticmethod
-    def abroad_x(figure) -> bool:
-        """Проверяет, вышло ли тетрамино за левую или правую границу стакана.
+    def tick(self, codes: list) -> None:
+        """Метод для выполнения одного тика движка.
 
         Аргументы:
-                figure: tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.
+            codes: list(int): коды входных событий, нажатые человеком с прошлого тика.
 
         Возвращаемое значение:
-                bool: True - если тетрамино вышло, иначе - False.
+            None
         """
-        # Нахожу минимальную и максимальную координату по оси 0x квадратов тетрамино.
-        min_x = W
-        max_x = 0
-        for i in range(4):
-            min_x = min(min_x, figure[i].x)
-            max_x = max(max_x, figure[i].x)
-        # Квадрат с минимальной координатой по оси 0x вышел за левую границу стакана или
-        # квадрат с максимальной координатой по оси 0x вышел за правую границу стакана.
-        return (not (CENTER + 2 <= min_x * TILE + CENTER + 2) or
-                not (max_x * TILE + CENTER - 2 <= CENTER + (WT - 1) * TILE - 2))
-
-    @staticmethod
-    def abroad_y(figure) -> bool:
-        """Проверяет, упало ли тетрамино в стакан.
+        if self.source is not None:  # Нажатия клавиш заменяет бот или запись повтора.
+            codes = self.source.inputs(self.engine)
+        elif self.recorder is not None:
+            self.recorder.record(self.engine.frames, codes)
+        self.prev_figure = self.engine.figure
+        self.engine.step(codes)
+        if broadcaster:
+            broadcaster.publish(self.engine)  # Зрители получают каждый тик, рассылка идёт в потоке трансляции.
+
+    def run_ticks(self, ticks: int, now: float) -> list:
+        """Метод для выполнения тиков кадра.
+
+        Тик i из ticks заканчивается в момент now - timestep.accumulator - (ticks - 1 - i) * TICK_MS.
+        Тику достаются входные события, нажатые до его конца, последнему тику - все оставшиеся,
+        чтобы нажатие не ждало следующего кадра.
 
         Аргументы:
-                figure: tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.
+            ticks: int: количество тиков, которое вернул timestep.advance.
+            now: float: время начала кадра, мс по now_ms.
 
         Возвращаемое значение:
-                bool: True - если тетрамино упало, иначе - False.
+            list(float): время нажатия входных событий, переданных движку.
         """
-        # Нахожу максимальную координату по оси 0y квадратов тетрамино.
-        max_y = 0
-        for i in range(4):
-            if max_y < figure[i].y:
-                max_y = figure[i].y
-        return not max_y * TILE < TILE * HT
+        stamps = []
+        for i in range(ticks):
+            end = now - self.timestep.accumulator - (ticks - 1 - i) * TICK_MS
+            count = len(self.pending) if i == ticks - 1 else 0
+            while count < len(self.pending) and self.pending[count][0] <= end:
+                count += 1
+            events, self.pending = self.pending[:count], self.pending[count:]
+            stamps += [stamp for stamp, _ in events]
+            self.tick([code for _, code in events])
+            if self.engine.over:
+                break
+            # Повтор закончился раньше конца игры (игрок вышел через '<-').
+            if self.replay is not None and self.source.finished(self.engine):
+                break
+        return stamps
+
+    def figure_rects(self) -> list:
+        """Метод для расчёта квадратов падающего тетрамино на экране.
+
+        Если за последний тик тетрамино только сдвинулось, оно рисуется между старым и новым положением
+        с учётом доли следующего тика, которая уже прошла.
 
-    @staticmethod
-    def is_square(figure) -> bool:
-        """Проверка тетрамино на квадратность.
+        Возвращаемое значение:
+            list(pygame.Rect): квадраты тетрамино, учитывая толщину линии и смещение по оси 0x.
+        """
+        t, r, x, y = self.engine.figure
+        prev = self.prev_figure
+        if prev is not None and prev[:2] == (t, r) and abs(prev[2] - x) <= 1 and abs(prev[3] - y) <= 1:
+            alpha = self.timestep.alpha
+            x, y = prev[2] + (x - prev[2]) * alpha, prev[3] + (y - prev[3]) * alpha
+        x, y = x - self.view[0], y - self.view[1]
+        return [pg.Rect(CENTER + round((x + dx) * TILE) + 2, round((y + dy + 1) * TILE) + 2, TILE - 3, TILE - 3)
+                for dx, dy in states[t][r][0]]
+
+    def ghost_rects(self) -> list:
+        """Метод для расчёта квадратов тени - падающего тетрамино, опущенного до упора.
+
+        Возвращаемое значение:
+            list(pygame.Rect): квадраты тени на экране или пустой список, если тень выключена.
+        """
+        if not ghost:
+            return []
+        # Тень меняется, только если тетрамино сдвинулось, стакан прокрутился или изменился после закрепления.
+        key = (self.engine, self.engine.figure, self.view, self.engine.pieces)
+        if key == self.ghost_key:
+            return self.drawn_ghost
+        self.ghost_key = key
+        t, r, x, _ = self.engine.figure
+        x, y = x - self.view[0], self.engine.drop_y() - self.view[1]
+        return [pg.Rect(CENTER + (x + dx) * TILE + 2, (y + dy + 1) * TILE + 2, TILE - 3, TILE - 3)
+                for dx, dy in states[t][r][0]]
+
+    def cell_blits(self, image: pg.Surface, rects: list, blits: list, dirty: list) -> None:
+        """Метод для отрисовки квадратов тетрамино цвета раунда. Квадраты у края видимой части обрезаются.
 
         Аргументы:
-            figure: tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.
+            image: pygame.Surface: атлас квадратов, tiles или ghost_tiles.
+            rects: list(pygame.Rect): квадраты на экране.
+            blits: list(tuple): пары для screen.blits, в которые добавляются квадраты.
+            dirty: list(pygame.Rect): изменившиеся области экрана.
 
         Возвращаемое значение:
-            bool: True - если тетрамино квадратно, иначе - False.
+            None
         """
-        return (figure[0].x == figure[3].x and figure[1].x == figure[2].x and figure[0].y == figure[1].y
-                and figure[2].y == figure[3].y)
+        tile = self.tile
+        for rect in rects:
+            visible = rect.clip(glass_rect)
+            if visible == rect:
+                blits.append((image, rect, tile))
+            elif visible:
+                blits.append((image, visible, (tile.x + visible.x - rect.x, tile.y + visible.y - rect.y,
+                                               visible.w, visible.h)))
+            else:
+                continue
+            dirty.append(visible)
 
-    @staticmethod
-    def above(figure) -> bool:
-        """Проверка тетрамино на выход за границу верха стакана.
+    def draw(self, full: bool = False) -> list:
+        """Метод для отрисовки изменений на экране.
 
         Аргументы:
-            figure: tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.
+            full: bool: True - перерисовать экран целиком.
 
         Возвращаемое значение:
-            bool: True - если тетрамино вышло, иначе - False.
+            list(pygame.Rect): области экрана, которые изменились.
         """
-        for i in range(4):
-            if figure[i].y < 0:
-                return True
-        return False
+        engine = self.engine
+        atlas, tile = self.atlas, self.tile
+        dirty = []
+        # Стакан, тетрамино и следующая фигура копируются на экран одним вызовом screen.blits в этом порядке.
+        blits = []
+        if full:
+            screen.blit(self.background, (0, 0))  # Отрисовываю фон с сетками и неизменными надписями.
+
+        # Линии стакана, изменившиеся после закрепления тетрамино, удаления линий или подъёма мусора.
+        changed = engine.take_changed()
+        if full or self.drawn_num != engine.num:
+            self.draw_board()  # Сменился цвет квадратов раунда - перерисовываю стакан целиком.
+        elif changed is not None:
+            self.draw_board(*changed)
+        # Видимую часть стакана копирую на экран целиком, только если она прокрутилась или сменился раунд,
+        # иначе - только изменившиеся линии.
+        view = self.follow()
+        offset_x, offset_y = view[0] * TILE - glass_rect.x, view[1] * TILE - glass_rect.y  # Из экрана в self.board.
+        board_changed = full or self.drawn_num != engine.num or self.drawn_view != view
+        if board_changed:
+            blits.append((self.board, glass_rect, glass_rect.move(offset_x, offset_y)))
+            dirty.append(glass_rect)
+        elif changed is not None:
+            first, last = changed
+            rect = pg.Rect(glass_rect.x, (first - view[1] + 1) * TILE, glass_rect.w, (last - first) * TILE)
+            rect = rect.clip(glass_rect)
+            if rect:
+                blits.append((self.board, rect, rect.move(offset_x, offset_y)))
+                dirty.append(rect)
+
+        # Отрисовываю тень и падающее тетрамино поверх неё.
+        rects, ghost_rects = self.figure_rects(), self.ghost_rects()
+        if board_changed or changed is not None or self.drawn_rects != rects or self.drawn_ghost != ghost_rects:
+            if not board_changed:
+                # Стираю тетрамино и тень со старых координат, восстанавливая клетки стакана.
+                for rect in self.drawn_rects + self.drawn_ghost:
+                    rect = rect.clip(glass_rect)
+                    if rect:
+                        blits.append((self.board, rect, rect.move(offset_x, offset_y)))
+                        dirty.append(rect)
+            self.cell_blits(self.ghost_atlas, ghost_rects, blits, dirty)
+            self.cell_blits(atlas, rects, blits, dirty)  # Квадраты фигуры на новых координатах.
+            self.drawn_rects, self.drawn_ghost = rects, ghost_rects
+
+        # Отрисовываю следущую фигуру.
+        if full or self.drawn_next_figure != engine.next_figure or self.drawn_num != engine.num:
+            blits.append((self.background, next_figure_rect, next_figure_rect))  # Пустая сетка следующей фигуры.
+            # Квадраты следующего тетрамино с учётом толщины линии.
+            blits += [(atlas, (CENTER + (x + VIEW_W + 2) * TILE + 2, (y + 6) * TILE + 2), tile)
+                      for x, y in cells(engine.next_figure)]
+            dirty.append(next_figure_rect)
+
+        if blits:
+            screen.blits(blits, False)
+
+        # Отрисовка пункта '<-'.
+        if full or self.drawn_active != self.active:
+            rect = pg.Rect((self.item[1], self.item[2]), self.font_size)
+            screen.blit(self.background, rect, rect)
+            screen.blit(self.item_images[self.active], rect)
+            dirty.append(rect)
+
+        if self.versus:
+            dirty += self.draw_versus(full)
+
+        if profiler:
+            profiler.mark("draw")
+
+        # Отрисовка предложений, текст которых поменялся.
+        self.sentences[0][0] = f"Раунд {engine.num}"  # Обновляю изображение номера раунда.
+        self.sentences[1][0] = str(engine.score)  # Обновляю изображение рекорда.
+        for i, (name, x, y, font, color) in enumerate(self.sentences):
+            drawn_name, drawn_rect = self.drawn_sentences[i]
+            if full or drawn_name != name:
+                if drawn_rect and not full:
+                    screen.blit(self.background, drawn_rect, drawn_rect)  # Стираю старую надпись.
+                    dirty.append(drawn_rect)
+                rect = screen.blit(text_cache.render(font, name, color), (x, y))
+                self.drawn_sentences[i] = (name, rect)
+                dirty.append(rect)
+
+        if profiler:
+            profiler.mark("text")
+
+        self.drawn_next_figure, self.drawn_view = engine.next_figure, view
+        self.drawn_num, self.drawn_active = engine.num, self.active
+        return [screen.get_rect()] if full else dirty
+
+    def draw_versus(self, full: bool = False) -> list:
+        """Метод для отрисовки игры против других игроков.
+
+        Уменьшенный стакан соперника со счётом под ним перерисовывается, только если пришли его изменения.
 
-    def collision(self, figure) -> bool:
-        """Метод для проверки тетрамино на столкновение с квадратами других тетрамино в стакане.
+        Аргументы:
+            full: bool: True - экран перерисовывается целиком.
+
+        Возвращаемое значение:
+            list(pygame.Rect): области экрана, которые изменились.
+        """
+        dirty = []
+        if full and self.joining:
+            screen.blit(text_cache.render(font(1), "Ожидание соперников", (255, 0, 0)), (CENTER + TILE // 2, TILE * 9))
+
+        incoming = self.engine.incoming
+        if full or self.drawn_incoming != incoming:
+            screen.blit(self.background, garbage_rect, garbage_rect)
+            height = min(incoming, VIEW_H) * TILE
+            screen.fill((255, 0, 0), (garbage_rect.x, garbage_rect.bottom - height, garbage_rect.w, height))
+            dirty.append(garbage_rect)
+            self.drawn_incoming = incoming
+
+        for (index, board), rect in zip(sorted(self.versus.boards.items()), opponent_rects):
+            if not full and self.drawn_boards.get(index) == board.version:
+                continue
+            self.drawn_boards[index] = board.version
+            cell = rect.w // BOARD[0]
+            screen.fill((255, 255, 255), rect)
+            color = rounds_colors[4] if board.over else rounds_colors[0]  # Проигравший соперник - красный.
+            squares = [(x, y) for y, row in enumerate(board.field) if row for x in range(BOARD[0]) if row >> x & 1]
+            if board.figure is not None and not board.over:
+                squares += [(x, y) for x, y in cells(board.figure) if y >= 0]
+            for x, y in squares:
+                screen.fill(color, (rect.x + x * cell, rect.y + y * cell, cell - 1, cell - 1))
+            label = pg.Rect(rect.x, rect.bottom, rect.w, TILE)
+            screen.blit(self.background, label, label)  # Стираю прошлый счёт соперника.
+            screen.blit(text_cache.render(font(0.5), str(board.score), (0, 0, 0)), label)
+            dirty.append(rect.union(label))
+        return dirty
+
+    def resume(self, data: bytes) -> bool:
+        """Метод для продолжения игры из снимка engine.Engine.snapshot, например сохранённого при выключении автомата.
+
+        Повтор продолженной игры не записывается: в нём не было бы её начала.
 
         Аргументы:
-                figure: tuple(pygame.Rect): кортеж квадратов тетрамино. Длина - 4.
+            data: bytes: снимок движка.
+
+        Возвращаемое значение:
+            bool: False, если снимок сделан на стакане другого размера, тогда раунд не меняется.
+        """
+        engine = restore(data)
+        if (engine.width, engine.height) != (WT, HT):
+            return False
+        self.engine = engine
+        self.recorder = None
+        self.full = True
+        self.resume_at = now_ms() + RESUME_MS  # Игроку нужно время, чтобы приготовиться.
+        return True
+
+    def finish(self) -> None:
+        """Метод для завершения игры.
+
+        Устанавливает рекорды и сохраняет повтор, если играл человек, затем обнуляет все значения.
 
         Возвращаемое значение:
-                bool: True - если тетрамино столкнулось, иначе - False.
+            None
         """
-        for i in range(4):
-            if self.field[figure[i].y][figure[i].x]:
-                return True
-        return False
+        if self.source is None and self.versus is None:
+            records_store().add(self.score, player)  # Заношу счёт self.score в таблицу рекордов.
+        if self.recorder is not None:
+            self.recorder.end(self.engine.frames)
+            save_replay(self.recorder.dump(), self.score, self.engine.seed)
+        if self.versus is not None:
+            self.versus.close()
+        self.__init__(self.demo, self.replay, self.versus)
 
     def main(self):
-        stack = [None]  # Очередь действий, в начале тетрамино не нужно никуда двигать.
-        generator = self.randomizer()  # Создаю генератор индексов для массива figures.
+        frame = now_ms()  # Время, проведённое в меню, не должно стать тиками.
+        elapsed = 0
+        next_frame = frame + FRAME_MS  # Начало следующего кадра: кадры идут ровно через FRAME_MS.
+        if profiler:
+            profiler.start()
         while True:
-            rotate = False  # В начале тетрамино не нужно поворачивать.
-            wait = False  # В начале пауза не нажата.
-            for event in pg.event.get():
-                if event.type == pg.QUIT:  # Если нажали ALT+F4.
-                    pg.quit()
-                    sys.exit()
-                if event.type == pg.KEYDOWN:  # Если клавишу нажали.
-                    if event.key == pg.K_LEFT:  # Если это стрелка влево.
-                        self.anim_limit_x = 0  # Позволяю сдвинуть тетромино на одну клетку влево.
-                        stack.append('left')  # Добавляю действие двигаться влево из очереди действий.
-                    elif event.key == pg.K_RIGHT:  # Если это стрелка вправо.
-                        self.anim_limit_x = 0  # Позволяю сдвинуть тетромино на одну клетку вправо.
-                        stack.append('right')  # Добавляю действие двигаться вправо из очереди действий.
-                    elif event.key == pg.K_DOWN:  # Если это стрелка вниз.
-                        self.anim_limit_y = 0  # Устремляю тетромино вниз стакана.
-                    # Если это стрелка вверх и тетрамино не является квадратом.
-                    elif event.key == pg.K_UP and not self.is_square(self.figure):
-                        rotate = True  # Тетрамино необходимо повернуть.
-                    elif event.key == pg.K_SPACE:  # Если это пробел.
-                        pause.main()  # Ставим на паузу.
-                        wait = True  # Пауза была нажата.
-                elif event.type == pg.KEYUP:  # Если клавишу отпустили.
-                    if event.key == pg.K_LEFT:  # Если это стрелка влево.
-                        stack.pop(stack.index('left'))  # Удалям действие двигаться влево из очереди действий.
-                    elif event.key == pg.K_RIGHT:  # Если это стрелка вправо.
-                        stack.pop(stack.index('right'))  # Удалям действие двигаться вправо из очереди действий.
-
-            # Вектор движения равен последнему действию.
-            if stack[-1] == 'left':
-                dx = -1
-            elif stack[-1] == 'right':
-                dx = 1
+            self.wait = False  # В начале пауза не нажата.
+            self.pending += self.inputs()
+            if shared:
+                # Входные события от других процессов отмечаются временем начала кадра.
+                self.pending += [(frame, code) for code in shared.inputs()]
+            if profiler:
+                profiler.mark("events")
+                pieces = self.engine.pieces
+
+            if self.over_at is not None:  # На экране мозаика конца игры.
+                self.pending = []
+                if frame >= self.over_at:
+                    # Обнуляю все значения, возвращаюсь на предыдущую сцену.
+                    self.finish()
+                    return
+                self.wait_frame(next_frame)
+                frame = now_ms()
+                next_frame = max(next_frame + FRAME_MS, frame)
+                continue
+
+            if self.versus:
+                if self.joining and self.versus.started:
+                    # Соперники собрались: у всех игроков матча одно зерно и одинаковые тетрамино.
+                    self.joining = False
+                    self.engine = Engine(seed=self.versus.seed, handling=handling)
+                    self.pending = []
+                    self.full = True
+                elif self.joining and self.versus.ended:  # Сервер недоступен.
+                    self.finish()
+                    return
+                self.engine.add_garbage(self.versus.take_garbage())
+
+            stamps = []
+            if self.joining or (self.resume_at is not None and frame < self.resume_at):
+                # Игрок ждёт соперников или готовится после паузы: время не становится тиками.
+                self.timestep.reset()
             else:
-                dx = 0
-
-            # Двигаю тетрамино по оси 0x.
-            self.anim_count_x += self.anim_speed_x
-            if self.anim_count_x > self.anim_limit_x:
-                self.anim_count_x = 0  # Обнуляю счётчик анимации x.
-                self.anim_limit_x = 2000  # Обновляю значение, на случай, если были нажаты стрелки влево или вправо.
-                figure_old = deepcopy(self.figure)  # Сохраняю координаты тетрамино.
-                # Двигаю тетрамино по оси 0x в нужном направлении.
-                for i in range(4):
-                    self.figure[i].x += dx
-                # Если вышли за границы - оставляю координаты старого тетрамино.
-                if self.abroad_x(self.figure) or self.collision(self.figure):
-                    self.figure = figure_old
-
-            if rotate:  # Если была нажата стрелка вверх.
-                center = self.figure[0]  # Центр тетрамино - всегда 0 элемент.
-                figure_old = deepcopy(self.figure)  # Сохраняю координаты тетрамино.
-                # Поворачиваю тетрамино на 90 градусов.
-                for i in range(4):
-                    x = self.figure[i].y - center.y
-                    y = self.figure[i].x - center.x
-                    self.figure[i].x = center.x - x
-                    self.figure[i].y = center.y + y
-                # Если при повороте тетрамино столкнулось с квадратами других тетрамино или вышло за границы стакана.
-                if (self.abroad_x(self.figure) or self.abroad_y(self.figure) or
-                        self.collision(self.figure) or self.above(self.figure)):
-                    self.figure = deepcopy(figure_old)  # Оставляю координаты старого тетрамино.
-
-            # Двигаю тетрамино по оси 0y.
-            self.anim_count_y += self.anim_speed_y
-            if self.anim_count_y > self.anim_limit_y:
-                self.anim_count_y = 0  # Обнуляю счётчик анимации y.
-                figure_old = deepcopy(self.figure)  # Сохраняю координаты тетрамино.
-                # Двигаю тетрамино по оси 0y в нужном направлении.
-                for i in range(4):
-                    self.figure[i].y += 1
-                # Если тетрамино упало на дно стакана или столкнулось с квадратами других тетрамино.
-                if self.abroad_y(self.figure) or self.collision(self.figure):
-                    # Заношу в массив заполненности стакана.
-                    for i in range(4):
-                        self.field[figure_old[i].y][figure_old[i].x] = True
-                    # Обновляю значение падающего тетрамино.
-                    # Не deepcopy потому что в следующей строке значение self.next_figure меняется на случайное.
-                    self.figure = self.next_figure
-                    # Беру следущий индекс из генератора индексов для массива figures.
-                    self.next_figure = deepcopy(figures[next(generator)])
-                    self.anim_limit_y = 2000  # Обновляю значение, на случай, если была нажата стрелка вниз.
-
-            screen.blit(BACKGROUND, (0, 0))  # Отрисовываю BACKGROUND на мониторе.
-
-            [pg.draw.rect(screen, (0, 0, 0), rect, 2) for rect in grid_glass]  # Отрисовываю сетку стакана с толщиной 2.
-
-            # Отрисовываю падающее тетрамино.
-            for i in range(4):
-                # Рассчитываю новые координаты для квадрата тетрамино, учитывая толщину линии и смещение по оси 0x.
-                figure_rect.x = CENTER + self.figure[i].x * TILE + 2
-                figure_rect.y = (self.figure[i].y + 1) * TILE + 2
-                # Рисую квадрат фигуры на новых координатах.
-                pg.draw.rect(screen, self.color, figure_rect)
-
-            # Отрисовываю квадраты других тетрамино на поле.
-            for y, raw in enumerate(self.field):
-                for x, flag in enumerate(raw):
-                    if flag:  # Если на этой координате есть квадрат тетромино.
-                        # Рассчитываю новые координаты для квадрата тетрамино,
-                        # учитывая толщину линии и смещение по оси 0x.
-                        figure_rect.x, figure_rect.y = CENTER + x * TILE + 2, (y + 1) * TILE + 2
-                        pg.draw.rect(screen, self.color, figure_rect)  # Отрисовываю квадрат на новых координатах.
-
-            # Отрисовываю сетку следующей фигуры с толщиной 2.
-            [pg.draw.rect(screen, (0, 0, 0), rect, 2) for rect in grid_next_figure]
-            # Отрисовываю следущую фигуру.
-            for i in range(4):
-                # Рассчитываю новые координаты для квадрата следующего тетрамино.
-                figure_rect.x = CENTER + (self.next_figure[i].x + WT + 2) * TILE + 2
-                figure_rect.y = (self.next_figure[i].y + 6) * TILE + 2
-                # Рисую квадрат следущего тетрамино на новых координатах.
-                pg.draw.rect(screen, self.color, figure_rect)
-
-            # Удаляю заполненные линии, если таковые есть.
-            field = self.field  # Копирую значение текущей заполненности стакана.
-            count = 0  # Счетчик заполненных линий.
-            for y in range(HT):
-                if all(self.field[y]):  # Если линия заполнена.
-                    # Удаляю эту линию, добавляю пустую линию в начало cтакана.
-                    field = [[False for _ in range(WT)]] + field[:y] + field[y + 1:]
-                    count += 1
-            if count:
-                # Увеличиваю рекорд на очки за количество заполненных линий.
-                self.score += self.lines_points[count - 1]  # -1, т.к. мне нужен индекс, а не порядковый номер.
-            self.lines += count  # Обновляю значение заполненных линий в этом раунде.
-            self.field = field  # Обновляю массив заполненности стакана.
-            self.sentences[3][0] = str(self.score)  # Обновляю изображение рекорда.
-
-            # Новый раунд.
-            if self.lines > 5:
-                self.num += 1  # Переходим на следующий раунд.
-                self.lines = 0  # Обнуляем значение собранных линий.
-                self.color = rounds_colors[self.num - 1]  # -1, т.к. мне нужен индекс, а не порядковый номер.
-                # Количество очков за 1, 2, 3, 4 линии обновляется.
-                self.lines_points = (100 * self.num, 300 * self.num, 700 * self.num, 1500 * self.num)
-                # Переменные для контролирования движения тетрамино по осям 0y и 0x.
-                self.anim_count_y, self.anim_speed_y, self.anim_limit_y = 0, 40 + 20 * self.num, 2000
-                self.anim_count_x, self.anim_speed_x, self.anim_limit_x = 0, 360 + 7 * self.num, 2000
-                self.sentences[0][0] = f"Раунд {self.num}"  # Обновляем изображение номера раунда.
+                if self.resume_at is not None:
+                    # Нажатия во время подготовки после паузы считаются нажатыми в её конце.
+                    self.pending = [(frame, code) for _, code in self.pending]
+                    self.resume_at = None
+                # Выполняю столько тиков, сколько поместилось в прошедшее время.
+                stamps = self.run_ticks(self.timestep.advance(elapsed), frame)
+                # Повтор закончился раньше конца игры (игрок вышел через '<-').
+                if self.replay is not None and not self.engine.over and self.source.finished(self.engine):
+                    self.finish()
+                    return
+            if shared:
+                shared.publish(self.engine)
+            if self.versus and not self.joining:
+                self.versus.publish(self.engine)  # Соперники получают только изменения с прошлого кадра.
+            if profiler:
+                # Тики, в которых тетрамино закрепилось и удалялись линии, замеряются отдельно.
+                profiler.mark("lock" if self.engine.pieces != pieces else "logic")
 
             # Отслеживание пункта '<-'.
-            active = False
+            self.active = False
             mouse_x, mouse_y = pg.mouse.get_pos()  # Координаты текущего положения курсора мыши.
             x, y = self.item[1], self.item[2]
             # Если мышь наведена на '<-'.
             if x < mouse_x < x + self.font_size[0] and y < mouse_y < y + self.font_size[1]:
-                active = True
+                self.active = True
                 # Если нажали левой кнопкой мыши.
                 if pg.mouse.get_pressed(3)[0]:
-                    set_records(self.score)
-                    self.__init__()
+                    self.finish()
                     return
 
-            # Отрисовка пункта '<-'.
-            name, x, y, font = self.item[0], self.item[1], self.item[2], self.item[3]
-            if active:
-                screen.blit(font.render(name, True, self.item[5]), (x, y))
-            else:
-                screen.blit(font.render(name, True, self.item[4]), (x, y))
-            # Отрисовка предложений.
-            for name, x, y, font, color in self.sentences:
-                screen.blit(font.render(name, True, color), (x, y))
+            dirty = self.draw(self.full)
+            self.full = False
+            if profiler:
+                dirty.append(draw_profile(self.background))
+                profiler.mark("overlay")
 
             # Конец игры.
-            if any(field[0]):  # Если в первой линии есть любой квадрат.
-                # Рисую красивую мозайку.
-                square = deepcopy(figure_rect)
-                for j in range(HT):
-                    for i in range(WT):
+            if self.engine.over:
+                # Рисую красивую мозайку и показываю её GAME_OVER_MS мс.
+                square = figure_rect.copy()
+                for j in range(VIEW_H):
+                    for i in range(VIEW_W):
                         square.x = CENTER + i * TILE + 2
                         square.y = (j + 1) * TILE + 2
                         pg.draw.rect(screen, (randrange(250), randrange(250), randrange(250)), square)
-                set_records(self.score)  # Устанавливаю рекорды, учитывая счёт self.score.
                 pg.display.flip()
-                pg.time.wait(1500)  # Останавливаю программу на  1.5 секунды.
-                # Обнуляю все значения, возвращаюсь на предыдущую сцену.
-                self.__init__()
-                return
+                self.over_at = now_ms() + GAME_OVER_MS
+            elif self.versus and self.versus.ended and not self.joining:
+                # Соперники проиграли или сервер закрыл соединение.
+                label = "Победа!" if self.versus.winner == self.versus.index else "Матч окончен"
+                screen.blit(text_cache.render(font(2), label, (255, 0, 0)), (CENTER + TILE, TILE * 9))
+                pg.display.flip()
+                self.over_at = now_ms() + GAME_OVER_MS
+            else:
+                pg.display.update(dirty)  # Обновляю на мониторе только изменившиеся области.
+            if not self.wait:  # В кадре с паузой задержка включала бы время в меню паузы.
+                self.measure_latency(stamps)
+            if profiler:
+                profiler.mark("update")
+            if self.wait:  # Если была нажата пауза.
+                self.resume_at = now_ms() + RESUME_MS
+                if profiler:
+                    profiler.start()  # Кадр с паузой не замеряется.
+            # Жду начала следующего кадра, чтобы держать FPS кадров в секунду.
+            self.wait_frame(next_frame)
+            now = now_ms()
+            elapsed, frame = now - frame, now
+            # Опоздавший кадр не копит долг: следующий начинается не раньше, чем этот.
+            next_frame = max(next_frame + FRAME_MS, frame)
+            if profiler:
+                profiler.mark("wait")
+                profiler.end()
+
+    def measure_latency(self, stamps: list) -> None:
+        """Метод для замера задержки от нажатия клавиши до обновления экрана. Задержки копятся в latencies.
+
+        Аргументы:
+            stamps: list(float): время нажатия входных событий, переданных движку в этом кадре.
 
-            pg.display.flip()  # Обновляю монитор.
-            if wait:  # Если была нажата пауза.
-                pg.time.wait(1000)  # Ждём 1 секунду.
-            clock.tick(FPS)  # Ограничиваю скорость выполнения программы до 60 кадров в секунду.
+        Возвращаемое значение:
+            None
+        """
+        if self.source is not None:  # Бот и повтор не нажимают клавиши.
+            return
+        now = now_ms()
+        for stamp in stamps:
+            latencies.append(now - stamp)
+            if profiler:
+                profiler.sample("latency", now - stamp)
 
 
-# Cоздаю меню паузы.
-pause_items = (
-    ("Продолжить", W // 2 - TILE * 8, TILE * 7, font3, (0, 0, 0), (255, 0, 0), 0, 'return'),
-)
-pause_sentences = (
-    ("Пауза", W // 2 - TILE * 4, TILE, font3, (0, 0, 0)),
-)
-pause = Menu(pause_sentences, pause_items)
-
-# Создаю новый раунд.
-new_round = Round()
-
-# Создаю сцену справки.
-reference_sentences = (
-    ("Управление:", 5 * TILE, TILE, font2, (0, 0, 0)),
-    ("Стрелка вправо-двигаться вправо;", 2 * TILE, 3 * TILE, font1, (0, 0, 0)),
-    ("Стрелка влево-двигаться влево;", 2 * TILE, 4 * TILE, font1, (0, 0, 0)),
-    ("Стрелка вниз-устремить тетромина вниз;", 2 * TILE, 5 * TILE, font1, (0, 0, 0)),
-    ("Стрелка вверх-повернуть тетрамино;", 2 * TILE, 6 * TILE, font1, (0, 0, 0)),
-    ("Пробел-пауза.", 2 * TILE, 7 * TILE, font1, (0, 0, 0)),
-    ("Музыка: Gravy Beats-Genkai, Gravy Beats-Katsu, Iruka-Taikai,", TILE, 9 * TILE, font05, (0, 0, 0)),
-    ("        Gravy Beats-Kaze, Iruka-Gojira, Gravy Beats-Samurai,", TILE, 10 * TILE, font05, (0, 0, 0)),
-    ("        Iruka-Ukiyo-e , Gravy Beats Madara II, GravyBeats-Bushido,", TILE, 11 * TILE, font05, (0, 0, 0)),
-    ("        Iruka-Doomed, Gravy-Kasai, Iruka-Shinigami,", TILE, 12 * TILE, font05, (0, 0, 0)),
-    ("        Iruka-Uchigatana, Gravy Beats-Warrior Spirit, Gravy Beats-Shinobi,", TILE, 13 * TILE, font05, (0, 0, 0)),
-    ("        Gravy Beats-Shinigami, Gravy Beats-Ronin, Gravy Beats-Amaterasu,", TILE, 14 * TILE, font05, (0, 0, 0)),
-)
-reference_items = (
-    ("<-", 0, 0, font3, (0, 0, 0), (255, 0, 0), 0, 'return'),
-)
-reference = Menu(reference_sentences, reference_items)
+# Сцены создаются при первом появлении: lru_cache возвращает одну и ту же сцену при каждом вызове.
+@lru_cache(maxsize=None)
+def pause() -> Menu:
+    """Создаёт меню паузы."""
+    pause_items = (
+        ("Продолжить", W // 2 - TILE * 8, TILE * 7, font(3), (0, 0, 0), (255, 0, 0), 0, 'return'),
+    )
+    pause_sentences = (
+        ("Пауза", W // 2 - TILE * 4, TILE, font(3), (0, 0, 0)),
+    )
+    return Menu(pause_sentences, pause_items)
+
+
+@lru_cache(maxsize=None)
+def new_round() -> Round:
+    """Создаёт новый раунд."""
+    return Round()
 
-# Создаю сцену рекордов.
-def get_records() -> list:
-    """Возвращает массив линий из файла records.txt. Если такого файла нету, создаёт его.
+
+def save_game() -> None:
+    """Сохраняет незаконченную игру человека в файл resume_path. Вызывается при выходе.
+
+    Файл записывается целиком во временный и затем переименовывается, чтобы выключение посреди записи
+    не оставило обрезанный снимок.
 
     Возвращаемое значение:
-        list(str): рекорды пользователя.
+        None
     """
-    try:
-        recs = open(path.join("records.txt"))
-        ret = recs.readlines()
-    except FileNotFoundError:
-        recs = open(path.join("records.txt"), 'w')
-        ret = []
-    recs.close()
-    return ret
+    if not new_round.cache_info().currsize:  # Человек не начинал играть.
+        return
+    engine = new_round().engine
+    if engine.over or not engine.frames:
+        return
+    temp = resume_path + ".tmp"
+    with open(temp, 'wb') as f:
+        f.write(engine.snapshot())
+    replace(temp, resume_path)
 
 
-def set_records(score: int) -> list:
-    """Заносит рекорды в файл records.txt с учётом счёта score.
+def load_game() -> bytes:
+    """Читает и удаляет файл resume_path: игра продолжается один раз, даже если снимок не подошёл.
+
+    Возвращаемое значение:
+        bytes: снимок движка или None, если сохранённой игры нет.
+    """
+    if not path.exists(resume_path):
+        return None
+    with open(resume_path, 'rb') as f:
+        data = f.read()
+    remove(resume_path)
+    return data
+
+
+@lru_cache(maxsize=None)
+def demo_round() -> Round:
+    """Создаёт демонстрационный раунд, в котором играет бот."""
+    return Round(demo=True)
+
+
+@lru_cache(maxsize=None)
+def reference() -> Menu:
+    """Создаёт сцену справки."""
+    reference_sentences = (
+        ("Управление:", 5 * TILE, TILE, font(2), (0, 0, 0)),
+        ("Стрелка вправо-двигаться вправо;", 2 * TILE, 3 * TILE, font(1), (0, 0, 0)),
+        ("Стрелка влево-двигаться влево;", 2 * TILE, 4 * TILE, font(1), (0, 0, 0)),
+        ("Стрелка вниз-устремить тетромина вниз;", 2 * TILE, 5 * TILE, font(1), (0, 0, 0)),
+        ("Стрелка вверх-повернуть тетрамино;", 2 * TILE, 6 * TILE, font(1), (0, 0, 0)),
+        ("Пробел-пауза, Enter-сбросить тетрамино.", 2 * TILE, 7 * TILE, font(1), (0, 0, 0)),
+        ("В меню: стрелки, Enter-выбрать, Escape-назад.", 2 * TILE, 8 * TILE, font(1), (0, 0, 0)),
+        ("Музыка: Gravy Beats-Genkai, Gravy Beats-Katsu, Iruka-Taikai,", TILE, 9 * TILE, font(0.5), (0, 0, 0)),
+        ("        Gravy Beats-Kaze, Iruka-Gojira, Gravy Beats-Samurai,", TILE, 10 * TILE, font(0.5), (0, 0, 0)),
+        ("        Iruka-Ukiyo-e , Gravy Beats Madara II, GravyBeats-Bushido,", TILE, 11 * TILE, font(0.5), (0, 0, 0)),
+        ("        Iruka-Doomed, Gravy-Kasai, Iruka-Shinigami,", TILE, 12 * TILE, font(0.5), (0, 0, 0)),
+        ("        Iruka-Uchigatana, Gravy Beats-Warrior Spirit, Gravy Beats-Shinobi,", TILE, 13 * TILE, font(0.5),
+         (0, 0, 0)),
+        ("        Gravy Beats-Shinigami, Gravy Beats-Ronin, Gravy Beats-Amaterasu,", TILE, 14 * TILE, font(0.5),
+         (0, 0, 0)),
+    )
+    reference_items = (
+        ("<-", 0, 0, font(3), (0, 0, 0), (255, 0, 0), 0, 'return'),
+    )
+    return Menu(reference_sentences, reference_items)
+
+
+@lru_cache(maxsize=None)
+def records_store() -> RecordStore:
+    """Открывает таблицу рекордов, общую для всех автоматов, которые играют с одним файлом records.txt."""
+    return RecordStore(path.join("records.txt"))
+
+
+player = environ.get("TETRIS_PLAYER", "")  # Имя игрока в таблице рекордов.
+# Сервер игры против других игроков (python versus.py): TETRIS_SERVER=адрес:порт. Если он задан,
+# пункт 'Играть' начинает матч TETRIS_MATCH на TETRIS_PLAYERS игроков вместо одиночной игры.
+server = environ.get("TETRIS_SERVER")
+
+
+def versus_round() -> Round:
+    """Подключается к серверу TETRIS_SERVER и создаёт раунд против других игроков. Каждый матч - новый раунд."""
+    host, _, port = server.rpartition(":")
+    client = Client(environ.get("TETRIS_MATCH", ""), int(environ.get("TETRIS_PLAYERS", 2)))
+    client.start(host, int(port))
+    return Round(versus=client)
+
+
+def save_replay(data: bytes, score: int, seed: int) -> str:
+    """Сохраняет повтор игры в папку replays.
 
     Атрибуты:
-        score: int: текущий счёт.
+        data: bytes: повтор в двоичном формате.
+        score: int: итоговый счёт, попадает в имя файла.
+        seed: int: зерно игры, попадает в имя файла.
 
     Возвращаемое значение:
-        list(str): рекорды пользователя с их порядковым номером с учётом переданного счёта.
+        str: путь к файлу повтора.
     """
-    # Получаю цифровое значение прошлых рекордов.
-    recs = list(map(int, [record[3:].strip() for record in get_records()]))
-    recs = sorted([score] + recs, reverse=True)
-    if len(recs) > 5:  # В файле хранится только 5 наибольших рекордов.
-        recs = recs[:-1]
-    ret = [f"{i + 1}. {record}\n" for i, record in enumerate(recs)]  # Трансформирую для красивого написания в файл.
-    with open(path.join("records.txt"), 'w') as f:  # Открываю файл для записи.
-        for line in ret:
-            f.write(line)  # Записываю каждую линию в файл.
-    return ret  # Возвращаю для использования сценой рекордов.
-
-
-records_sentences = tuple((record.strip(), TILE * 6, TILE * (3 + 2 * i), font1, (0, 0, 0))
-                          for i, record in enumerate(get_records()))
-records_items = (
-    ("<-", 0, 0, font3, (0, 0, 0), (255, 0, 0), 0, 'return'),
-)
-records = Menu(records_sentences, records_items)
+    makedirs("replays", exist_ok=True)
+    name = path.join("replays", f"{time.strftime('%Y%m%d-%H%M%S')}-{score}-{seed}.ttr")
+    with open(name, 'wb') as f:
+        f.write(data)
+    return name
 
-# Создаю сцену игрового меню.
-main_menu_sentences = (
-    ("Тетрис", W // 2 - TILE * 4, 0, font3, (255, 0, 0)),
-    ("Автор: Афанасин Егор", TILE * 3, H - TILE * 3, font1, (54, 54, 54)),
-)
-main_menu_items = (
-    ("Играть", W // 2 - 80, TILE * 3, font2, (0, 0, 0), (255, 0, 0), 0, new_round.main),
-    ("Справка", W // 2 - 80, TILE * 5 + TILE // 2, font2, (0, 0, 0), (255, 0, 0), 1, reference.main),
-    ("Рекорды", W // 2 - 80, TILE * 8, font2, (0, 0, 0), (255, 0, 0), 2, records.main),
-    ("Выйти", W // 2 - 80, TILE * 10 + TILE // 2, font2, (0, 0, 0), (255, 0, 0), 3, sys.exit),
-)
-main_menu = Menu(main_menu_sentences, main_menu_items)
 
-main_menu.main()
+@lru_cache(maxsize=None)
+def records() -> Menu:
+    """Создаёт сцену рекордов. Рекорды в ней обновляет show_records."""
+    records_items = (
+        ("<-", 0, 0, font(3), (0, 0, 0), (255, 0, 0), 0, 'return'),
+    )
+    return Menu((), records_items)
+
+
+def show_records() -> None:
+    """Открывает сцену рекордов с пятью лучшими рекордами на момент открытия.
+
+    Возвращаемое значение:
+        None
+    """
+    store = records_store()
+    store.refresh()  # Дочитываю рекорды, добавленные другими автоматами.
+    records().sentences = tuple((f"{i + 1}. {score} {name}".rstrip(), TILE * 6, TILE * (3 + 2 * i), font(1), (0, 0, 0))
+                                for i, (score, name) in enumerate(store.top(5)))
+    records().main()
+
+
+@lru_cache(maxsize=None)
+def main_menu() -> Menu:
+    """Создаёт сцену игрового меню."""
+    main_menu_sentences = (
+        ("Тетрис", W // 2 - TILE * 4, 0, font(3), (255, 0, 0)),
+        ("Автор: Афанасин Егор", TILE * 3, H - TILE * 3, font(1), (54, 54, 54)),
+    )
+    main_menu_items = (
+        ("Играть", W // 2 - 80, TILE * 3, font(2), (0, 0, 0), (255, 0, 0), 0,
+         lambda: (versus_round() if server else new_round()).main()),
+        ("Справка", W // 2 - 80, TILE * 5 + TILE // 2, font(2), (0, 0, 0), (255, 0, 0), 1, lambda: reference().main()),
+        ("Рекорды", W // 2 - 80, TILE * 8, font(2), (0, 0, 0), (255, 0, 0), 2, show_records),
+        ("Демо", W // 2 - 80, TILE * 10 + TILE // 2, font(2), (0, 0, 0), (255, 0, 0), 3, lambda: demo_round().main()),
+        ("Выйти", W // 2 - 80, TILE * 13, font(2), (0, 0, 0), (255, 0, 0), 4, sys.exit),
+    )
+    return Menu(main_menu_sentences, main_menu_items)
+
+
+if __name__ == "__main__":
+    init()
+    # python main.py --replay файл - воспроизводит повтор в реальном времени перед главным меню.
+    if len(sys.argv) > 2 and sys.argv[1] == "--replay":
+        if (WT, HT) != BOARD:
+            print(f"Повторы записаны на стакане {BOARD[0]}x{BOARD[1]}, а задан TETRIS_BOARD={WT}x{HT}")
+        else:
+            with open(sys.argv[2], 'rb') as replay_file:
+                Round(replay=replay_file.read()).main()
+    # Автомат выключили посреди игры - продолжаю её перед главным меню.
+    if resume_path:
+        saved = load_game()
+        if saved is not None:
+            if new_round().resume(saved):
+                new_round().main()
+            else:
+                print(f"{resume_path}: игра сохранена на стакане другого размера, а задан {WT}x{HT}")
+
+    main_menu().main()
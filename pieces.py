@@ -0,0 +1,246 @@
+"""Последовательности тетрамино: правила выбора следующего тетрамино и общие буферы последовательностей.
+
+Правило (policy) - генератор номеров тетрамино от 0 до COUNT - 1, который берёт случайные числа
+только из переданного ему random.Random, поэтому последовательность полностью определяется зерном:
+
+    bag9 - «мешок» из семи различных и ещё 2 случайных тетрамино, правило игры по умолчанию.
+    bag7 - «мешок» из семи различных тетрамино.
+    history - случайное тетрамино, которое перевыбирается, если оно есть среди последних HISTORY.
+    uniform - каждое тетрамино случайно и независимо от прошлых.
+
+Для моделирования последовательность генерируется сразу целиком (generate, array) или хранится
+в общем буфере Sequence, из которого несколько игр берут одни и те же тетрамино.
+Как и engine, модуль не зависит от pygame, а NumPy нужен только функции array.
+"""
+
+from functools import lru_cache
+from itertools import islice
+from random import Random, randrange
+
+COUNT = 7  # Количество различных тетрамино.
+HISTORY = 4  # Сколько последних тетрамино помнит правило history.
+HISTORY_TRIES = 4  # Сколько раз правило history перевыбирает тетрамино, которое недавно было.
+CHUNK = 4096  # По сколько тетрамино в куске буфера Sequence.
+SHARED = 64  # Сколько последовательностей хранит shared.
+
+
+def bag9(random: Random):
+    """Модифицированный алгоритм генератора случайностей 7-bag.
+
+    Список семи различных и ещё 2 случайные тетрамино помещаются в «мешок», после чего
+    фигуры одна за другой случайным образом извлекаются из него, пока «мешок» не опустеет.
+    Когда он опустеет, фигуры возвращаются в него и процесс повторяется.
+
+    Примечание:
+        Первые два тетрамино игры (падающее и следующее) выбираются случайно до первого «мешка».
+        Так было до появления правил, и зерна старых повторов и матчей дают те же тетрамино.
+
+    Аргументы:
+        random: random.Random: генератор случайностей игры.
+
+    Yield:
+        int: номер тетрамино.
+    """
+    yield random.randrange(COUNT)
+    yield random.randrange(COUNT)
+    while True:
+        bag = list(range(COUNT)) + [random.randrange(0, COUNT), random.randrange(0, COUNT)]
+        random.shuffle(bag)
+        while bag:
+            yield bag.pop()
+
+
+def bag7(random: Random):
+    """Алгоритм 7-bag: семь различных тетрамино в случайном порядке, затем следующие семь.
+
+    Аргументы:
+        random: random.Random: генератор случайностей игры.
+
+    Yield:
+        int: номер тетрамино.
+    """
+    while True:
+        bag = list(range(COUNT))
+        random.shuffle(bag)
+        yield from bag
+
+
+def history(random: Random):
+    """Случайное тетрамино с памятью: тетрамино, которое было среди последних HISTORY, перевыбирается
+    до HISTORY_TRIES раз, поэтому одно и то же тетрамино редко идёт подряд, но порядок не предсказуем.
+
+    Аргументы:
+        random: random.Random: генератор случайностей игры.
+
+    Yield:
+        int: номер тетрамино.
+    """
+    recent = []
+    while True:
+        t = random.randrange(COUNT)
+        for _ in range(HISTORY_TRIES):
+            if t not in recent:
+                break
+            t = random.randrange(COUNT)
+        recent.append(t)
+        if len(recent) > HISTORY:
+            del recent[0]
+        yield t
+
+
+def uniform(random: Random):
+    """Каждое тетрамино случайно и не зависит от прошлых.
+
+    Аргументы:
+        random: random.Random: генератор случайностей игры.
+
+    Yield:
+        int: номер тетрамино.
+    """
+    while True:
+        yield random.randrange(COUNT)
+
+
+# Правила по именам. Порядок не меняется: номер правила записывается в повторы.
+POLICIES = {"bag9": bag9, "bag7": bag7, "history": history, "uniform": uniform}
+NAMES = tuple(POLICIES)
+DEFAULT = "bag9"
+
+
+def generate(n: int, seed: int, policy: str = DEFAULT) -> bytes:
+    """Генерирует первые n тетрамино последовательности, по байту на тетрамино.
+
+    Аргументы:
+        n: int: количество тетрамино.
+        seed: int: зерно генератора случайностей.
+        policy: str: имя правила из POLICIES.
+
+    Возвращаемое значение:
+        bytes: номера тетрамино.
+    """
+    return bytes(islice(POLICIES[policy](Random(seed)), n))
+
+
+def array(data):
+    """Возвращает последовательность как массив NumPy без копирования.
+
+    Аргументы:
+        data: bytes: последовательность из generate, кусок Sequence.chunks или Sequence.data.
+
+    Возвращаемое значение:
+        numpy.ndarray(uint8): номера тетрамино. Массив от bytes доступен только для чтения.
+    """
+    import numpy as np
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+class Sequence:
+    """Класс Sequence хранит одну последовательность тетрамино в общем буфере.
+
+        Основное применение:
+            Несколько игр или моделирований берут одинаковые тетрамино из одного буфера,
+            а не генерируют их каждая заново: Engine(sequence=sequence).
+
+        Примечание:
+            Буфер хранится кусками по CHUNK тетрамино, тетрамино номер pos лежит в куске pos // CHUNK.
+            Куски не меняются после создания, поэтому продолжение последовательности не копирует
+            уже сгенерированные тетрамино, а массивы pieces.array от кусков остаются верными.
+
+            Последовательность, созданная по правилу и зерну, дописывается по куску, когда какой-нибудь
+            игре не хватило буфера. Последовательность из готового буфера (например, из общей памяти
+            другого процесса) не дописывается: её игры кончаются вместе с буфером, поэтому буфер должен
+            быть не короче самой длинной игры. Куски такой последовательности - memoryview готового буфера.
+
+        Атрибуты:
+            policy: str: имя правила или None для готового буфера.
+            seed: int: зерно генератора случайностей или None для готового буфера.
+            chunks: list(bytes или memoryview): куски номеров уже сгенерированных тетрамино.
+            data: bytes: все уже сгенерированные тетрамино одним буфером, копия кусков.
+
+        Методы:
+            extend(self, n: int):
+                Дописывает в буфер не меньше n тетрамино целыми кусками.
+
+            cursor(self, start: int):
+                Возвращает генератор тетрамино, начиная с тетрамино номер start.
+
+            __iter__(self):
+                Возвращает генератор тетрамино с начала последовательности.
+    """
+    def __init__(self, policy: str = DEFAULT, seed: int = None, data=None):
+        if data is not None:
+            self.policy = self.seed = None
+            view = memoryview(data)
+            self.chunks = [view[i:i + CHUNK] for i in range(0, len(view), CHUNK)]
+            self.length = len(view)
+            self.generator = None
+        else:
+            self.policy = policy
+            self.seed = randrange(2 ** 32) if seed is None else seed
+            self.chunks = []
+            self.length = 0
+            self.generator = POLICIES[policy](Random(self.seed))
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def data(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def extend(self, n: int) -> None:
+        """Метод для продолжения последовательности новыми кусками по CHUNK тетрамино.
+
+        Аргументы:
+            n: int: сколько тетрамино дописать, округляется вверх до целого количества кусков.
+
+        Возвращаемое значение:
+            None
+        """
+        for _ in range(-(-n // CHUNK)):
+            self.chunks.append(bytes(islice(self.generator, CHUNK)))
+        self.length = len(self.chunks) * CHUNK
+
+    def cursor(self, start: int = 0):
+        """Метод для чтения последовательности с тетрамино номер start. Каждый вызов читает её независимо
+        от других, например игра, восстановленная из снимка, продолжает с тетрамино, на котором был снимок.
+
+        Аргументы:
+            start: int: номер первого тетрамино.
+
+        Yield:
+            int: номер тетрамино.
+        """
+        index, offset = divmod(start, CHUNK)
+        while True:
+            if index >= len(self.chunks):
+                if self.generator is None:
+                    return
+                self.extend((index + 1 - len(self.chunks)) * CHUNK)
+            yield from self.chunks[index][offset:]
+            index, offset = index + 1, 0
+
+    def __iter__(self):
+        """Метод для чтения последовательности с начала.
+
+        Yield:
+            int: номер тетрамино.
+        """
+        return self.cursor(0)
+
+
+@lru_cache(maxsize=SHARED)
+def shared(policy: str, seed: int) -> Sequence:
+    """Возвращает общую последовательность правила policy с зерном seed.
+
+    Игры, которые восстанавливаются из снимков одной игры, берут тетрамино из одного буфера,
+    поэтому тетрамино генерируются один раз, а не заново при каждом восстановлении.
+
+    Аргументы:
+        policy: str: имя правила из POLICIES.
+        seed: int: зерно генератора случайностей.
+
+    Возвращаемое значение:
+        Sequence: последовательность.
+    """
+    return Sequence(policy, seed)
@@ -0,0 +1,162 @@
+"""Замер длительности фаз каждого кадра: обработка событий, логика, отрисовка, обновление экрана.
+
+Профилировщик включается ключом python main.py --profile или переменной окружения TETRIS_PROFILE.
+Если он выключен, то не создаётся вовсе, и циклы кадров ничего не замеряют.
+При выходе из игры гистограммы длительностей сохраняются в JSON:
+
+    {
+        "fps": 60, "frames": 1234, "dropped": 5, "bucket_ms": 0.5,
+        "phases": {"draw": {"count": 1234, "p50": 0.3, "p99": 1.2, "histogram": [[0.0, 1000], [0.5, 200], ...]}, ...}
+    }
+
+где histogram - пары (нижняя граница корзины в мс, количество кадров), пустые корзины пропущены.
+"""
+
+import json
+import time
+from collections import deque
+
+
+def percentile(values, q: float) -> float:
+    """Возвращает перцентиль q (от 0 до 1) значений values, 0.0 - если значений нет."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Profiler:
+    """Класс Profiler копит длительности фаз кадров.
+
+        Основное применение:
+            Циклы Round.main и Menu.main вызывают mark после каждой фазы и end в конце кадра,
+            главный модуль рисует таблицу report поверх экрана.
+
+        Примечание:
+            Фаза, отмеченная в кадре несколько раз, суммируется. Фаза 'frame' - длительность всего кадра.
+            Кадр считается пропущенным, если он длился дольше 1000 / fps мс: кадр длиной в 2,5 бюджета
+            означает 2 пропущенных кадра.
+
+        Атрибуты:
+            fps: int: частота кадров, которую должна держать игра.
+            window: int: по скольким последним кадрам считаются перцентили.
+            bucket: float: ширина корзины гистограммы в мс.
+            frames: int: количество замеренных кадров.
+            dropped: int: количество пропущенных кадров.
+
+        Методы:
+            start(self):
+                Начинает новый кадр, отбрасывая замеры незаконченного.
+
+            mark(self, phase: str):
+                Относит время с прошлой отметки к фазе phase.
+
+            end(self):
+                Заканчивает кадр.
+
+            sample(self, name: str, ms: float):
+                Добавляет замер, не связанный с фазами кадра, например задержку от нажатия до экрана.
+
+            report(self) -> list(tuple):
+                Возвращает медиану и 99-й перцентиль каждой фазы по последним кадрам.
+
+            dump(self, filename: str):
+                Сохраняет гистограммы длительностей фаз в файл filename.
+    """
+    def __init__(self, fps: int = 60, window: int = 240, bucket: float = 0.5):
+        self.fps = fps
+        self.window = window
+        self.bucket = bucket
+        self.frames = 0
+        self.dropped = 0
+        self.samples = {}  # Фаза -> длительности в последних кадрах, мс.
+        self.histograms = {}  # Фаза -> {номер корзины: количество кадров}.
+        self.start()
+
+    def start(self) -> None:
+        """Метод для начала нового кадра.
+
+        Вызывается перед первым кадром цикла и после долгих остановок (пауза, вложенная сцена),
+        чтобы они не попали в замеры.
+
+        Возвращаемое значение:
+            None
+        """
+        self.current = {}
+        self.last = self.frame_start = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """Метод для отметки конца фазы.
+
+        Аргументы:
+            phase: str: название фазы, которая длилась с прошлой отметки.
+
+        Возвращаемое значение:
+            None
+        """
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0) + (now - self.last) * 1000
+        self.last = now
+
+    def end(self) -> None:
+        """Метод для окончания кадра.
+
+        Возвращаемое значение:
+            None
+        """
+        total = (self.last - self.frame_start) * 1000
+        self.current["frame"] = total
+        for phase, ms in self.current.items():
+            self.sample(phase, ms)
+        self.frames += 1
+        self.dropped += max(0, int(total * self.fps / 1000) - 1)
+        self.current = {}
+        self.frame_start = self.last
+
+    def sample(self, name: str, ms: float) -> None:
+        """Метод для добавления отдельного замера в перцентили и гистограмму name.
+
+        Аргументы:
+            name: str: название замера, в таблице и файле он стоит рядом с фазами кадров.
+            ms: float: длительность в мс.
+
+        Возвращаемое значение:
+            None
+        """
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.window)
+            self.histograms[name] = {}
+        self.samples[name].append(ms)
+        histogram = self.histograms[name]
+        index = int(ms / self.bucket)
+        histogram[index] = histogram.get(index, 0) + 1
+
+    def report(self) -> list:
+        """Метод для получения перцентилей фаз по последним window кадрам.
+
+        Возвращаемое значение:
+            list(tuple): (фаза, медиана в мс, 99-й перцентиль в мс) в порядке первого появления фаз.
+        """
+        return [(phase, percentile(values, 0.5), percentile(values, 0.99)) for phase, values in self.samples.items()]
+
+    def dump(self, filename: str) -> None:
+        """Метод для сохранения гистограмм длительностей фаз.
+
+        Аргументы:
+            filename: str: имя файла JSON.
+
+        Возвращаемое значение:
+            None
+        """
+        phases = {}
+        for phase, p50, p99 in self.report():
+            histogram = self.histograms[phase]
+            phases[phase] = {
+                "count": sum(histogram.values()),
+                "p50": p50,
+                "p99": p99,
+                "histogram": [[index * self.bucket, histogram[index]] for index in sorted(histogram)],
+            }
+        with open(filename, "w") as f:
+            json.dump({"fps": self.fps, "frames": self.frames, "dropped": self.dropped,
+                       "bucket_ms": self.bucket, "phases": phases}, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,287 @@
+"""Таблица рекордов, общая для нескольких игровых автоматов.
+
+Рекорды хранятся в журнале records.txt, в который только дописываются линии, и в памяти:
+все счёты упорядочены для поиска места за O(log n), лучшие size рекордов хранятся отдельно
+и обновляются при каждом добавлении.
+
+Формат линии журнала: "счёт<TAB>имя<TAB>crc32\n", crc32 - контрольная сумма "счёт<TAB>имя"
+в шестнадцатеричном виде. Линии старого формата "1. счёт" читаются как рекорды без имени.
+Линия, оборванная падением программы, или испорченная линия не проходит проверку и пропускается.
+
+Линия дописывается одним вызовом os.write в файл, открытый с O_APPEND, поэтому автоматы,
+которые пишут в один файл, не перемешивают линии. Время от времени журнал сжимается:
+переписывается во временный файл, который атомарно заменяет журнал, - остаются только
+limit лучших рекордов. Во время сжатия файл заблокирован (fcntl.flock, если он есть).
+"""
+
+import heapq
+import os
+import zlib
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки нет, сжатие не должно совпасть с записью другого автомата.
+    fcntl = None
+
+INSORT = 16  # До скольких новых рекордов они вставляются в индекс по одному, больше - сливаются с ним.
+
+
+def checksum(text: str) -> str:
+    """Возвращает контрольную сумму линии журнала без последнего поля."""
+    return f"{zlib.crc32(text.encode()):08x}"
+
+
+def parse(line: str) -> tuple:
+    """Разбирает линию журнала.
+
+    Аргументы:
+        line: str: линия без перевода строки.
+
+    Возвращаемое значение:
+        tuple: (счёт, имя) или None, если линия испорчена.
+    """
+    fields = line.split("\t")
+    if len(fields) == 3:
+        score, name, crc = fields
+        if crc == checksum(f"{score}\t{name}") and score.isdigit():
+            return int(score), name
+        return None
+    # Старый формат: "1. 12345".
+    number, _, score = line.partition(". ")
+    if number.isdigit() and score.strip().isdigit():
+        return int(score), ""
+    return None
+
+
+def format_record(score: int, name: str) -> bytes:
+    """Возвращает линию журнала для рекорда."""
+    # Табуляция и переводы строк в имени сломали бы формат журнала.
+    name = " ".join(name.split())
+    text = f"{score}\t{name}"
+    return f"{text}\t{checksum(text)}\n".encode()
+
+
+class RecordStore:
+    """Класс RecordStore хранит таблицу рекордов в журнале и индексе в памяти.
+
+        Основное применение:
+            Сцена рекордов и сохранение счёта после игры в main.py.
+
+        Примечание:
+            Индекс содержит рекорды, прочитанные из журнала этим процессом. Рекорды других
+            автоматов подхватываются методом refresh, который дочитывает только новые линии.
+
+        Атрибуты:
+            filename: str: путь к журналу.
+            size: int: сколько лучших рекордов хранится вместе с именами.
+            limit: int: сколько лучших рекордов остаётся в журнале после сжатия.
+            compact_every: int: через сколько добавленных рекордов журнал сжимается.
+
+        Методы:
+            load(self):
+                Строит индекс по журналу заново.
+
+            refresh(self):
+                Дочитывает из журнала рекорды, добавленные с прошлого чтения.
+
+            add(self, score: int, name: str) -> int:
+                Дописывает рекорд в журнал и возвращает его место.
+
+            rank(self, score: int) -> int:
+                Возвращает место, которое занял бы счёт score.
+
+            top(self, n: int) -> list(tuple):
+                Возвращает n лучших рекордов.
+
+            compact(self):
+                Сжимает журнал до limit лучших рекордов.
+    """
+    def __init__(self, filename: str = "records.txt", size: int = 10, limit: int = 100000,
+                 compact_every: int = 1000):
+        self.filename = filename
+        self.size = size
+        self.limit = limit
+        self.compact_every = compact_every
+        self.appended = 0  # Сколько рекордов добавлено с прошлого сжатия.
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Открывает журнал для дописывания и блокирует его.
+
+        Аргументы:
+            exclusive: bool: True - монопольная блокировка для сжатия, иначе - общая для записи.
+
+        Yield:
+            int: дескриптор файла журнала.
+        """
+        while True:
+            fd = os.open(self.filename, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Пока ждали блокировку, другой автомат мог сжать журнал и подменить файл.
+            if os.fstat(fd).st_ino == os.stat(self.filename).st_ino:
+                break
+            os.close(fd)
+        try:
+            yield fd
+        finally:
+            os.close(fd)  # Закрытие файла снимает блокировку.
+
+    def insert(self, records: list) -> None:
+        """Метод для добавления рекордов в индекс.
+
+        Аргументы:
+            records: list(tuple): рекорды (счёт, имя) в порядке добавления.
+
+        Возвращаемое значение:
+            None
+        """
+        new = sorted(score for score, _ in records)
+        if not self.scores:  # Индекс строится заново (load, compact): сортирую весь журнал один раз.
+            self.scores = new
+        elif len(new) <= INSORT:
+            for score in new:
+                insort(self.scores, score)  # Поиск места за O(log n) и один сдвиг хвоста списка.
+        else:
+            # Много рекордов других автоматов: список состоит из двух упорядоченных кусков,
+            # и сортировка сливает их за один проход.
+            self.scores += new
+            self.scores.sort()
+        # При равном счёте выше стоит рекорд, поставленный раньше.
+        keys = [(-score, self.count + i, name) for i, (score, name) in enumerate(records)]
+        self.count += len(records)
+        self.best = heapq.nsmallest(self.size, self.best + keys)
+
+    def read(self) -> None:
+        """Метод для чтения линий журнала, добавленных с прошлого чтения.
+
+        Возвращаемое значение:
+            None
+        """
+        with open(self.filename, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # Незаконченная линия дочитается, когда её допишут.
+        records = [parse(line) for line in data[:end].decode(errors="replace").splitlines()]
+        self.insert([record for record in records if record is not None])
+        self.offset += end
+
+    def load(self) -> None:
+        """Метод для построения индекса по журналу заново. Создаёт пустой журнал, если его нет.
+
+        Возвращаемое значение:
+            None
+        """
+        self.scores = []  # Все счёты по возрастанию.
+        self.best = []  # size лучших рекордов: (-счёт, номер рекорда, имя) по возрастанию.
+        self.count = 0  # Номер следующего рекорда, чтобы при равном счёте выше был более ранний.
+        self.offset = 0  # Сколько байт журнала уже прочитано.
+        try:
+            self.read()
+        except FileNotFoundError:
+            with self.locked():
+                pass
+            self.read()
+
+    def refresh(self) -> None:
+        """Метод для чтения рекордов, добавленных другими автоматами.
+
+        Возвращаемое значение:
+            None
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            stat = None
+        # Журнал сжали или удалили - читаю его заново.
+        if stat is None or stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.load()
+        elif stat.st_size > self.offset:
+            self.read()
+
+    def add(self, score: int, name: str = "") -> int:
+        """Метод для добавления рекорда.
+
+        Аргументы:
+            score: int: счёт.
+            name: str: имя игрока.
+
+        Возвращаемое значение:
+            int: место рекорда среди всех рекордов, начиная с 1.
+        """
+        line = format_record(score, name)
+        with self.locked() as fd:
+            size = os.fstat(fd).st_size
+            if size:
+                os.lseek(fd, size - 1, os.SEEK_SET)
+                if os.read(fd, 1) != b"\n":
+                    line = b"\n" + line  # Отделяю оборванную линию, чтобы не испортить новую.
+            os.write(fd, line)
+            os.fsync(fd)
+        self.refresh()
+        self.appended += 1
+        if self.appended >= self.compact_every:
+            self.compact()
+        return self.rank(score)
+
+    def rank(self, score: int) -> int:
+        """Метод для поиска места счёта среди всех рекордов.
+
+        Аргументы:
+            score: int: счёт.
+
+        Возвращаемое значение:
+            int: 1 + количество рекордов с большим счётом.
+        """
+        return len(self.scores) - bisect_right(self.scores, score) + 1
+
+    def top(self, n: int = None) -> list:
+        """Метод для получения лучших рекордов.
+
+        Аргументы:
+            n: int: количество рекордов, не больше size. По умолчанию - size.
+
+        Возвращаемое значение:
+            list(tuple): (счёт, имя) по убыванию счёта.
+        """
+        return [(-score, name) for score, _, name in self.best[:n]]
+
+    def compact(self) -> None:
+        """Метод для сжатия журнала до limit лучших рекордов.
+
+        Журнал переписывается во временный файл, который заменяет его атомарно: при падении
+        программы остаётся либо старый журнал, либо новый целиком.
+
+        Возвращаемое значение:
+            None
+        """
+        with self.locked(exclusive=True) as fd:
+            os.lseek(fd, 0, os.SEEK_SET)
+            chunks = []
+            while True:
+                chunk = os.read(fd, 1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            records = [parse(line) for line in b"".join(chunks).decode(errors="replace").splitlines()]
+            # Сортировка устойчива: при равном счёте сохраняется порядок добавления.
+            records = sorted((record for record in records if record is not None),
+                             key=lambda record: -record[0])[:self.limit]
+            temp = f"{self.filename}.tmp"
+            with open(temp, "wb") as f:
+                f.write(b"".join(format_record(score, name) for score, name in records))
+                f.flush()
+                os.fsync(f.fileno())
+            if fcntl is not None:
+                os.replace(temp, self.filename)  # Под блокировкой, чтобы не потерять запись другого автомата.
+        if fcntl is None:
+            os.replace(temp, self.filename)  # В Windows открытый файл нельзя заменить.
+        self.appended = 0
+        self.load()
@@ -0,0 +1,214 @@
+"""Запись и воспроизведение повторов игры.
+
+Повтор - это зерно генератора случайностей и коды входных событий с номерами кадров.
+Движок engine.Engine полностью определяется ими, поэтому повтор воспроизводится точно:
+в реальном времени (python main.py --replay файл) или без дисплея на полной скорости
+(python replay.py файл ...), чтобы проверить итоговый счёт.
+
+Формат файла:
+    MAGIC_SETTINGS, зерно (8 байт, little-endian), 3 байта настроек управления: DAS, ARR, клеток за тик
+    при падении вниз (NONE - None), байт номера правила выбора тетрамино в pieces.NAMES, затем события.
+    Каждое событие - число (разница номеров кадров с прошлым событием << CODE_BITS | код) в формате LEB128.
+    Последнее событие - END, кадр, на котором игра закончилась.
+
+    Повторы первого формата начинаются с MAGIC, за зерном у них сразу идут события, код занимает 3 бита,
+    а конец игры - код 7. Они по-прежнему воспроизводятся с настройками engine.HANDLING и правилом
+    pieces.DEFAULT.
+"""
+
+import struct
+import sys
+
+from engine import Engine, HANDLING
+from pieces import DEFAULT, NAMES
+
+MAGIC = b"TTR1"
+MAGIC_SETTINGS = b"TTR2"
+NONE = 255  # Байт настройки управления, равной None.
+CODE_BITS = 4  # Сколько младших бит события занимает код.
+END = 15  # Код конца игры, движку не передаётся.
+OLD_CODE_BITS, OLD_END = 3, 7  # То же в повторах MAGIC.
+
+
+class Recorder:
+    """Класс Recorder записывает повтор одной игры.
+
+        Атрибуты:
+            seed: int: зерно генератора случайностей игры.
+            handling: tuple: настройки управления игры, см. engine.HANDLING.
+            policy: str: правило выбора тетрамино, см. pieces.POLICIES.
+
+        Методы:
+            record(self, frame: int, codes: iterable(int)):
+                Записывает коды входных событий кадра frame.
+
+            end(self, frame: int):
+                Записывает конец игры на кадре frame.
+
+            dump(self) -> bytes:
+                Возвращает повтор в двоичном формате.
+    """
+    def __init__(self, seed: int, handling: tuple = HANDLING, policy: str = DEFAULT):
+        self.seed = seed
+        self.handling = tuple(handling)
+        self.policy = policy
+        self.events = bytearray()
+        self.last = 0  # Номер кадра последнего записанного события.
+
+    def record(self, frame: int, codes) -> None:
+        """Метод для записи кодов входных событий кадра.
+
+        Аргументы:
+            frame: int: номер кадра, engine.frames до вызова engine.step.
+            codes: iterable(int): коды входных событий кадра.
+
+        Возвращаемое значение:
+            None
+        """
+        for code in codes:
+            value = (frame - self.last) << CODE_BITS | code
+            self.last = frame
+            # Записываю число по 7 бит, старший бит байта - есть ли ещё байты.
+            while value > 0x7F:
+                self.events.append(value & 0x7F | 0x80)
+                value >>= 7
+            self.events.append(value)
+
+    def end(self, frame: int) -> None:
+        """Метод для записи конца игры.
+
+        Аргументы:
+            frame: int: номер кадра, на котором игра закончилась.
+
+        Возвращаемое значение:
+            None
+        """
+        self.record(frame, (END, ))
+
+    def dump(self) -> bytes:
+        """Метод для получения повтора в двоичном формате.
+
+        Возвращаемое значение:
+            bytes: повтор.
+        """
+        header = MAGIC_SETTINGS + struct.pack("<Q", self.seed)
+        header += bytes(NONE if value is None else value for value in self.handling)
+        header += bytes((NAMES.index(self.policy), ))
+        return header + bytes(self.events)
+
+
+def load(data: bytes) -> tuple:
+    """Разбирает повтор.
+
+    Аргументы:
+        data: bytes: повтор в двоичном формате.
+
+    Возвращаемое значение:
+        tuple: (зерно, list(tuple): пары (номер кадра, код), настройки управления, правило выбора тетрамино).
+            Конец игры в повторе любого формата возвращается кодом END.
+    """
+    magic = data[:len(MAGIC)]
+    if magic not in (MAGIC, MAGIC_SETTINGS):
+        raise ValueError("Это не файл повтора")
+    seed, = struct.unpack_from("<Q", data, len(MAGIC))
+    start = len(MAGIC) + 8
+    if magic == MAGIC:
+        handling, policy = HANDLING, DEFAULT
+        bits, end = OLD_CODE_BITS, OLD_END
+    else:
+        handling = tuple(None if value == NONE else value for value in data[start:start + 3])
+        policy = NAMES[data[start + 3]]
+        start += 4
+        bits, end = CODE_BITS, END
+    mask = (1 << bits) - 1
+    events = []
+    frame = value = shift = 0
+    for byte in data[start:]:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            frame += value >> bits
+            code = value & mask
+            events.append((frame, END if code == end else code))
+            value = shift = 0
+    return seed, events, handling, policy
+
+
+class Player:
+    """Класс Player выдаёт движку коды входных событий из повтора.
+
+        Основное применение:
+            Источник входных событий для Round из main.py и для функции play.
+
+        Атрибуты:
+            seed: int: зерно генератора случайностей игры.
+            handling: tuple: настройки управления игры, с ними создаётся движок.
+            policy: str: правило выбора тетрамино игры, с ним создаётся движок.
+            end: int: номер кадра, на котором игра закончилась, или None.
+
+        Методы:
+            inputs(self, engine) -> list(int):
+                Возвращает коды входных событий текущего кадра движка.
+
+            finished(self, engine) -> bool:
+                Проверяет, закончился ли повтор.
+    """
+    def __init__(self, data: bytes):
+        self.seed, events, self.handling, self.policy = load(data)
+        self.end = events[-1][0] if events and events[-1][1] == END else None
+        self.events = [event for event in events if event[1] != END]
+        self.pos = 0  # Номер следующего события.
+
+    def inputs(self, engine) -> list:
+        """Метод для получения кодов входных событий текущего кадра.
+
+        Аргументы:
+            engine: engine.Engine: игра, созданная с зерном self.seed, настройками self.handling
+                и правилом self.policy.
+
+        Возвращаемое значение:
+            list(int): коды входных событий для engine.step.
+        """
+        codes = []
+        events = self.events
+        while self.pos < len(events) and events[self.pos][0] <= engine.frames:
+            codes.append(events[self.pos][1])
+            self.pos += 1
+        return codes
+
+    def finished(self, engine) -> bool:
+        """Метод для проверки конца повтора.
+
+        Аргументы:
+            engine: engine.Engine: игра, которая воспроизводится.
+
+        Возвращаемое значение:
+            bool: True - если игра окончена или дошла до кадра конца записи.
+        """
+        return engine.over or (self.end is not None and engine.frames >= self.end)
+
+
+def play(data: bytes) -> Engine:
+    """Воспроизводит повтор без дисплея на полной скорости.
+
+    Аргументы:
+        data: bytes: повтор в двоичном формате.
+
+    Возвращаемое значение:
+        engine.Engine: игра в состоянии конца повтора.
+    """
+    player = Player(data)
+    engine = Engine(seed=player.seed, handling=player.handling, policy=player.policy)
+    step, inputs = engine.step, player.inputs
+    # Повтор без кадра конца (например, обрезанный файл) воспроизводится до последнего события.
+    end = player.end if player.end is not None else (player.events[-1][0] + 1 if player.events else 0)
+    while not engine.over and engine.frames < end:
+        step(inputs(engine))
+    return engine
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        with open(name, "rb") as f:
+            game = play(f.read())
+        print(f"{name}: зерно {game.seed}, кадров {game.frames}, раунд {game.num}, счёт {game.score}")
@@ -0,0 +1,224 @@
+"""Состояние игры и входные события в общей памяти для ботов и аналитики в других процессах.
+
+Игра (python main.py с переменной окружения TETRIS_SHARED=имя) создаёт блок общей памяти
+multiprocessing.shared_memory с этим именем и каждый кадр записывает в него состояние движка.
+Другие процессы подключаются к блоку по имени, читают состояние без сериализации и передают игре
+коды входных событий engine через кольцевые буферы. Модуль не зависит от pygame.
+
+Раскладка блока (little-endian), смещения в байтах:
+    0           HEADER: MAGIC, WT, HT, количество колец, размер кольца.
+    SEQ         uint64: счётчик записей. Нечётный - игра как раз записывает состояние.
+    STATE       STATE: кадр, счёт, закреплённые тетрамино, раунд, линии, конец игры,
+                падающее тетрамино (t, r, x, y), следующее тетрамино (t, r, x, y).
+    FIELD       HT x uint16: заполненность стакана, бит x - столбец x.
+    RINGS       кольца входных событий: голова uint64, хвост uint64, ring_size байт кодов.
+
+Чтение устроено как seqlock: читатель берёт счётчик, читает состояние и проверяет, что счётчик
+не изменился и чётный, иначе повторяет. Читателей может быть сколько угодно, игра их не ждёт.
+
+Каждое кольцо - очередь без блокировок для одного пишущего процесса: он пишет код и сдвигает голову,
+игра читает коды и сдвигает хвост. Каждый процесс, который передаёт входные события, должен писать
+в своё кольцо.
+"""
+
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+from engine import WT, HT
+
+MAGIC = b"TTS1"
+HEADER = struct.Struct("<4sHHHH")
+U64 = struct.Struct("<Q")  # Счётчик записей, голова и хвост колец.
+STATE = struct.Struct("<QQQII?4b4b")
+RING = struct.Struct("<QQ")  # Голова и хвост кольца.
+
+
+def align(offset: int) -> int:
+    """Выравнивает смещение по 8 байтам."""
+    return (offset + 7) & ~7
+
+
+SEQ_OFFSET = align(HEADER.size)
+STATE_OFFSET = SEQ_OFFSET + U64.size
+FIELD_OFFSET = align(STATE_OFFSET + STATE.size)
+RINGS_OFFSET = align(FIELD_OFFSET + 2 * HT)
+FIELD = struct.Struct(f"<{HT}H")
+
+
+class SharedState:
+    """Класс SharedState - блок общей памяти с состоянием игры и кольцами входных событий.
+
+        Основное применение:
+            Round из main.py публикует состояние методом publish и забирает входные события методом inputs.
+            Внешние процессы читают состояние методом snapshot или напрямую через field и передают
+            входные события методом push.
+
+        Атрибуты:
+            name: str: имя блока общей памяти.
+            rings: int: количество колец входных событий.
+            ring_size: int: сколько кодов помещается в одно кольцо.
+            field: memoryview: заполненность стакана прямо в общей памяти, HT чисел uint16.
+                Читается без копирования, но может поменяться посреди чтения, согласованную копию даёт snapshot.
+
+        Методы:
+            publish(self, engine):
+                Записывает состояние движка (вызывает игра).
+
+            snapshot(self) -> tuple:
+                Возвращает согласованную копию состояния.
+
+            push(self, code: int, ring: int) -> bool:
+                Кладёт код входного события в кольцо ring (вызывает внешний процесс).
+
+            inputs(self) -> list(int):
+                Забирает коды входных событий из всех колец (вызывает игра).
+
+            close(self):
+                Отключается от блока. Создатель блока также удаляет его.
+    """
+    def __init__(self, name: str = None, create: bool = False, rings: int = 4, ring_size: int = 256):
+        if create:
+            size = RINGS_OFFSET + rings * align(RING.size + ring_size)
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+            HEADER.pack_into(self.memory.buf, 0, MAGIC, WT, HT, rings, ring_size)
+        else:
+            self.memory = attach(name)
+            magic, wt, ht, rings, ring_size = HEADER.unpack_from(self.memory.buf, 0)
+            if magic != MAGIC or (wt, ht) != (WT, HT):
+                self.memory.close()
+                raise ValueError(f"Блок {name} не содержит состояние игры {WT}x{HT}")
+        self.name = self.memory.name
+        self.create = create
+        self.rings = rings
+        self.ring_size = ring_size
+        self.buf = self.memory.buf
+        self.field = self.buf[FIELD_OFFSET:FIELD_OFFSET + 2 * HT].cast("H")
+        self.seq = U64.unpack_from(self.buf, SEQ_OFFSET)[0]
+
+    def ring_offset(self, ring: int) -> int:
+        """Возвращает смещение кольца ring в блоке."""
+        return RINGS_OFFSET + ring * align(RING.size + self.ring_size)
+
+    def publish(self, engine) -> None:
+        """Метод для записи состояния движка.
+
+        Аргументы:
+            engine: engine.Engine: игра.
+
+        Возвращаемое значение:
+            None
+        """
+        buf = self.buf
+        self.seq += 1
+        U64.pack_into(buf, SEQ_OFFSET, self.seq)  # Нечётный счётчик: читатели подождут.
+        STATE.pack_into(buf, STATE_OFFSET, engine.frames, engine.score, engine.pieces, engine.num, engine.lines,
+                        engine.over, *engine.figure, *engine.next_figure)
+        FIELD.pack_into(buf, FIELD_OFFSET, *engine.field)
+        self.seq += 1
+        U64.pack_into(buf, SEQ_OFFSET, self.seq)
+
+    def snapshot(self) -> tuple:
+        """Метод для получения согласованной копии состояния.
+
+        Возвращаемое значение:
+            tuple:
+            {
+                [0]: int: счётчик записей, по нему видно, изменилось ли состояние с прошлого чтения.
+                [1]: int: кадр движка, engine.frames.
+                [2]: int: счёт.
+                [3]: int: количество закреплённых тетрамино.
+                [4]: int: номер раунда.
+                [5]: int: линии, собранные в этом раунде.
+                [6]: bool: окончена ли игра.
+                [7]: tuple: падающее тетрамино (t, r, x, y).
+                [8]: tuple: следующее тетрамино (t, r, x, y).
+                [9]: tuple(int): заполненность стакана, по одной маске на линию.
+            }
+        """
+        buf = self.buf
+        while True:
+            seq, = U64.unpack_from(buf, SEQ_OFFSET)
+            if seq & 1:  # Игра как раз записывает состояние.
+                continue
+            frames, score, pieces, num, lines, over, *figures = STATE.unpack_from(buf, STATE_OFFSET)
+            field = FIELD.unpack_from(buf, FIELD_OFFSET)
+            if U64.unpack_from(buf, SEQ_OFFSET)[0] == seq:
+                return seq, frames, score, pieces, num, lines, over, tuple(figures[:4]), tuple(figures[4:]), field
+
+    def push(self, code: int, ring: int = 0) -> bool:
+        """Метод для передачи игре кода входного события.
+
+        Аргументы:
+            code: int: код входного события engine: LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP.
+            ring: int: номер кольца этого процесса.
+
+        Возвращаемое значение:
+            bool: False - если кольцо заполнено и код не передан.
+        """
+        offset = self.ring_offset(ring)
+        head, tail = RING.unpack_from(self.buf, offset)
+        if head - tail >= self.ring_size:
+            return False
+        self.buf[offset + RING.size + head % self.ring_size] = code
+        # Голова сдвигается только после записи кода, поэтому игра не прочитает код раньше времени.
+        U64.pack_into(self.buf, offset, head + 1)
+        return True
+
+    def inputs(self) -> list:
+        """Метод для получения кодов входных событий из всех колец.
+
+        Возвращаемое значение:
+            list(int): коды в порядке колец, внутри кольца - в порядке передачи.
+        """
+        codes = []
+        buf = self.buf
+        for ring in range(self.rings):
+            offset = self.ring_offset(ring)
+            head, tail = RING.unpack_from(buf, offset)
+            if head == tail:
+                continue
+            data = offset + RING.size
+            codes += [buf[data + i % self.ring_size] for i in range(tail, head)]
+            U64.pack_into(buf, offset + U64.size, head)  # Сдвигаю хвост: место освободилось.
+        return codes
+
+    def close(self) -> None:
+        """Метод для отключения от блока общей памяти. Блок, созданный этим процессом, удаляется.
+
+        Возвращаемое значение:
+            None
+        """
+        self.field.release()
+        self.buf = None
+        self.memory.close()
+        if self.create:
+            self.memory.unlink()
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """Подключается к существующему блоку общей памяти, не удаляя его при выходе из процесса."""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python до 3.13: подключившийся процесс тоже следит за блоком и удалит его при выходе.
+        memory = shared_memory.SharedMemory(name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+if __name__ == "__main__":
+    # python shared.py имя - печатает состояние игры при каждом новом тетрамино.
+    state = SharedState(sys.argv[1])
+    last = None
+    try:
+        while True:
+            seq, frames, score, pieces, num, lines, over, figure, next_figure, field = state.snapshot()
+            if pieces != last:
+                last = pieces
+                print(f"кадр {frames}: раунд {num}, счёт {score}, линии {lines}, тетрамино {pieces}"
+                      f"{', игра окончена' if over else ''}")
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        state.close()
@@ -0,0 +1,590 @@
+"""Трансляция игры зрителям через сервер asyncio.
+
+Игра (python main.py с переменной окружения TETRIS_SPECTATE=адрес:порт) после каждого тика движка
+кодирует изменения в кадр, и сервер рассылает его всем подключённым зрителям. Кадр кодируется один раз
+для всех зрителей, а рассылаются кадры раз в FLUSH_MS мс одной записью на зрителя. Модуль не зависит от pygame.
+
+Запуск:
+    python spectate.py --watch адрес:порт
+        Подключается к трансляции и печатает состояние игры при каждом новом тетрамино.
+    python spectate.py --viewers 1000 [--seconds 10] [--slow 10]
+        Запускает трансляцию игры ai.Bot и 1000 зрителей в одном процессе через петлевой интерфейс
+        127.0.0.1 и печатает стоимость кодирования кадра и сколько байт в секунду получает зритель.
+        --slow зрителей не читают трансляцию, им достаются пропущенные кадры.
+
+Протокол поверх TCP, сообщения как в versus.py: длина содержимого (uint16), тип (uint8), содержимое.
+    KEYFRAME: тик движка (uint32) и полное состояние игры.
+    FRAME: сколько тиков прошло с прошлого кадра (uint8) и только то, что изменилось.
+Дальше идёт байт флагов S_* и отмеченные части в порядке флагов:
+    S_PIECE: падающее тетрамино (t, r, x, y), 4 x int8;
+    S_NEXT: следующее тетрамино (t, r, x, y), 4 x int8;
+    S_ROWS: маска линий (uint32) и сами линии, uint16 на линию, сверху вниз. В KEYFRAME отмечены
+        все непустые линии, в FRAME - изменившиеся;
+    S_SCORE: счёт, uint32;
+    S_ROUND: номер раунда, uint16;
+    S_LINES: линии, собранные в раунде, uint16;
+    S_OVER: игра окончена, без данных.
+В KEYFRAME отмечены все флаги, кроме S_OVER, если игра не окончена. Тики без изменений кадров не дают.
+
+KEYFRAME выходит каждые KEYFRAME_TICKS тиков и в начале новой игры. Новый зритель сразу получает
+последний KEYFRAME и все кадры после него. Если зритель не успевает читать и в буфере записи его
+соединения больше WRITE_LIMIT байт, кадры для него пропускаются до следующего KEYFRAME, а не копятся
+в памяти сервера.
+"""
+
+import argparse
+import asyncio
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from engine import Engine, HT, TICK_MS
+from versus import HEADER, PIECE, ROWS, ROW, SCORE, message, read_message
+
+PORT = 7778
+KEYFRAME_TICKS = 120  # Через сколько тиков выходит очередной KEYFRAME: около двух секунд.
+FLUSH_MS = 50  # Как часто накопившиеся кадры рассылаются зрителям.
+WRITE_LIMIT = 1 << 14  # Сколько байт может ждать отправки зрителю, прежде чем кадры для него пропускаются.
+BACKLOG = 1 << 12  # Очередь подключений: зрители турнира приходят разом к началу игры.
+
+KEYFRAME, FRAME = range(2)
+TICK = struct.Struct("<I")
+ROUND = struct.Struct("<H")
+LINES = struct.Struct("<H")
+# Флаги кадра.
+S_PIECE, S_NEXT, S_ROWS, S_SCORE, S_ROUND, S_LINES, S_OVER = (1 << i for i in range(7))
+EMPTY = (None, None, (0, ) * HT, None, None, None, False)  # Состояние, от которого кодируется KEYFRAME.
+
+
+def state(engine: Engine) -> tuple:
+    """Возвращает то, что видят зрители игры engine: (тетрамино, следующее тетрамино, стакан, счёт,
+    раунд, линии, конец игры)."""
+    return (engine.figure, engine.next_figure, tuple(engine.field), engine.score, engine.num, engine.lines,
+            engine.over)
+
+
+def encode(current: tuple, last: tuple = None) -> bytes:
+    """Кодирует состояние для кадра без заголовка и тика.
+
+    Аргументы:
+        current: tuple: состояние, которое вернула функция state.
+        last: tuple: состояние в прошлом кадре или None для KEYFRAME.
+
+    Возвращаемое значение:
+        bytes: байт флагов и отмеченные части или None, если ничего не изменилось.
+    """
+    figure, next_figure, field, score, num, lines, over = current
+    if last is None:
+        last = EMPTY
+    elif current == last:
+        return None
+    flags = 0
+    data = []
+    if figure != last[0]:
+        flags |= S_PIECE
+        data.append(PIECE.pack(*figure))
+    if next_figure != last[1]:
+        flags |= S_NEXT
+        data.append(PIECE.pack(*next_figure))
+    if field != last[2]:
+        mask = 0
+        rows = []
+        for y, (row, old) in enumerate(zip(field, last[2])):
+            if row != old:
+                mask |= 1 << y
+                rows.append(ROW.pack(row))
+        flags |= S_ROWS
+        data.append(ROWS.pack(mask))
+        data += rows
+    if score != last[3]:
+        flags |= S_SCORE
+        data.append(SCORE.pack(score))
+    if num != last[4]:
+        flags |= S_ROUND
+        data.append(ROUND.pack(num))
+    if lines != last[5]:
+        flags |= S_LINES
+        data.append(LINES.pack(lines))
+    if over:
+        flags |= S_OVER
+    return bytes((flags, )) + b"".join(data)
+
+
+class Viewer:
+    """Класс Viewer - игра, собранная зрителем из кадров трансляции.
+
+        Атрибуты:
+            synced: bool: True - если получен KEYFRAME и состояние совпадает с игрой.
+            tick: int: тик движка последнего кадра.
+            field: list(int): заполненность стакана, по одной маске на линию.
+            figure: tuple: падающее тетрамино (t, r, x, y).
+            next_figure: tuple: следующее тетрамино (t, r, x, y).
+            score: int: счёт.
+            num: int: номер раунда.
+            lines: int: линии, собранные в раунде.
+            over: bool: True - если игра окончена.
+
+        Методы:
+            apply(self, kind: int, payload: bytes) -> bool:
+                Применяет кадр, возвращает False, если кадр пропущен до первого KEYFRAME.
+    """
+    def __init__(self):
+        self.synced = False
+        self.tick = 0
+        self.field = [0] * HT
+        self.figure = self.next_figure = None
+        self.score = self.num = self.lines = 0
+        self.over = False
+
+    def apply(self, kind: int, payload: bytes) -> bool:
+        """Метод для применения кадра.
+
+        Аргументы:
+            kind: int: KEYFRAME или FRAME.
+            payload: bytes: содержимое кадра.
+
+        Возвращаемое значение:
+            bool: False - если это FRAME до первого KEYFRAME и применить его не к чему.
+        """
+        if kind == KEYFRAME:
+            self.__init__()
+            self.synced = True
+            self.tick, = TICK.unpack_from(payload)
+            offset = TICK.size
+        elif self.synced:
+            self.tick += payload[0]
+            offset = 1
+        else:
+            return False
+        flags = payload[offset]
+        offset += 1
+        if flags & S_PIECE:
+            self.figure = PIECE.unpack_from(payload, offset)
+            offset += PIECE.size
+        if flags & S_NEXT:
+            self.next_figure = PIECE.unpack_from(payload, offset)
+            offset += PIECE.size
+        if flags & S_ROWS:
+            mask, = ROWS.unpack_from(payload, offset)
+            offset += ROWS.size
+            for y in range(HT):
+                if mask >> y & 1:
+                    self.field[y], = ROW.unpack_from(payload, offset)
+                    offset += ROW.size
+        if flags & S_SCORE:
+            self.score, = SCORE.unpack_from(payload, offset)
+            offset += SCORE.size
+        if flags & S_ROUND:
+            self.num, = ROUND.unpack_from(payload, offset)
+            offset += ROUND.size
+        if flags & S_LINES:
+            self.lines, = LINES.unpack_from(payload, offset)
+        self.over = bool(flags & S_OVER)
+        return True
+
+
+class Subscriber:
+    """Класс Subscriber - соединение зрителя на сервере.
+
+        Атрибуты:
+            writer: asyncio.StreamWriter: запись в соединение.
+            stale: bool: True - если кадры пропускались и зритель ждёт KEYFRAME.
+            dropped: int: сколько кадров пропущено для зрителя.
+    """
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.stale = False
+        self.dropped = 0
+
+
+class Broadcaster:
+    """Класс Broadcaster кодирует тики игры в кадры и рассылает их зрителям.
+
+        Основное применение:
+            Round из main.py вызывает publish после каждого тика движка, сервер работает в отдельном
+            потоке со своим циклом asyncio (метод start). Нагрузочная проверка вызывает serve и publish
+            в своём цикле asyncio.
+
+        Примечание:
+            publish только кодирует кадр и кладёт его в очередь, рассылкой занимается цикл asyncio.
+            Раз в flush_ms мс кадры, накопившиеся в очереди, склеиваются и уходят каждому зрителю одной
+            записью: тысячам зрителей это обходится в несколько раз дешевле записи после каждого тика.
+
+        Атрибуты:
+            keyframe_ticks: int: через сколько тиков выходит KEYFRAME.
+            flush_ms: float: как часто кадры рассылаются зрителям.
+            write_limit: int: сколько байт может ждать отправки зрителю.
+            subscribers: set(Subscriber): подключённые зрители.
+            frames: int: количество закодированных кадров.
+            keyframes: int: сколько из них KEYFRAME.
+            encoded: int: сколько байт в закодированных кадрах.
+            encode_time: float: сколько секунд заняло кодирование.
+            fanout_time: float: сколько секунд заняла рассылка.
+            sent: int: сколько байт отправлено всем зрителям.
+            dropped: int: сколько кадров пропущено для медленных зрителей.
+
+        Методы:
+            publish(self, engine) -> int:
+                Кодирует изменения игры engine в кадр, возвращает его размер.
+
+            flush(self):
+                Рассылает накопившиеся кадры зрителям.
+
+            run(self):
+                Рассылает кадры раз в flush_ms мс.
+
+            handle(self, reader, writer):
+                Обслуживает соединение зрителя.
+
+            serve(self, host: str, port: int) -> asyncio.Server:
+                Начинает принимать соединения в текущем цикле asyncio.
+
+            start(self, host: str, port: int):
+                Начинает принимать соединения в отдельном потоке со своим циклом asyncio.
+
+            report(self) -> str:
+                Возвращает стоимость кодирования и объём трансляции.
+
+            stop(self):
+                Останавливает трансляцию в текущем цикле asyncio.
+
+            close(self):
+                Останавливает трансляцию и цикл asyncio отдельного потока.
+    """
+    def __init__(self, keyframe_ticks: int = KEYFRAME_TICKS, flush_ms: float = FLUSH_MS,
+                 write_limit: int = WRITE_LIMIT):
+        self.keyframe_ticks = keyframe_ticks
+        self.flush_ms = flush_ms
+        self.write_limit = write_limit
+        self.subscribers = set()
+        self.engine = None  # Игра, которая транслируется.
+        self.last = None  # Состояние в последнем кадре.
+        self.tick = self.key_tick = 0  # Тик последнего кадра и последнего KEYFRAME.
+        # Закодированные кадры, ещё не разосланные: (KEYFRAME или FRAME, байты). deque можно пополнять
+        # из потока игры, пока цикл asyncio забирает кадры в своём потоке.
+        self.outbox = deque()
+        self.gop = []  # Последний KEYFRAME и кадры после него для новых зрителей.
+        self.frames = self.keyframes = self.encoded = self.sent = self.dropped = self.flushes = 0
+        self.encode_time = self.fanout_time = 0.0
+        self.started = time.perf_counter()
+        self.loop = self.thread = self.task = self.server = None
+
+    def publish(self, engine: Engine) -> int:
+        """Метод для кодирования изменений игры после тика.
+
+        Аргументы:
+            engine: engine.Engine: игра.
+
+        Возвращаемое значение:
+            int: размер кадра в байтах, 0 - если ничего не изменилось.
+        """
+        start = time.perf_counter()
+        current = state(engine)
+        delta = engine.frames - self.tick
+        # Новая игра, долгий перерыв или пора дать KEYFRAME для новых и отставших зрителей.
+        if (engine is not self.engine or not 0 <= delta <= 255
+                or engine.frames - self.key_tick >= self.keyframe_ticks):
+            self.engine = engine
+            self.key_tick = engine.frames
+            kind, data = KEYFRAME, message(KEYFRAME, TICK.pack(engine.frames) + encode(current))
+            self.keyframes += 1
+        else:
+            payload = encode(current, self.last)
+            if payload is None:
+                return 0
+            kind, data = FRAME, message(FRAME, bytes((delta, )) + payload)
+        self.last = current
+        self.tick = engine.frames
+        self.frames += 1
+        self.encoded += len(data)
+        self.outbox.append((kind, data))
+        self.encode_time += time.perf_counter() - start
+        return len(data)
+
+    def flush(self) -> None:
+        """Метод для рассылки накопившихся кадров. Выполняется в цикле asyncio.
+
+        Зрителю, у которого в буфере записи больше write_limit байт, кадры не отправляются, и он ждёт
+        следующий KEYFRAME: кадры без пропущенных перед ними он применить не сможет.
+
+        Возвращаемое значение:
+            None
+        """
+        start = time.perf_counter()
+        frames = []
+        key = None  # С какого байта склеенных кадров начинается последний KEYFRAME.
+        size = 0
+        while self.outbox:
+            kind, data = self.outbox.popleft()
+            if kind == KEYFRAME:
+                key = size
+                self.gop = []
+            self.gop.append(data)
+            frames.append(data)
+            size += len(data)
+        if not frames:
+            return
+        data = b"".join(frames)
+        tail = memoryview(data)[key:] if key is not None else None
+        for subscriber in self.subscribers:
+            transport = subscriber.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > self.write_limit:
+                subscriber.stale = True
+                subscriber.dropped += len(frames)
+                self.dropped += len(frames)
+            elif not subscriber.stale:
+                transport.write(data)
+                self.sent += size
+            elif tail is not None:  # Отставший зритель продолжает с KEYFRAME.
+                subscriber.stale = False
+                transport.write(tail)
+                self.sent += len(tail)
+            else:
+                subscriber.dropped += len(frames)
+                self.dropped += len(frames)
+        self.fanout_time += time.perf_counter() - start
+        self.flushes += 1
+
+    async def run(self) -> None:
+        """Метод, который рассылает кадры раз в flush_ms мс. Работает отдельной задачей.
+
+        Возвращаемое значение:
+            None
+        """
+        while True:
+            await asyncio.sleep(self.flush_ms / 1000)
+            self.flush()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Метод для обслуживания соединения зрителя: отправляет ему последний KEYFRAME с кадрами после него
+        и держит соединение, пока зритель не отключится.
+
+        Аргументы:
+            reader: asyncio.StreamReader: чтение соединения.
+            writer: asyncio.StreamWriter: запись в соединение.
+
+        Возвращаемое значение:
+            None
+        """
+        subscriber = Subscriber(writer)
+        if self.gop:
+            writer.write(b"".join(self.gop))
+        self.subscribers.add(subscriber)
+        try:
+            while await reader.read(1 << 10):  # Зрители ничего не отправляют, жду отключения.
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+
+    async def serve(self, host: str = "0.0.0.0", port: int = PORT) -> asyncio.Server:
+        """Метод для запуска сервера в текущем цикле asyncio.
+
+        Аргументы:
+            host: str: адрес, на котором сервер принимает соединения.
+            port: int: порт.
+
+        Возвращаемое значение:
+            asyncio.Server: запущенный сервер.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.create_task(self.run())
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=BACKLOG)
+        return self.server
+
+    def start(self, host: str = "0.0.0.0", port: int = PORT) -> None:
+        """Метод для запуска сервера из программы без asyncio: цикл asyncio работает в отдельном потоке.
+
+        Аргументы:
+            host: str: адрес, на котором сервер принимает соединения.
+            port: int: порт.
+
+        Возвращаемое значение:
+            None
+        """
+        loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.serve(host, port), loop).result()
+
+    def report(self) -> str:
+        """Метод для отчёта о трансляции.
+
+        Возвращаемое значение:
+            str: стоимость кодирования кадра и рассылки на одного зрителя, средний размер кадра и объём на зрителя.
+        """
+        elapsed = time.perf_counter() - self.started
+        frames = max(1, self.frames)
+        viewers = max(1, len(self.subscribers))
+        return (f"кадров {self.frames} (KEYFRAME {self.keyframes}), "
+                f"кодирование {self.encode_time / frames * 1e6:.1f} мкс на кадр, "
+                f"рассылка {self.fanout_time / max(1, self.flushes) / viewers * 1e6:.2f} мкс на зрителя, "
+                f"{self.encoded / frames:.1f} байт на кадр, {self.encoded / elapsed:.0f} байт/с на зрителя, "
+                f"пропущено {self.dropped} кадров")
+
+    async def stop(self) -> None:
+        """Метод для остановки трансляции в цикле asyncio: сервер перестаёт принимать соединения,
+        рассылка прекращается, соединения зрителей закрываются.
+
+        Возвращаемое значение:
+            None
+        """
+        self.server.close()
+        self.task.cancel()
+        for subscriber in self.subscribers:
+            subscriber.writer.close()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+    def close(self) -> None:
+        """Метод для остановки трансляции, запущенной методом start, и цикла asyncio её потока.
+
+        Возвращаемое значение:
+            None
+        """
+        if self.thread is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+async def watch(host: str, port: int, viewer: Viewer, stats: dict) -> None:
+    """Читает трансляцию в viewer, пока сервер не закроет соединение.
+
+    Аргументы:
+        host: str: адрес сервера.
+        port: int: порт.
+        viewer: Viewer: игра зрителя.
+        stats: dict: счётчик полученных байт "bytes".
+
+    Возвращаемое значение:
+        None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            kind, payload = await read_message(reader)
+            stats["bytes"] += HEADER.size + len(payload)
+            viewer.apply(kind, payload)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def count(host: str, port: int, stats: dict, slow: bool) -> None:
+    """Зритель нагрузочной проверки: считает полученные байты, не разбирая кадры, или не читает вовсе.
+
+    Аргументы:
+        host: str: адрес сервера.
+        port: int: порт.
+        stats: dict: счётчик полученных байт "bytes".
+        slow: bool: True - не читать трансляцию, пока сервер не закроет соединение.
+
+    Возвращаемое значение:
+        None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if slow:
+            await stats["done"].wait()
+            return
+        while True:
+            data = await reader.read(1 << 16)
+            if not data:
+                break
+            stats["bytes"] += len(data)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def load(viewers: int, seconds: float, slow: int) -> None:
+    """Транслирует игру ai.Bot в реальном времени viewers зрителям на петлевом интерфейсе и печатает нагрузку."""
+    from ai import Bot
+    broadcaster = Broadcaster()
+    listener = await broadcaster.serve("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    loop = asyncio.get_running_loop()
+    # Несколько зрителей разбирают кадры, чтобы проверить, что их игра совпадает с транслируемой.
+    checked = [Viewer() for _ in range(min(10, viewers))]
+    stats = {"bytes": 0, "done": asyncio.Event()}
+    checked_stats = {"bytes": 0}
+    tasks = [asyncio.create_task(watch("127.0.0.1", port, viewer, checked_stats)) for viewer in checked]
+    tasks += [asyncio.create_task(count("127.0.0.1", port, stats, i < slow)) for i in range(viewers - len(checked))]
+    while len(broadcaster.subscribers) < viewers:
+        await asyncio.sleep(0.01)
+    broadcaster.started = time.perf_counter()
+    engine, bot = Engine(seed=0), Bot(lookahead=False)
+    next_tick = loop.time()
+    deadline = next_tick + seconds
+    games = lag = 0
+    while loop.time() < deadline:
+        if engine.over:
+            games += 1
+            engine, bot = Engine(seed=games), Bot(lookahead=False)
+        engine.step(bot.inputs(engine))
+        broadcaster.publish(engine)
+        next_tick += TICK_MS / 1000
+        lag = max(lag, loop.time() - next_tick)
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    await asyncio.sleep(0.5)  # Зрители дочитывают последние кадры.
+    elapsed = time.perf_counter() - broadcaster.started
+    synced = sum(viewer.synced and (viewer.tick, viewer.field, viewer.figure, viewer.score)
+                 == (broadcaster.tick, engine.field, engine.figure, engine.score) for viewer in checked)
+    print(broadcaster.report())
+    reading = viewers - slow
+    print(f"зрителей {viewers}, из них медленных {slow}; игр {games + 1}, "
+          f"наибольшее опоздание тика {lag * 1000:.1f} мс")
+    print(f"{(stats['bytes'] + checked_stats['bytes']) / elapsed / max(1, reading):.0f} байт/с на читающего зрителя, "
+          f"совпадает с игрой у {synced} из {len(checked)} проверяемых")
+    stats["done"].set()
+    await broadcaster.stop()
+    await asyncio.gather(*tasks)
+
+
+async def show(host: str, port: int) -> None:
+    """Печатает состояние транслируемой игры при каждом новом тетрамино."""
+    reader, writer = await asyncio.open_connection(host, port)
+    viewer = Viewer()
+    last = None
+    try:
+        while True:
+            kind, payload = await read_message(reader)
+            if viewer.apply(kind, payload) and viewer.next_figure != last:
+                last = viewer.next_figure
+                print(f"тик {viewer.tick}: раунд {viewer.num}, счёт {viewer.score}, линии {viewer.lines}"
+                      f"{', игра окончена' if viewer.over else ''}")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Трансляция игры зрителям.")
+    parser.add_argument("--watch", metavar="HOST:PORT", help="смотреть трансляцию")
+    parser.add_argument("--viewers", type=int, help="нагрузочная проверка с таким количеством зрителей")
+    parser.add_argument("--seconds", type=float, default=10, help="длительность нагрузочной проверки")
+    parser.add_argument("--slow", type=int, default=0, help="сколько зрителей не читают трансляцию")
+    args = parser.parse_args()
+    if args.viewers:
+        asyncio.run(load(args.viewers, args.seconds, min(args.slow, args.viewers)))
+    elif args.watch:
+        host, _, port = args.watch.rpartition(":")
+        try:
+            asyncio.run(show(host or "127.0.0.1", int(port)))
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
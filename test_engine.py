@@ -0,0 +1,48 @@
+"""Проверки движка engine без дисплея: python -m pytest."""
+
+from engine import Engine, HARD_DROP, restore
+
+
+def play(engine: Engine, pieces: int) -> None:
+    """Сбрасывает тетрамино до упора, пока не закрепится pieces тетрамино или игра не окончится."""
+    while engine.pieces < pieces and not engine.over:
+        engine.step((HARD_DROP, ))
+
+
+def test_holes_live_engine():
+    engine = Engine(seed=1)
+    assert engine.holes() == 0
+    engine.add_garbage(3)
+    play(engine, 6)  # Мусор поднимается при закреплении без собранных линий.
+    assert engine.raised
+    # Под верхом каждого столбца пустая клетка - дыра, считаю их по стакану напрямую.
+    expected = sum(1 for x in range(engine.width) for y in range(engine.tops[x], engine.height)
+                   if not engine.field[y] >> x & 1)
+    assert engine.holes() == expected > 0
+
+
+def test_holes_restored_engine():
+    engine = Engine(seed=2)
+    engine.add_garbage(2)
+    play(engine, 5)
+    copy = restore(engine.snapshot())
+    assert copy.holes() == engine.holes()
+    # Восстановленная игра поднимает мусор с теми же дырами, что и исходная.
+    engine.add_garbage(2)
+    copy.add_garbage(2)
+    play(engine, 12)
+    play(copy, 12)
+    assert copy.field == engine.field
+    assert copy.holes() == engine.holes()
+
+
+def test_restore_keeps_index_and_round():
+    engine = Engine(seed=3)
+    engine.add_garbage(3)
+    play(engine, 40)
+    copy = restore(engine.snapshot())
+    assert (copy.tops, copy.filled) == (engine.tops, engine.filled)
+    copy.reindex()  # Индекс из снимка совпадает с найденным заново по стакану.
+    assert (copy.tops, copy.filled) == (engine.tops, engine.filled)
+    assert (copy.num, copy.lines_points, copy.anim_speed_y, copy.shift_delay, copy.shift_repeat) == \
+        (engine.num, engine.lines_points, engine.anim_speed_y, engine.shift_delay, engine.shift_repeat)
@@ -0,0 +1,20 @@
+"""Проверки настроек главного модуля без окна: python -m pytest."""
+
+from engine import Engine, HANDLING_MAX, TICK_MS, restore
+from main import ms_to_ticks
+from replay import Recorder, load
+
+
+def test_handling_fits_in_a_byte():
+    assert ms_to_ticks(str(HANDLING_MAX * TICK_MS)) == HANDLING_MAX
+    assert ms_to_ticks(str((HANDLING_MAX + 1) * TICK_MS)) == HANDLING_MAX  # 255 тиков читались бы как None.
+    assert ms_to_ticks("100000") == HANDLING_MAX
+    assert ms_to_ticks("-16") == 0
+    # Наибольшие настройки сохраняются в снимок и повтор и читаются обратно без изменений.
+    handling = (ms_to_ticks("100000"), ms_to_ticks("100000"), HANDLING_MAX)
+    engine = Engine(seed=1, handling=handling)
+    engine.step(())
+    assert restore(engine.snapshot()).handling == handling
+    recorder = Recorder(engine.seed, handling)
+    recorder.end(engine.frames)
+    assert load(recorder.dump())[2] == handling
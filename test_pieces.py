@@ -0,0 +1,29 @@
+"""Проверки последовательностей тетрамино pieces: python -m pytest."""
+
+import pytest
+
+from pieces import CHUNK, Sequence, array, generate
+
+
+def test_extend_keeps_array_views():
+    np = pytest.importorskip("numpy")
+    sequence = Sequence("bag7", 3)
+    sequence.extend(CHUNK)
+    first = sequence.chunks[0]
+    view = array(first)
+    # Игра дочитывает последовательность за концом буфера, пока массив смотрит в первый кусок.
+    cursor = sequence.cursor(CHUNK - 5)
+    pieces = [next(cursor) for _ in range(10)]
+    assert len(sequence) == 2 * CHUNK
+    assert sequence.chunks[0] is first  # Продолжение не копирует уже сгенерированные тетрамино.
+    assert np.array_equal(view, np.frombuffer(generate(CHUNK, 3, "bag7"), dtype=np.uint8))
+    assert bytes(pieces) == generate(CHUNK + 5, 3, "bag7")[CHUNK - 5:]
+    assert sequence.data == generate(2 * CHUNK, 3, "bag7")
+
+
+def test_ready_buffer_ends_with_buffer():
+    data = generate(CHUNK + 7, 5)
+    sequence = Sequence(data=data)
+    assert len(sequence) == CHUNK + 7
+    assert bytes(sequence.cursor(CHUNK - 3)) == data[CHUNK - 3:]
+    assert bytes(sequence) == data
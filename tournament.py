@@ -0,0 +1,282 @@
+"""Турнир ботов: много целых игр без дисплея на нескольких процессах и сводная статистика по ним.
+
+Сравнивает варианты игры: правила очков и скорости (engine.RULES), правила выбора тетрамино (pieces.POLICIES)
+и веса бота (ai.WEIGHTS). Каждая игра идёт так же, как демонстрационный режим main.py: ai.Bot ведёт
+engine.Engine по тикам, пока игра не окончится или не будет закреплено max_pieces тетрамино.
+
+Запуск:
+    python tournament.py [--games 1000] [--variants variants.json] [--policies bag9 bag7] [-o tournament.csv]
+                         [--processes N] [--chunk 8] [--max-pieces 1000] [--seed 0]
+        Играет games игр каждого варианта и печатает сводку.
+    python tournament.py --summary tournament.csv
+        Печатает сводку по уже сыгранным играм из файла.
+
+Файл вариантов - объект JSON {имя: настройки}, все настройки необязательны:
+
+    {"обычный": {}, "быстрый": {"speed_y": [360, 7]}, "bag7": {"policy": "bag7"},
+     "жадный": {"weights": [-0.51, 0.76, -0.36, -0.18], "lookahead": false}}
+
+где policy - правило выбора тетрамино, points - очки за 1, 2, 3, 4 линии в первом раунде, speed_y и speed_x -
+кривые скорости (a, b), weights и lookahead - настройки ai.Bot.
+
+Зерно игры зависит только от --seed и номера игры, поэтому игра номер i начинается одинаково во всех вариантах
+и не зависит от количества процессов. Игры раздаются процессам кусками по chunk игр. Каждая игра записывается
+строкой CSV, как только доигран её кусок, а сводка копится по мере записи и не хранит сами игры.
+"""
+
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import sys
+import time
+from random import Random
+
+from ai import Bot, WEIGHTS
+from engine import Engine, TICK_MS, POINTS, SPEED_Y, SPEED_X
+from pieces import POLICIES, DEFAULT
+
+MAX_PIECES = 1000  # После скольких тетрамино игра останавливается, если бот ещё не проиграл.
+CHUNK = 8  # По сколько игр получает процесс за раз.
+# Столбцы файла результатов. seconds - длительность игры в игровом времени, wall - время её расчёта.
+FIELDS = ("variant", "game", "seed", "score", "lines", "rounds", "pieces", "seconds", "over", "wall")
+METRICS = FIELDS[3:]  # Показатели, по которым считается сводка.
+OPTIONS = ("policy", "points", "speed_y", "speed_x", "weights", "lookahead")  # Настройки варианта.
+PRECISION = 0.01  # Относительная точность перцентилей сводки.
+Z = 1.96  # Квантиль нормального распределения для 95% доверительного интервала среднего.
+
+caches = {}  # Веса бота -> кэш оценок стаканов, общий для всех игр процесса с этими весами.
+
+
+def game_seed(seed: int, game: int) -> int:
+    """Возвращает зерно игры номер game турнира с зерном seed."""
+    return Random(seed << 32 | game).getrandbits(32)
+
+
+def load_variants(filename: str = None, policies: list = None) -> list:
+    """Читает варианты игры из файла JSON и добавляет по варианту на каждое правило из policies.
+
+    Аргументы:
+        filename: str: файл вариантов или None.
+        policies: list(str): имена правил выбора тетрамино или None.
+
+    Возвращаемое значение:
+        list(tuple): варианты (имя, правило, правила очков и скорости, веса бота, lookahead).
+            Если ничего не задано - один вариант 'default' с настройками по умолчанию.
+    """
+    settings = {}
+    if filename:
+        with open(filename) as f:
+            settings = json.load(f)
+    for policy in policies or ():
+        settings[policy] = {"policy": policy}
+    if not settings:
+        settings = {"default": {}}
+    variants = []
+    for name, options in settings.items():
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise SystemExit(f"{name}: нет настроек {', '.join(sorted(unknown))}, есть {', '.join(OPTIONS)}")
+        policy = options.get("policy", DEFAULT)
+        if policy not in POLICIES:
+            raise SystemExit(f"{name}: нет правила {policy}, есть {', '.join(POLICIES)}")
+        rules = (tuple(options.get("points", POINTS)), tuple(options.get("speed_y", SPEED_Y)),
+                 tuple(options.get("speed_x", SPEED_X)))
+        variants.append((name, policy, rules, tuple(options.get("weights", WEIGHTS)),
+                         bool(options.get("lookahead", True))))
+    return variants
+
+
+def play_game(variant: tuple, seed: int, max_pieces: int = MAX_PIECES) -> tuple:
+    """Играет одну игру варианта variant ботом без дисплея.
+
+    Аргументы:
+        variant: tuple: вариант из load_variants.
+        seed: int: зерно игры.
+        max_pieces: int: после скольких тетрамино остановить игру.
+
+    Возвращаемое значение:
+        tuple: (счёт, линии, раунд, тетрамино, секунды игрового времени, 1 - игра окончена, секунды расчёта).
+    """
+    _, policy, rules, weights, lookahead = variant
+    start = time.perf_counter()
+    engine = Engine(seed=seed, policy=policy, rules=rules)
+    bot = Bot(weights, lookahead)
+    bot.cache = caches.setdefault(weights, {})
+    lines = 0
+    step, inputs = engine.step, bot.inputs
+    while not engine.over and engine.pieces < max_pieces:
+        lines += step(inputs(engine))
+    return (engine.score, lines, engine.num, engine.pieces, engine.frames * TICK_MS / 1000, int(engine.over),
+            time.perf_counter() - start)
+
+
+def play_chunk(task: tuple) -> tuple:
+    """Играет кусок игр одного варианта в процессе пула.
+
+    Аргументы:
+        task: tuple: (номер варианта, вариант, номер первой игры, количество игр, зерно турнира, max_pieces).
+
+    Возвращаемое значение:
+        tuple: (номер варианта, строки (номер игры, зерно, результаты play_game)).
+    """
+    index, variant, first, count, seed, max_pieces = task
+    rows = []
+    for game in range(first, first + count):
+        value = game_seed(seed, game)
+        rows.append((game, value) + play_game(variant, value, max_pieces))
+    return index, rows
+
+
+class Summary:
+    """Класс Summary копит среднее, дисперсию и перцентили одного показателя, не храня сами значения.
+
+        Основное применение:
+            Сводка турнира по миллионам игр в постоянной памяти.
+
+        Примечание:
+            Среднее и дисперсия считаются алгоритмом Уэлфорда. Перцентили считаются по корзинам, ширина которых
+            растёт вместе со значением: перцентиль значения v точен до PRECISION * (1 + v), а целые значения
+            меньше 1 / PRECISION попадают каждое в свою корзину и возвращаются точно.
+
+        Атрибуты:
+            count: int: количество значений.
+            mean: float: среднее.
+
+        Методы:
+            add(self, value: float):
+                Добавляет значение.
+
+            ci(self) -> float:
+                Возвращает половину ширины 95% доверительного интервала среднего.
+
+            percentile(self, q: float) -> float:
+                Возвращает перцентиль q.
+    """
+    STEP = math.log1p(PRECISION)
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Сумма квадратов отклонений от среднего.
+        self.buckets = {}  # Номер корзины -> [количество значений, наименьшее значение].
+
+    def add(self, value: float) -> None:
+        """Метод для добавления значения.
+
+        Аргументы:
+            value: float: неотрицательное значение показателя.
+
+        Возвращаемое значение:
+            None
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        bucket = self.buckets.setdefault(int(math.log1p(value) / self.STEP), [0, value])
+        bucket[0] += 1
+        bucket[1] = min(bucket[1], value)
+
+    def ci(self) -> float:
+        """Метод для получения половины ширины 95% доверительного интервала среднего.
+
+        Возвращаемое значение:
+            float: среднее лежит в mean ± ci с вероятностью 95%, 0.0 - если значений меньше двух.
+        """
+        if self.count < 2:
+            return 0.0
+        return Z * math.sqrt(self.m2 / (self.count - 1) / self.count)
+
+    def percentile(self, q: float) -> float:
+        """Метод для получения перцентиля так же, как profiler.percentile, с точностью PRECISION.
+
+        Аргументы:
+            q: float: перцентиль от 0 до 1.
+
+        Возвращаемое значение:
+            float: наименьшее значение корзины перцентиля, 0.0 - если значений нет.
+        """
+        rank = min(self.count - 1, int(q * self.count))
+        for index in sorted(self.buckets):
+            count, value = self.buckets[index]
+            rank -= count
+            if rank < 0:
+                return value
+        return 0.0
+
+
+def add(summaries: dict, row: dict) -> None:
+    """Добавляет результаты игры row (столбцы METRICS) в сводку summaries варианта: {показатель: Summary}."""
+    for metric in METRICS:
+        if metric not in summaries:
+            summaries[metric] = Summary()
+        summaries[metric].add(float(row[metric]))
+
+
+def report(summaries: dict) -> None:
+    """Печатает сводку {вариант: {показатель: Summary}}: среднее с доверительным интервалом и перцентили."""
+    for name, metrics in summaries.items():
+        if not metrics:
+            continue
+        over = metrics["over"]
+        print(f"{name}: {over.count} игр, окончено {over.mean:.0%}")
+        print(f"    {'':8} {'среднее':>12} {'± 95%':>10} {'p5':>10} {'p50':>10} {'p95':>10}")
+        for metric in METRICS:
+            if metric == "over":
+                continue
+            summary = metrics[metric]
+            print(f"    {metric:8} {summary.mean:12.2f} {summary.ci():10.2f} " +
+                  " ".join(f"{summary.percentile(q):10.2f}" for q in (0.05, 0.5, 0.95)))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Турнир ботов на нескольких процессах со сводной статистикой.")
+    parser.add_argument("--games", type=int, default=1000, help="сколько игр играет каждый вариант")
+    parser.add_argument("--variants", help="файл JSON с вариантами игры")
+    parser.add_argument("--policies", nargs="+", choices=tuple(POLICIES), help="добавить вариант на каждое правило")
+    parser.add_argument("-o", "--output", default="tournament.csv", help="файл для результатов игр")
+    parser.add_argument("--processes", type=int, help="количество процессов, по умолчанию - по числу ядер")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="по сколько игр получает процесс за раз")
+    parser.add_argument("--max-pieces", type=int, default=MAX_PIECES, help="после скольких тетрамино остановить игру")
+    parser.add_argument("--seed", type=int, default=0, help="зерно турнира")
+    parser.add_argument("--summary", metavar="CSV", help="напечатать сводку по файлу результатов и выйти")
+    args = parser.parse_args()
+
+    if args.summary:
+        summaries = {}
+        with open(args.summary, newline="") as f:
+            for row in csv.DictReader(f):
+                add(summaries.setdefault(row["variant"], {}), row)
+        report(summaries)
+        return 0
+
+    variants = load_variants(args.variants, args.policies)
+    # Куски разных вариантов чередуются, чтобы все варианты продвигались одновременно.
+    tasks = [(index, variant, first, min(args.chunk, args.games - first), args.seed, args.max_pieces)
+             for first in range(0, args.games, args.chunk) for index, variant in enumerate(variants)]
+    total = args.games * len(variants)
+    summaries = {variant[0]: {} for variant in variants}
+    done = 0
+    start = time.perf_counter()
+    with open(args.output, "w", newline="") as f, multiprocessing.Pool(args.processes) as pool:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for index, rows in pool.imap_unordered(play_chunk, tasks):
+            name = variants[index][0]
+            for row in rows:
+                writer.writerow((name, ) + row)
+                add(summaries[name], dict(zip(FIELDS[1:], row)))
+            f.flush()
+            done += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f"\r{done}/{total} игр, {done / elapsed:.1f} игр/с, осталось {(total - done) * elapsed / done:.0f} с",
+                  end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    report(summaries)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
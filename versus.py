@@ -0,0 +1,771 @@
+"""Игра нескольких игроков друг против друга через сервер asyncio.
+
+Каждый игрок ведёт свою игру engine.Engine у себя, сервер только пересылает состояния игр соперникам
+и раздаёт мусор: линии, собранные одним игроком, поднимаются со дна стакана у другого (engine.GARBAGE).
+Модуль не зависит от pygame: main.py показывает игру человека, а боты играют без дисплея.
+
+Запуск:
+    python versus.py [--host 0.0.0.0] [--port 7777]
+        Запускает сервер.
+    python versus.py --bots 200 [--seconds 30] [--scripted]
+        Запускает сервер и 200 пар ботов, которые играют друг против друга в одном процессе через
+        петлевой интерфейс 127.0.0.1, и печатает, сколько сообщений и байт прошло через сервер.
+        С --scripted боты нажимают случайные клавиши вместо расчёта ходов ai.Bot.
+
+Протокол поверх TCP. Сообщение: длина содержимого (uint16), тип (uint8), содержимое.
+    JOIN (игрок -> сервер): количество игроков (uint8), имя матча в UTF-8.
+        Игроки с одинаковым именем матча попадают в один матч, когда их наберётся столько,
+        сколько указал первый из них.
+    START (сервер -> игрок): номер игрока, количество игроков (uint8), зерно игры (uint32).
+        Все игроки матча получают одинаковую последовательность тетрамино.
+    STATE (игрок -> сервер): что изменилось с прошлого STATE этого игрока: байт флагов F_*,
+        затем только отмеченные части в порядке флагов:
+            F_PIECE: падающее тетрамино (t, r, x, y), 4 x int8;
+            F_ROWS: маска изменившихся линий (uint32) и сами линии, uint16 на линию, сверху вниз;
+            F_SCORE: счёт, uint32;
+            F_SENT: сколько линий мусора игрок отправил за игру, uint16 по модулю 65536;
+            F_INCOMING: мусор, который ещё не поднялся в стакан игрока, uint8;
+            F_OVER: игра игрока окончена, без данных.
+        Сдвиг тетрамино занимает 8 байт вместе с заголовком, закрепление - ещё по 2 байта на линию.
+    STATE (сервер -> игрок): номер игрока-отправителя (uint8) и содержимое его STATE без изменений.
+    GARBAGE (сервер -> игрок): линии мусора от соперника, uint8.
+    END (сервер -> игрок): номер победителя (uint8) или NOBODY.
+
+Каждому соединению сервер отправляет сообщения из очереди на QUEUE_SIZE сообщений. Если соперник
+не успевает читать и его очередь заполнена, сервер перестаёт читать сообщения отправителя, пока
+очередь не освободится, и отправитель ждёт в TCP. Память сервера на соединение ограничена
+очередью, буфером чтения READ_LIMIT и буфером записи WRITE_LIMIT.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import random
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from engine import Engine, HT, TICK_MS, LEFT, RIGHT, DOWN, ROTATE, LEFT_UP, RIGHT_UP
+
+PORT = 7777
+QUEUE_SIZE = 64  # Сколько сообщений сервер держит в очереди одного соединения.
+READ_LIMIT = 1 << 12  # Сколько байт сервер буферизует при чтении одного соединения.
+WRITE_LIMIT = 1 << 14  # После скольких байт в буфере записи сервер ждёт, пока соединение их заберёт.
+CLOSE_TIMEOUT = 1.0  # Сколько секунд сервер и клиент ждут отправки остатка при закрытии соединения.
+SCRIPT = (LEFT, LEFT_UP, RIGHT, RIGHT_UP, ROTATE, DOWN)  # Нажатия ботов, которые нагружают только сервер.
+
+JOIN, START, STATE, GARBAGE, END = range(5)
+NOBODY = 255  # Номер победителя, если все игры окончены одновременно.
+HEADER = struct.Struct("<HB")
+START_DATA = struct.Struct("<BBI")
+PIECE = struct.Struct("<4b")
+ROWS = struct.Struct("<I")
+ROW = struct.Struct("<H")
+SCORE = struct.Struct("<I")
+SENT = struct.Struct("<H")
+# Флаги сообщения STATE.
+F_PIECE, F_ROWS, F_SCORE, F_SENT, F_INCOMING, F_OVER = (1 << i for i in range(6))
+
+
+def message(kind: int, payload: bytes = b"") -> bytes:
+    """Возвращает сообщение типа kind с содержимым payload."""
+    return HEADER.pack(len(payload), kind) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    """Читает одно сообщение.
+
+    Аргументы:
+        reader: asyncio.StreamReader: соединение.
+
+    Возвращаемое значение:
+        tuple: (тип, содержимое).
+    """
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+def state(engine: Engine) -> tuple:
+    """Возвращает то, что соперники видят в игре engine: (тетрамино, стакан, счёт, мусор отправленный,
+    мусор пришедший, конец игры)."""
+    return (engine.figure, tuple(engine.field), engine.score, engine.sent & 0xFFFF, min(engine.incoming, 255),
+            engine.over)
+
+
+def encode(current: tuple, last: tuple = None) -> bytes:
+    """Кодирует изменения состояния для сообщения STATE.
+
+    Аргументы:
+        current: tuple: состояние, которое вернула функция state.
+        last: tuple: состояние в прошлом сообщении или None, если это первое сообщение.
+
+    Возвращаемое значение:
+        bytes: содержимое сообщения STATE или None, если ничего не изменилось.
+    """
+    figure, field, score, sent, incoming, over = current
+    if last is None:
+        last = (None, (0, ) * HT, 0, 0, 0, False)
+    if current == last:
+        return None
+    flags = 0
+    data = []
+    if figure != last[0]:
+        flags |= F_PIECE
+        data.append(PIECE.pack(*figure))
+    if field != last[1]:
+        mask = 0
+        rows = []
+        for y, (row, old) in enumerate(zip(field, last[1])):
+            if row != old:
+                mask |= 1 << y
+                rows.append(ROW.pack(row))
+        flags |= F_ROWS
+        data.append(ROWS.pack(mask))
+        data += rows
+    if score != last[2]:
+        flags |= F_SCORE
+        data.append(SCORE.pack(score))
+    if sent != last[3]:
+        flags |= F_SENT
+        data.append(SENT.pack(sent))
+    if incoming != last[4]:
+        flags |= F_INCOMING
+        data.append(bytes((incoming, )))
+    if over:
+        flags |= F_OVER
+    return bytes((flags, )) + b"".join(data)
+
+
+class Board:
+    """Класс Board - игра соперника, собранная из сообщений STATE.
+
+        Атрибуты:
+            field: list(int): заполненность стакана, по одной маске на линию.
+            figure: tuple: падающее тетрамино (t, r, x, y) или None.
+            score: int: счёт.
+            sent: int: сколько линий мусора отправлено, по модулю 65536.
+            incoming: int: мусор, который ещё не поднялся в стакан.
+            over: bool: True - если игра окончена.
+            version: int: количество применённых сообщений, по нему видно, что игра изменилась.
+
+        Методы:
+            apply(self, payload: bytes, offset: int):
+                Применяет содержимое сообщения STATE.
+    """
+    def __init__(self):
+        self.field = [0] * HT
+        self.figure = None
+        self.score = self.sent = self.incoming = self.version = 0
+        self.over = False
+
+    def apply(self, payload: bytes, offset: int = 0) -> None:
+        """Метод для применения изменений из сообщения STATE.
+
+        Аргументы:
+            payload: bytes: содержимое сообщения.
+            offset: int: с какого байта начинается содержимое STATE.
+
+        Возвращаемое значение:
+            None
+        """
+        flags = payload[offset]
+        offset += 1
+        if flags & F_PIECE:
+            self.figure = PIECE.unpack_from(payload, offset)
+            offset += PIECE.size
+        if flags & F_ROWS:
+            mask, = ROWS.unpack_from(payload, offset)
+            offset += ROWS.size
+            for y in range(HT):
+                if mask >> y & 1:
+                    self.field[y], = ROW.unpack_from(payload, offset)
+                    offset += ROW.size
+        if flags & F_SCORE:
+            self.score, = SCORE.unpack_from(payload, offset)
+            offset += SCORE.size
+        if flags & F_SENT:
+            self.sent, = SENT.unpack_from(payload, offset)
+            offset += SENT.size
+        if flags & F_INCOMING:
+            self.incoming = payload[offset]
+        self.over = bool(flags & F_OVER)
+        self.version += 1
+
+
+class Peer:
+    """Класс Peer - соединение игрока на сервере с ограниченной очередью отправки.
+
+        Атрибуты:
+            index: int: номер игрока в матче.
+            board: Board: игра игрока, нужна серверу, чтобы знать отправленный мусор и конец игры.
+            closed: bool: True - если соединение закрыто.
+
+        Методы:
+            send(self, data: bytes):
+                Ставит сообщение в очередь, дожидаясь места в ней.
+
+            flush(self):
+                Отправляет сообщения из очереди, пока соединение открыто.
+
+            close(self):
+                Отправляет оставшиеся сообщения, если соединение их забирает, и закрывает соединение.
+    """
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int = QUEUE_SIZE):
+        self.writer = writer
+        writer.transport.set_write_buffer_limits(WRITE_LIMIT)
+        self.queue = asyncio.Queue(queue_size)
+        self.index = None
+        self.board = Board()
+        self.closed = False
+        self.task = asyncio.create_task(self.flush())
+
+    async def send(self, data: bytes) -> None:
+        """Метод для отправки сообщения.
+
+        Аргументы:
+            data: bytes: сообщение.
+
+        Возвращаемое значение:
+            None
+        """
+        if not self.closed:
+            await self.queue.put(data)
+
+    async def flush(self) -> None:
+        """Метод, который отправляет сообщения из очереди. Работает отдельной задачей.
+
+        Возвращаемое значение:
+            None
+        """
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                # Всё, что накопилось в очереди, уходит одной записью в сокет.
+                while not self.queue.empty() and batch[-1] is not None:
+                    batch.append(self.queue.get_nowait())
+                if batch[-1] is None:
+                    self.writer.write(b"".join(batch[:-1]))
+                    break
+                self.writer.write(b"".join(batch))
+                await self.writer.drain()  # Ждёт, если в буфере записи больше WRITE_LIMIT байт.
+        except ConnectionError:
+            pass
+        finally:
+            self.closed = True
+            # Освобождаю очередь, чтобы отправители, которые ждут места в ней, не ждали вечно.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    async def close(self) -> None:
+        """Метод для закрытия соединения после отправки оставшихся сообщений.
+
+        Закрытие не ждёт места в очереди: если очередь полна или соединение не забирает сообщения
+        за CLOSE_TIMEOUT секунд, оставшиеся сообщения отбрасываются и соединение обрывается.
+
+        Возвращаемое значение:
+            None
+        """
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.task.cancel()
+        await asyncio.wait((self.task, ), timeout=CLOSE_TIMEOUT)
+        if self.task.done() and not self.task.cancelled():
+            self.writer.close()
+        else:
+            self.task.cancel()
+            self.writer.transport.abort()
+            await asyncio.wait((self.task, ))
+
+
+class Match:
+    """Класс Match - матч нескольких игроков на сервере.
+
+        Атрибуты:
+            name: str: имя матча.
+            players: int: количество игроков.
+            peers: list(Peer): соединения игроков.
+            started: bool: True - если игроки набраны и получили START.
+            ended: bool: True - если победитель определён и игроки получили END.
+
+        Методы:
+            start(self):
+                Начинает матч.
+
+            state(self, peer: Peer, payload: bytes):
+                Пересылает изменения игры peer соперникам и раздаёт отправленный им мусор.
+
+            target(self, peer: Peer) -> Peer:
+                Выбирает соперника, которому уйдёт мусор игрока peer.
+
+            leave(self, peer: Peer):
+                Убирает отключившегося игрока.
+
+            check_end(self):
+                Заканчивает матч, если в нём осталось не больше одной неоконченной игры.
+    """
+    def __init__(self, name: str, players: int):
+        self.name = name
+        self.players = players
+        self.peers = []
+        self.started = self.ended = False
+        self.turn = 0  # Номер очередного получателя мусора.
+
+    async def start(self) -> None:
+        """Метод для начала матча: каждый игрок получает свой номер и общее зерно.
+
+        Возвращаемое значение:
+            None
+        """
+        self.started = True
+        seed = random.getrandbits(32)
+        for index, peer in enumerate(self.peers):
+            peer.index = index
+            await peer.send(message(START, START_DATA.pack(index, self.players, seed)))
+
+    async def state(self, peer: Peer, payload: bytes) -> None:
+        """Метод для обработки сообщения STATE игрока.
+
+        Аргументы:
+            peer: Peer: игрок.
+            payload: bytes: содержимое сообщения.
+
+        Возвращаемое значение:
+            None
+        """
+        board = peer.board
+        sent, over = board.sent, board.over
+        board.apply(payload)
+        relay = message(STATE, bytes((peer.index, )) + payload)
+        for other in self.peers:
+            if other is not peer:
+                await other.send(relay)
+        rows = (board.sent - sent) & 0xFFFF
+        target = self.target(peer) if rows else None
+        if target is not None:
+            await target.send(message(GARBAGE, bytes((min(rows, 255), ))))
+        if board.over and not over:
+            await self.check_end()
+
+    def target(self, peer: Peer) -> Peer:
+        """Метод для выбора получателя мусора: соперники с неоконченной игрой получают мусор по очереди.
+
+        Аргументы:
+            peer: Peer: отправитель мусора.
+
+        Возвращаемое значение:
+            Peer: получатель или None, если все соперники уже проиграли.
+        """
+        opponents = [other for other in self.peers if other is not peer and not other.board.over]
+        if not opponents:
+            return None
+        self.turn += 1
+        return opponents[self.turn % len(opponents)]
+
+    async def leave(self, peer: Peer) -> None:
+        """Метод для обработки отключения игрока: до начала матча он убирается, после - проигрывает.
+
+        Аргументы:
+            peer: Peer: игрок.
+
+        Возвращаемое значение:
+            None
+        """
+        if not self.started:
+            self.peers.remove(peer)
+            return
+        peer.board.over = True
+        await self.check_end()
+
+    async def check_end(self) -> None:
+        """Метод для окончания матча, если неоконченных игр осталось меньше двух.
+
+        Возвращаемое значение:
+            None
+        """
+        alive = [peer for peer in self.peers if not peer.board.over]
+        if len(alive) > 1 or self.ended:
+            return
+        self.ended = True
+        winner = alive[0].index if alive else NOBODY
+        for peer in self.peers:
+            await peer.send(message(END, bytes((winner, ))))
+
+
+class Server:
+    """Класс Server набирает игроков в матчи и пересылает сообщения внутри матчей.
+
+        Основное применение:
+            python versus.py запускает сервер методом serve. Все матчи идут в одном процессе и одном цикле asyncio.
+
+        Атрибуты:
+            queue_size: int: размер очереди отправки каждого соединения.
+            waiting: dict: имя матча -> Match, который ещё набирает игроков.
+            matches: int: количество начатых матчей.
+            connections: int: количество открытых соединений.
+            messages: int: количество полученных сообщений STATE.
+            received: int: сколько байт получено в сообщениях STATE.
+
+        Методы:
+            handle(self, reader, writer):
+                Обслуживает одно соединение игрока.
+
+            serve(self, host: str, port: int) -> asyncio.Server:
+                Начинает принимать соединения.
+    """
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.waiting = {}
+        self.matches = self.messages = self.received = self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Метод для обслуживания соединения игрока.
+
+        Аргументы:
+            reader: asyncio.StreamReader: чтение соединения.
+            writer: asyncio.StreamWriter: запись в соединение.
+
+        Возвращаемое значение:
+            None
+        """
+        peer = Peer(writer, self.queue_size)
+        match = None
+        self.connections += 1
+        try:
+            kind, payload = await read_message(reader)
+            if kind != JOIN or not payload:
+                return
+            name = payload[1:].decode(errors="replace")
+            match = self.waiting.get(name)
+            if match is None:
+                match = self.waiting[name] = Match(name, max(2, payload[0]))
+            match.peers.append(peer)
+            if len(match.peers) == match.players:
+                del self.waiting[name]
+                self.matches += 1
+                await match.start()
+            while not match.ended:
+                kind, payload = await read_message(reader)
+                if kind == STATE and match.started and payload:
+                    self.messages += 1
+                    self.received += HEADER.size + len(payload)
+                    await match.state(peer, payload)
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError, struct.error):
+            pass  # Игрок отключился или прислал испорченное сообщение.
+        finally:
+            if match is not None:
+                await match.leave(peer)
+                if not match.peers and self.waiting.get(match.name) is match:
+                    del self.waiting[match.name]  # Все, кто ждал этот матч, ушли.
+            await peer.close()
+            self.connections -= 1
+
+    async def serve(self, host: str = "0.0.0.0", port: int = PORT) -> asyncio.Server:
+        """Метод для запуска сервера.
+
+        Аргументы:
+            host: str: адрес, на котором сервер принимает соединения.
+            port: int: порт.
+
+        Возвращаемое значение:
+            asyncio.Server: запущенный сервер.
+        """
+        return await asyncio.start_server(self.handle, host, port, limit=READ_LIMIT)
+
+
+class Client:
+    """Класс Client - соединение игрока с сервером.
+
+        Основное применение:
+            Round из main.py вызывает start и каждый кадр отдаёт движку take_garbage и отправляет publish.
+            Боты без дисплея вызывают connect в своём цикле asyncio.
+
+        Атрибуты:
+            match: str: имя матча.
+            players: int: количество игроков.
+            index: int: номер игрока в матче после START.
+            seed: int: зерно игры после START.
+            boards: dict: номер соперника -> Board.
+            ended: bool: True - если матч окончен или соединение разорвано.
+            winner: int: номер победителя после END, NOBODY или None.
+            sent_bytes: int: сколько байт отправлено в сообщениях STATE.
+
+        Методы:
+            connect(self, host: str, port: int):
+                Подключается к серверу в текущем цикле asyncio.
+
+            start(self, host: str, port: int):
+                Подключается к серверу в отдельном потоке со своим циклом asyncio.
+
+            publish(self, engine) -> int:
+                Отправляет изменения игры engine, возвращает количество байт.
+
+            take_garbage(self) -> int:
+                Забирает линии мусора, пришедшие с прошлого вызова.
+
+            shutdown(self):
+                Закрывает соединение в цикле asyncio и дожидается его закрытия.
+
+            close(self):
+                Закрывает соединение, останавливает и закрывает цикл asyncio отдельного потока.
+    """
+    def __init__(self, match: str = "", players: int = 2):
+        self.match = match
+        self.players = players
+        self.index = self.seed = self.winner = None
+        self.boards = {}
+        self.ended = False
+        self.garbage = deque()  # Линии мусора от сервера, ещё не отданные движку.
+        self.last = None  # Состояние в последнем отправленном STATE.
+        self.sent_bytes = 0
+        self.loop = self.writer = self.task = None
+        self.thread = self.connecting = None
+
+    @property
+    def started(self) -> bool:
+        return self.seed is not None
+
+    async def connect(self, host: str, port: int = PORT) -> None:
+        """Метод для подключения к серверу и отправки JOIN. Сообщения сервера читаются отдельной задачей.
+
+        Аргументы:
+            host: str: адрес сервера.
+            port: int: порт.
+
+        Возвращаемое значение:
+            None
+        """
+        self.loop = asyncio.get_running_loop()
+        try:
+            reader, self.writer = await asyncio.open_connection(host, port)
+        except OSError:
+            self.ended = True  # Сервер недоступен.
+            return
+        self.writer.write(message(JOIN, bytes((self.players, )) + self.match.encode()))
+        self.task = asyncio.create_task(self.receive(reader))
+
+    async def receive(self, reader: asyncio.StreamReader) -> None:
+        """Метод, который читает сообщения сервера до конца матча.
+
+        Аргументы:
+            reader: asyncio.StreamReader: чтение соединения.
+
+        Возвращаемое значение:
+            None
+        """
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == START:
+                    index, players, seed = START_DATA.unpack(payload)
+                    self.boards = {i: Board() for i in range(players) if i != index}
+                    self.index, self.players, self.seed = index, players, seed
+                elif kind == STATE and payload[0] in self.boards:
+                    self.boards[payload[0]].apply(payload, 1)
+                elif kind == GARBAGE:
+                    self.garbage.append(payload[0])
+                elif kind == END:
+                    self.winner = payload[0]
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError, struct.error):
+            pass
+        finally:
+            self.ended = True
+            self.writer.close()
+
+    def start(self, host: str, port: int = PORT) -> None:
+        """Метод для подключения к серверу из программы без asyncio: цикл asyncio работает в отдельном потоке.
+
+        Аргументы:
+            host: str: адрес сервера.
+            port: int: порт.
+
+        Возвращаемое значение:
+            None
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.connecting = asyncio.run_coroutine_threadsafe(self.connect(host, port), self.loop)
+
+    def write(self, data: bytes) -> None:
+        """Метод для записи сообщения в соединение из любого потока."""
+        if self.writer is None or self.ended:
+            return
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.writer.write, data)
+        else:
+            self.writer.write(data)
+
+    def publish(self, engine: Engine) -> int:
+        """Метод для отправки изменений игры.
+
+        Аргументы:
+            engine: engine.Engine: игра игрока.
+
+        Возвращаемое значение:
+            int: количество отправленных байт, 0 - если ничего не изменилось.
+        """
+        if self.writer is None or self.ended:
+            return 0
+        current = state(engine)
+        payload = encode(current, self.last)
+        if payload is None:
+            return 0
+        self.last = current
+        data = message(STATE, payload)
+        self.write(data)
+        self.sent_bytes += len(data)
+        return len(data)
+
+    def take_garbage(self) -> int:
+        """Метод для получения линий мусора, пришедших с прошлого вызова.
+
+        Возвращаемое значение:
+            int: количество линий.
+        """
+        rows = 0
+        while self.garbage:
+            rows += self.garbage.popleft()
+        return rows
+
+    async def shutdown(self) -> None:
+        """Метод для закрытия соединения в цикле asyncio: останавливает чтение и дожидается закрытия сокета.
+
+        Возвращаемое значение:
+            None
+        """
+        self.ended = True
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def close(self) -> None:
+        """Метод для закрытия соединения. Цикл asyncio отдельного потока останавливается и закрывается.
+
+        Возвращаемое значение:
+            None
+        """
+        self.ended = True
+        if self.thread is None:
+            if self.task is not None:
+                self.task.cancel()
+            if self.writer is not None:
+                self.writer.close()
+            return
+        if self.loop.is_closed():
+            return
+        self.connecting.cancel()  # Подключение ещё может ждать сервер.
+        future = asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+        try:
+            future.result(CLOSE_TIMEOUT)
+        except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError):
+            future.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def bot_player(host: str, port: int, pair: int, stats: dict, deadline: float, scripted: bool) -> None:
+    """Играет матчи против другого бота, шагая движком в реальном времени, пока не наступит deadline.
+
+    Аргументы:
+        host: str: адрес сервера.
+        port: int: порт.
+        pair: int: номер пары ботов, которые играют друг с другом.
+        stats: dict: счётчики тиков, байт, опозданий и мусора всех ботов.
+        deadline: float: время loop.time(), после которого бот уходит из матча.
+        scripted: bool: True - случайные нажатия вместо ai.Bot, чтобы нагружать сервер, а не расчёт ходов.
+
+    Возвращаемое значение:
+        None
+    """
+    from ai import Bot
+    loop = asyncio.get_running_loop()
+    game = 0
+    while loop.time() < deadline:
+        # Оба бота пары заканчивают матч одновременно и вместе начинают следующий.
+        client = Client(f"bots{pair}-{game}")
+        game += 1
+        await client.connect(host, port)
+        while not client.started and not client.ended:
+            await asyncio.sleep(0.01)
+        if not client.started:
+            return
+        engine = Engine(seed=client.seed)
+        bot = Bot(lookahead=False)
+        script = random.Random(client.seed + client.index)
+        next_tick = loop.time()
+        while not client.ended and not engine.over and loop.time() < deadline:
+            engine.add_garbage(client.take_garbage())
+            if scripted:
+                engine.step((script.choice(SCRIPT), ) if script.random() < 0.1 else ())
+            else:
+                engine.step(bot.inputs(engine))
+            stats["bytes"] += client.publish(engine)
+            stats["ticks"] += 1
+            next_tick += TICK_MS / 1000
+            lag = loop.time() - next_tick
+            stats["lag"] = max(stats["lag"], lag)
+            await asyncio.sleep(max(0.0, -lag))
+        stats["garbage"] += engine.sent
+        while not client.ended and loop.time() < deadline:
+            await asyncio.sleep(0.01)  # Жду END, чтобы соперник тоже закончил матч.
+        await client.shutdown()
+
+
+async def bots(matches: int, seconds: float, scripted: bool) -> None:
+    """Запускает сервер и matches пар ботов на петлевом интерфейсе, печатает нагрузку."""
+    server = Server()
+    listener = await server.serve("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    stats = {"bytes": 0, "ticks": 0, "lag": 0.0, "garbage": 0}
+    start = time.perf_counter()
+    deadline = asyncio.get_running_loop().time() + seconds
+    await asyncio.gather(*(bot_player("127.0.0.1", port, i // 2, stats, deadline, scripted)
+                           for i in range(2 * matches)))
+    elapsed = time.perf_counter() - start
+    listener.close()
+    while server.connections:
+        await asyncio.sleep(0.01)  # Сервер дообслуживает закрытые соединения.
+    print(f"матчей {server.matches}, тиков {stats['ticks']}, сообщений STATE {server.messages}, "
+          f"линий мусора {stats['garbage']}")
+    print(f"{server.messages / elapsed:.0f} сообщений/с, {server.received / max(1, server.messages):.1f} байт "
+          f"на сообщение, {stats['bytes'] / elapsed / (2 * matches):.0f} байт/с на игрока, "
+          f"наибольшее опоздание тика {stats['lag'] * 1000:.1f} мс")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Сервер игры нескольких игроков друг против друга.")
+    parser.add_argument("--host", default="0.0.0.0", help="адрес сервера")
+    parser.add_argument("--port", type=int, default=PORT, help="порт сервера")
+    parser.add_argument("--bots", type=int, metavar="MATCHES", help="сыграть MATCHES матчей ботов через 127.0.0.1")
+    parser.add_argument("--seconds", type=float, default=30, help="сколько секунд играют боты")
+    parser.add_argument("--scripted", action="store_true", help="случайные нажатия вместо ai.Bot")
+    args = parser.parse_args()
+
+    if args.bots:
+        asyncio.run(bots(args.bots, args.seconds, args.scripted))
+        return 0
+
+    async def serve():
+        listener = await Server().serve(args.host, args.port)
+        async with listener:
+            await listener.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())